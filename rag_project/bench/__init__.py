@@ -0,0 +1 @@
+"""Benchmarks and offline stand-ins for the external services used by the RAG project."""
@@ -0,0 +1,188 @@
+"""Load test of the RAG chain: concurrent conversations served by one process.
+
+Builds a vector database of synthetic chunks and answers with the local stub
+server standing in for the OpenAI API (embeddings and chat), then runs
+increasing numbers of concurrent conversations through the chain, either
+with rag_chain.ainvoke on one event loop or with the blocking rag_chain.invoke
+on a bounded thread pool, as a synchronous web handler would.
+
+The stub server runs in the same process, so on machines with few cores it
+competes with the chain for CPU and caps both modes; compare the modes at
+the same settings rather than reading the absolute numbers.
+
+Usage:
+    python -m rag_project.bench.async_load --concurrency 1,16,64,256 --latency-ms 200 --slo-ms 1500
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_openai import OpenAIEmbeddings
+from rag_project.bench.embedding_backends import synthetic_chunks
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.config import settings
+from rag_project.utils.metrics import percentile
+
+async def _conversation_async(rag_chain, questions, latencies):
+    messages = []
+    for question in questions:
+        start = time.perf_counter()
+        state = await rag_chain.ainvoke({"messages": messages + [HumanMessage(content=question)], "context": []})
+        latencies.append((time.perf_counter() - start) * 1000)
+        messages = state["messages"]
+
+def _conversation_sync(rag_chain, questions, latencies, submitted):
+    messages = []
+    for turn, question in enumerate(questions):
+        # The first turn also waits for a free worker thread, as a request queued by the web server would
+        start = submitted if turn == 0 else time.perf_counter()
+        state = rag_chain.invoke({"messages": messages + [HumanMessage(content=question)], "context": []})
+        latencies.append((time.perf_counter() - start) * 1000)
+        messages = state["messages"]
+
+def _summary(latencies, seconds):
+    return {
+        "turns_s": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+async def measure_async(rag_chain, conversations):
+    """
+    Run conversations concurrently on the current event loop.
+
+    Returns:
+        dict: Throughput in turns per second and turn latency percentiles
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_conversation_async(rag_chain, questions, latencies) for questions in conversations))
+    return _summary(latencies, time.perf_counter() - start)
+
+def measure_sync(rag_chain, conversations, threads):
+    """
+    Run conversations concurrently on a bounded thread pool.
+
+    Returns:
+        dict: Throughput in turns per second and turn latency percentiles
+    """
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda questions: _conversation_sync(rag_chain, questions, latencies, start), conversations))
+    return _summary(latencies, time.perf_counter() - start)
+
+def run(concurrency=(1, 16, 64, 256), turns=3, chunks=2000, backend="flat", latency_ms=200,
+        threads=40, modes=("async", "sync"), seed=0, directory=None):
+    """
+    Run the load test.
+
+    Args:
+        concurrency (iterable): Numbers of simultaneous conversations
+        turns (int): Questions per conversation
+        chunks (int): Number of indexed chunks
+        backend (str): Vector store backend ("chroma", "flat" or "pq")
+        latency_ms (float): Latency of every stub API call
+        threads (int): Worker threads of the sync mode (Gradio's default pool has 40)
+        modes (iterable): Modes to measure, "async" and/or "sync"
+        seed (int): Seed of the synthetic texts
+        directory (str): Where to build the database (default: a temporary directory)
+
+    Returns:
+        list: One result dict per mode and concurrency level
+    """
+    documents = [
+        Document(page_content=text, metadata={"chunk_id": f"chunk-{i}"})
+        for i, text in enumerate(synthetic_chunks(chunks, seed=seed))
+    ]
+    server = StubOpenAIServer(latency_ms=latency_ms).start()
+    results = []
+    try:
+        def stub_embeddings():
+            return OpenAIEmbeddings(
+                model="text-embedding-3-small", base_url=server.base_url,
+                api_key="stub", check_embedding_ctx_length=False
+            )
+        with tempfile.TemporaryDirectory(dir=directory) as persist_directory:
+            # Point the chain at the stub before it is imported
+            settings.OPENAI_BASE_URL = server.base_url
+            settings.OPENAI_API_KEY = "stub"
+            settings.VECTORSTORE_DIR = persist_directory
+            settings.VECTORSTORE_BACKEND = backend
+            settings.EMBEDDING_CACHE_ENABLED = False
+
+            from rag_project.core.embeddings import create_vectorstore
+            create_vectorstore(documents, persist_directory=persist_directory, embedding_model=stub_embeddings())
+
+            from rag_project.core import rag_graph
+            from rag_project.core.retriever import DocumentRetriever
+            # A fresh client: the ingest pipeline's async connections died with its event loop
+            rag_graph.doc_retriever = DocumentRetriever(
+                persist_directory=persist_directory, top_k=10, embedding_model=stub_embeddings()
+            )
+            # Every turn must reach the backends
+            rag_graph.rag_cache = None
+
+            workloads = []
+            for mode in modes:
+                for level in concurrency:
+                    questions = synthetic_chunks(level * turns, seed=seed + 1 + len(workloads), sentences=(1, 2))
+                    workloads.append((mode, level, [questions[i * turns:(i + 1) * turns] for i in range(level)]))
+
+            async def run_async():
+                # One event loop for every level, as in a web server: pooled
+                # async connections are bound to the loop that opened them
+                return [
+                    await measure_async(rag_graph.rag_chain, conversations)
+                    for mode, _, conversations in workloads if mode == "async"
+                ]
+            async_results = iter(asyncio.run(run_async()) if "async" in modes else [])
+
+            for mode, level, conversations in workloads:
+                result = {"mode": mode, "concurrency": level}
+                if mode == "async":
+                    result.update(next(async_results))
+                else:
+                    result.update(measure_sync(rag_graph.rag_chain, conversations, threads))
+                results.append(result)
+    finally:
+        server.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test concurrent conversations on the RAG chain")
+    parser.add_argument("--concurrency", default="1,16,64,256", help="Comma-separated simultaneous conversations")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per conversation")
+    parser.add_argument("--chunks", type=int, default=2000, help="Indexed chunks")
+    parser.add_argument("--backend", default="flat", help="Vector store backend: chroma, flat or pq")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Latency of every stub API call")
+    parser.add_argument("--threads", type=int, default=40, help="Worker threads of the sync mode")
+    parser.add_argument("--modes", default="async,sync", help="Comma-separated modes: async, sync")
+    parser.add_argument("--slo-ms", type=float, default=1500, help="p95 turn latency target")
+    args = parser.parse_args()
+
+    results = run(
+        concurrency=[int(c) for c in args.concurrency.split(",")],
+        turns=args.turns,
+        chunks=args.chunks,
+        backend=args.backend,
+        latency_ms=args.latency_ms,
+        threads=args.threads,
+        modes=args.modes.split(",")
+    )
+
+    print(f"{'Mode':<6} {'conversations':>13} {'throughput':>15} {'p50':>10} {'p95':>10}")
+    for result in results:
+        print(f"{result['mode']:<6} {result['concurrency']:>13} {result['turns_s']:>9.1f} t/s "
+              f"{result['p50_ms']:>8.0f}ms {result['p95_ms']:>8.0f}ms")
+    for mode in args.modes.split(","):
+        within = [r["concurrency"] for r in results if r["mode"] == mode and r["p95_ms"] <= args.slo_ms]
+        print(f"{mode}: sustains {max(within) if within else 0} concurrent conversations "
+              f"within a p95 of {args.slo_ms:.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark of batched retrieval against one query at a time.
+
+Builds a vector database of synthetic chunks with the local stub server
+standing in for the OpenAI API, then retrieves the same questions with a loop
+of DocumentRetriever.get_relevant_documents calls and with one
+DocumentRetriever.batch_get_relevant_documents call per batch.
+
+Usage:
+    python -m rag_project.bench.batch_retrieval --backend flat --queries 1000 --batch-size 256
+"""
+
+import argparse
+import tempfile
+import time
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from rag_project.bench.embedding_backends import synthetic_chunks
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.core.embeddings import create_vectorstore
+from rag_project.core.retriever import DocumentRetriever
+
+def run(backend="flat", chunks=5000, queries=500, batch_size=256, top_k=10, latency_ms=80,
+        hybrid=False, seed=0, directory=None):
+    """
+    Run the benchmark.
+
+    Args:
+        backend (str): Vector store backend ("chroma", "flat" or "pq")
+        chunks (int): Number of indexed chunks
+        queries (int): Number of questions
+        batch_size (int): Questions per batched call
+        top_k (int): Documents retrieved per question
+        latency_ms (float): Latency of the stub server, per request
+        hybrid (bool): Whether to fuse lexical results and use the lexical fast path
+        seed (int): Seed of the synthetic texts
+        directory (str): Where to build the database (default: a temporary directory)
+
+    Returns:
+        list: One result dict per retrieval mode
+    """
+    documents = [
+        Document(page_content=text, metadata={"chunk_id": f"chunk-{i}"})
+        for i, text in enumerate(synthetic_chunks(chunks, seed=seed))
+    ]
+    questions = synthetic_chunks(queries, seed=seed + 1, sentences=(1, 2))
+
+    server = StubOpenAIServer(latency_ms=latency_ms).start()
+    try:
+        embedding_model = OpenAIEmbeddings(
+            model="text-embedding-3-small", base_url=server.base_url,
+            api_key="stub", check_embedding_ctx_length=False
+        )
+        with tempfile.TemporaryDirectory(dir=directory) as persist_directory:
+            create_vectorstore(documents, persist_directory=persist_directory,
+                               embedding_model=embedding_model, backend=backend)
+            retriever = DocumentRetriever(
+                persist_directory=persist_directory, top_k=top_k, hybrid=hybrid,
+                lexical_fast_path=hybrid, embedding_model=embedding_model
+            )
+            # Warm-up (connection, page cache)
+            retriever.get_relevant_documents(questions[0])
+
+            requests_before = sum(server.requests.values())
+            start = time.perf_counter()
+            looped = [retriever.get_relevant_documents(question) for question in questions]
+            loop_seconds = time.perf_counter() - start
+            loop_requests = sum(server.requests.values()) - requests_before
+
+            requests_before = sum(server.requests.values())
+            start = time.perf_counter()
+            batched = []
+            for offset in range(0, len(questions), batch_size):
+                batched.extend(retriever.batch_get_relevant_documents(questions[offset:offset + batch_size]))
+            batch_seconds = time.perf_counter() - start
+            batch_requests = sum(server.requests.values()) - requests_before
+    finally:
+        server.stop()
+
+    same = sum(
+        [doc.page_content for doc in a] == [doc.page_content for doc in b]
+        for a, b in zip(looped, batched)
+    )
+    return [
+        {"mode": "loop", "queries_s": queries / loop_seconds, "requests": loop_requests, "agreement": 1.0},
+        {"mode": f"batch ({batch_size})", "queries_s": queries / batch_seconds, "requests": batch_requests,
+         "agreement": same / queries},
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched retrieval against a loop of single queries")
+    parser.add_argument("--backend", default="flat", help="Vector store backend: chroma, flat or pq")
+    parser.add_argument("--chunks", type=int, default=5000, help="Indexed chunks")
+    parser.add_argument("--queries", type=int, default=500, help="Questions retrieved")
+    parser.add_argument("--batch-size", type=int, default=256, help="Questions per batched call")
+    parser.add_argument("--top-k", type=int, default=10, help="Documents per question")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Latency of the stub server")
+    parser.add_argument("--hybrid", action="store_true", help="Enable lexical fusion and the lexical fast path")
+    args = parser.parse_args()
+
+    results = run(
+        backend=args.backend,
+        chunks=args.chunks,
+        queries=args.queries,
+        batch_size=args.batch_size,
+        top_k=args.top_k,
+        latency_ms=args.latency_ms,
+        hybrid=args.hybrid
+    )
+
+    print(f"{'Mode':<14} {'throughput':>14} {'API requests':>13} {'same results':>13}")
+    for result in results:
+        print(f"{result['mode']:<14} {result['queries_s']:>10.1f} q/s {result['requests']:>13} "
+              f"{result['agreement']:>12.1%}")
+    print(f"Speed-up: {results[1]['queries_s'] / results[0]['queries_s']:.1f}x")
+
+if __name__ == "__main__":
+    main()
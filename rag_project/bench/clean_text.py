@@ -0,0 +1,91 @@
+"""Micro-benchmark of the text-cleaning engine against the former chained re.sub version.
+
+Usage:
+    python -m rag_project.bench.clean_text --documents 2000 --repeat 5
+"""
+
+import argparse
+import re
+import time
+from rag_project.bench.corpus import synthetic_corpus
+from rag_project.utils.cleaning import DEFAULT_CLEANER
+
+def legacy_clean_text(text):
+    """The clean_text implementation the engine replaced, kept as a baseline."""
+    text = re.sub(r'\[.*?\]\(.*?\)', '', text)  # Remove markdown links
+    text = re.sub(r'http\S+', '', text)         # Remove URLs
+    text = re.sub(r'<[^>]+>', '', text)         # Remove HTML tags
+    text = re.sub(r'© .*?\n?', '', text)        # Remove photo credits
+    text = re.sub(r'\s+', ' ', text)            # Reduce spaces
+    text = re.sub(r'(Mis à jour le.*?\n|Suivez nous !|Lien affilié Amazon|Crédit.*?\n)', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+# Boilerplate added by the synthetic corpus, none of which should survive cleaning
+BOILERPLATE = ("Mis à jour le", "Crédit", "©", "Suivez nous", "Lien affilié")
+
+def has_boilerplate(text):
+    """Whether a cleaned text still contains boilerplate of the synthetic corpus."""
+    return any(marker in text for marker in BOILERPLATE)
+
+def stream_clean_text(text, block_size=64 * 1024):
+    """Clean a text through TextCleaner.clean_stream, fed in fixed-size blocks."""
+    blocks = (text[i:i + block_size] for i in range(0, len(text), block_size))
+    return "".join(DEFAULT_CLEANER.clean_stream(blocks))
+
+def measure(function, documents, repeat):
+    """
+    Measure the throughput of a cleaning function.
+
+    Returns:
+        float: Best throughput over the repeats, in MB/s of input
+    """
+    size_mb = sum(len(doc.encode("utf-8")) for doc in documents) / 1e6
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for doc in documents:
+            function(doc)
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best
+
+def run(documents=2000, repeat=5, seed=0):
+    """
+    Run the benchmark.
+
+    Args:
+        documents (int): Number of synthetic documents
+        repeat (int): Number of timed repetitions (best is kept)
+        seed (int): Seed of the synthetic corpus
+
+    Returns:
+        dict: Throughput in MB/s of each implementation, and documents with boilerplate left over
+    """
+    corpus = list(synthetic_corpus(documents, seed=seed))
+    results = {
+        "corpus_mb": sum(len(doc.encode("utf-8")) for doc in corpus) / 1e6,
+        "legacy_mb_s": measure(legacy_clean_text, corpus, repeat),
+        "engine_mb_s": measure(DEFAULT_CLEANER.clean, corpus, repeat),
+        "engine_stream_mb_s": measure(stream_clean_text, corpus, repeat),
+    }
+
+    results["legacy_boilerplate_left"] = sum(has_boilerplate(legacy_clean_text(doc)) for doc in corpus)
+    results["engine_boilerplate_left"] = sum(has_boilerplate(DEFAULT_CLEANER.clean(doc)) for doc in corpus)
+    results["engine_stream_boilerplate_left"] = sum(has_boilerplate(stream_clean_text(doc)) for doc in corpus)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text cleaning throughput")
+    parser.add_argument("--documents", type=int, default=2000, help="Number of synthetic documents")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions")
+    args = parser.parse_args()
+
+    results = run(documents=args.documents, repeat=args.repeat)
+    print(f"Corpus: {results['corpus_mb']:.1f} MB")
+    print(f"Legacy chained re.sub : {results['legacy_mb_s']:.1f} MB/s")
+    print(f"TextCleaner.clean     : {results['engine_mb_s']:.1f} MB/s")
+    print(f"TextCleaner (stream)  : {results['engine_stream_mb_s']:.1f} MB/s")
+    print(f"Documents with boilerplate left: legacy {results['legacy_boilerplate_left']}, "
+          f"engine {results['engine_boilerplate_left']}, stream {results['engine_stream_boilerplate_left']}")
+
+if __name__ == "__main__":
+    main()
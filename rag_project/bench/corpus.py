@@ -0,0 +1,63 @@
+"""Synthetic French-markdown corpus for benchmarks."""
+
+import random
+
+WORDS = (
+    "le la les un une des du de et ou mais donc car pour avec sans dans sur sous entre "
+    "maison jardin cuisine recette voyage plage montagne ville village marché produit prix "
+    "qualité conseil astuce guide saison printemps été automne hiver famille enfant vélo "
+    "randonnée fromage vin pain légume fruit chocolat café thé santé sport musique livre "
+    "découvrir choisir préparer profiter visiter acheter comparer essayer réussir trouver "
+    "facile rapide simple pratique délicieux célèbre ancien nouveau grand petit beau meilleur"
+).split()
+
+def synthetic_sentence(rng, min_words=6, max_words=18):
+    """Build a random French-looking sentence."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+def synthetic_document(rng, paragraphs=8, noise=True):
+    """
+    Build a random scraped-looking markdown document.
+
+    Args:
+        rng (random.Random): Random generator
+        paragraphs (int): Number of paragraphs
+        noise (bool): Whether to add links, URLs, HTML and boilerplate lines
+
+    Returns:
+        str: Markdown text
+    """
+    lines = [f"# {synthetic_sentence(rng, 3, 7)[:-1]}", ""]
+    if noise:
+        lines.append(f"Mis à jour le {rng.randint(1, 28)} mars {rng.randint(2015, 2025)}")
+    for _ in range(paragraphs):
+        sentences = [synthetic_sentence(rng) for _ in range(rng.randint(2, 6))]
+        if noise and rng.random() < 0.5:
+            sentences.insert(1, f"[{rng.choice(WORDS)}](https://example.com/{rng.randint(1, 9999)})")
+        if noise and rng.random() < 0.3:
+            sentences.append(f"Voir https://example.org/page?id={rng.randint(1, 9999)} <b>{rng.choice(WORDS)}</b>")
+        lines.append(" ".join(sentences))
+        lines.append("")
+    if noise:
+        lines.append(f"© Photo {rng.choice(WORDS)}")
+        lines.append("Crédit : Shutterstock")
+        lines.append("Suivez nous ! Lien affilié Amazon")
+    return "\n".join(lines) + "\n"
+
+def synthetic_corpus(n_documents, seed=0, paragraphs=8, noise=True):
+    """
+    Generate synthetic documents deterministically.
+
+    Args:
+        n_documents (int): Number of documents
+        seed (int): Random seed
+        paragraphs (int): Paragraphs per document
+        noise (bool): Whether to add scraping noise
+
+    Yields:
+        str: Markdown documents
+    """
+    rng = random.Random(seed)
+    for _ in range(n_documents):
+        yield synthetic_document(rng, paragraphs=paragraphs, noise=noise)
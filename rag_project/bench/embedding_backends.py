@@ -0,0 +1,135 @@
+"""Benchmark of the embedding providers: query latency and ingest throughput.
+
+Compares the remote OpenAI backend (or the local stub server standing in for
+it) with the in-process CPU backend, optionally quantized. Caching is disabled
+so every text is actually embedded.
+
+Usage:
+    python -m rag_project.bench.embedding_backends --stub --latency-ms 80
+    python -m rag_project.bench.embedding_backends --providers local --quantization none,int8,onnx
+"""
+
+import argparse
+import random
+import time
+from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
+from rag_project.bench.corpus import synthetic_sentence
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.core.embeddings import get_embedding_model
+from rag_project.core.embedding_pipeline import EmbeddingPipeline
+from rag_project.utils.metrics import percentile
+
+def synthetic_chunks(n, seed=0, sentences=(3, 12)):
+    """Build n chunk-sized texts of varying length."""
+    rng = random.Random(seed)
+    return [
+        " ".join(synthetic_sentence(rng) for _ in range(rng.randint(*sentences)))
+        for _ in range(n)
+    ]
+
+def measure_queries(embedding_model, queries):
+    """
+    Embed queries one at a time, as the retriever does.
+
+    Returns:
+        dict: p50 and p95 latency in milliseconds
+    """
+    embedding_model.embed_query(queries[0])  # warm-up (model load, connection)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embedding_model.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"query_p50_ms": percentile(latencies, 50), "query_p95_ms": percentile(latencies, 95)}
+
+def measure_ingest(embedding_model, texts):
+    """
+    Embed chunks through the ingest pipeline, discarding the vectors.
+
+    Returns:
+        dict: Throughput in chunks per second and vector size
+    """
+    documents = [Document(page_content=text) for text in texts]
+    stats = EmbeddingPipeline(embedding_model).run(
+        documents, writer=lambda docs, ids, vectors: None, ids=range(len(documents))
+    )
+    return {"ingest_chunks_s": stats["chunks_per_second"], "dimension": stats["dimension"]}
+
+def run(providers=("openai", "local"), quantizations=(None,), queries=200, chunks=2000,
+        stub=False, latency_ms=80, seed=0):
+    """
+    Run the benchmark.
+
+    Args:
+        providers (iterable): Providers to compare ("openai", "local")
+        quantizations (iterable): Quantization modes of the local provider
+        queries (int): Number of timed query embeddings
+        chunks (int): Number of chunks embedded for the throughput measure
+        stub (bool): Whether to replace the OpenAI API with the local stub server
+        latency_ms (float): Latency of the stub server
+        seed (int): Seed of the synthetic texts
+
+    Returns:
+        list: One result dict per backend
+    """
+    query_texts = synthetic_chunks(queries, seed=seed, sentences=(1, 2))
+    chunk_texts = synthetic_chunks(chunks, seed=seed + 1)
+    results = []
+
+    for provider in providers:
+        if provider == "openai":
+            server = StubOpenAIServer(latency_ms=latency_ms).start() if stub else None
+            try:
+                if server is not None:
+                    model = OpenAIEmbeddings(
+                        model="text-embedding-3-small", base_url=server.base_url,
+                        api_key="stub", check_embedding_ctx_length=False
+                    )
+                else:
+                    model = get_embedding_model(provider="openai", use_cache=False, batch_queries=False)
+                result = {"backend": "openai (stub)" if stub else "openai"}
+                result.update(measure_queries(model, query_texts))
+                result.update(measure_ingest(model, chunk_texts))
+            finally:
+                if server is not None:
+                    server.stop()
+            results.append(result)
+        else:
+            from rag_project.core.local_embeddings import LocalEmbeddings
+            for quantization in quantizations:
+                model = LocalEmbeddings(quantization=quantization or "")
+                result = {"backend": f"local ({quantization or 'fp32'})"}
+                result.update(measure_queries(model, query_texts))
+                result.update(measure_ingest(model, chunk_texts))
+                results.append(result)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding providers")
+    parser.add_argument("--providers", default="openai,local", help="Comma-separated providers")
+    parser.add_argument("--quantization", default="none", help="Comma-separated local modes: none, int8, onnx")
+    parser.add_argument("--queries", type=int, default=200, help="Timed query embeddings")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks embedded for throughput")
+    parser.add_argument("--stub", action="store_true", help="Use the local stub server instead of the OpenAI API")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Latency of the stub server")
+    args = parser.parse_args()
+
+    quantizations = [None if q == "none" else q for q in args.quantization.split(",")]
+    results = run(
+        providers=args.providers.split(","),
+        quantizations=quantizations,
+        queries=args.queries,
+        chunks=args.chunks,
+        stub=args.stub,
+        latency_ms=args.latency_ms
+    )
+
+    print(f"{'Backend':<20} {'query p50':>10} {'query p95':>10} {'ingest':>14} {'dims':>6}")
+    for result in results:
+        print(f"{result['backend']:<20} {result['query_p50_ms']:>8.1f}ms {result['query_p95_ms']:>8.1f}ms "
+              f"{result['ingest_chunks_s']:>9.0f} ch/s {result['dimension']:>6}")
+
+if __name__ == "__main__":
+    main()
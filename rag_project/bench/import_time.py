@@ -0,0 +1,139 @@
+"""Import-time regression check of the CLI subcommands.
+
+Each subcommand imports the CLI module, then the modules its command
+function needs. Both are imported in a fresh interpreter under
+``python -X importtime``, and the time spent is compared with the
+subcommand's startup budget. The heaviest third-party packages are listed,
+so an eager import that creeps back in shows up by name.
+
+Budgets are in milliseconds on a developer laptop; scale them for slower
+machines with --budget-scale. The exit status is 1 if any subcommand is over
+budget.
+
+Usage:
+    python -m rag_project.bench.import_time
+    python -m rag_project.bench.import_time --commands help,process-clean --budget-scale 2
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Modules imported by each subcommand before it starts working, and its budget in ms
+SUBCOMMANDS = {
+    "help": ((), 150),
+    "process-clean": (("rag_project.data_processing.processors",), 150),
+    "process": (("rag_project.data_processing.processors", "rag_project.utils.rewriter"), 1000),
+    "ingest": (
+        ("rag_project.data_processing.ingest", "rag_project.data_processing.incremental",
+         "rag_project.core.embeddings"), 3000
+    ),
+    "calibrate": (("rag_project.core.calibration", "rag_project.core.retriever"), 3000),
+    "bench": (("rag_project.bench.suite",), 1000),
+    "serve": (("rag_project.web.server",), 1000),
+    "web": (("rag_project.web.app",), 5000),
+}
+
+MARKER = "-- rag import-time start --"
+
+def _parse(stderr):
+    """
+    Parse the importtime report of the imports after the marker.
+
+    Returns:
+        tuple: (total microseconds, {top-level package: cumulative microseconds})
+    """
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    total, packages = 0, {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            cumulative = int(cumulative)
+        except ValueError:
+            continue  # header line
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        if depth == 1:
+            # Imports made directly by the measured statements
+            total += cumulative
+        root = name.split(".")[0]
+        if "." not in name and root != "rag_project":
+            packages[root] = max(packages.get(root, 0), cumulative)
+    return total, packages
+
+def measure(modules, repeat=3):
+    """
+    Measure the import time of the CLI followed by some modules.
+
+    Args:
+        modules (iterable): Modules imported after rag_project.cli.main
+        repeat (int): Fresh interpreters started, the fastest run is kept
+
+    Returns:
+        dict: Import time in ms and the heaviest third-party packages, or the error
+    """
+    imports = "; ".join(f"import {module}" for module in ("rag_project.cli.main", *modules))
+    code = f"import sys; sys.stderr.write({MARKER!r} + '\\n'); {imports}"
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"
+            return {"error": error}
+        total, packages = _parse(completed.stderr)
+        if best is None or total < best[0]:
+            best = (total, packages)
+    total, packages = best
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {"ms": total / 1000, "heaviest": [(name, us / 1000) for name, us in heaviest]}
+
+def run(commands=None, repeat=3, budget_scale=1.0):
+    """
+    Measure subcommands against their budgets.
+
+    Args:
+        commands (iterable): Subcommands to measure (default: all of SUBCOMMANDS)
+        repeat (int): Runs per subcommand, the fastest is kept
+        budget_scale (float): Factor applied to every budget
+
+    Returns:
+        list: One result dict per subcommand
+    """
+    results = []
+    for command in commands or SUBCOMMANDS:
+        modules, budget = SUBCOMMANDS[command]
+        result = {"command": command, "budget_ms": budget * budget_scale}
+        result.update(measure(modules, repeat=repeat))
+        result["over_budget"] = "ms" in result and result["ms"] > result["budget_ms"]
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the CLI subcommands")
+    parser.add_argument("--commands", help="Comma-separated subcommands (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per subcommand, the fastest is kept")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Factor applied to every budget")
+    args = parser.parse_args()
+
+    results = run(
+        commands=args.commands.split(",") if args.commands else None,
+        repeat=args.repeat,
+        budget_scale=args.budget_scale
+    )
+
+    print(f"{'Command':<14} {'imports':>10} {'budget':>10}  heaviest packages")
+    for result in results:
+        if "error" in result:
+            print(f"{result['command']:<14} {'-':>10} {result['budget_ms']:>8.0f}ms  not importable: {result['error']}")
+            continue
+        heaviest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in result["heaviest"])
+        flag = "  OVER BUDGET" if result["over_budget"] else ""
+        print(f"{result['command']:<14} {result['ms']:>8.0f}ms {result['budget_ms']:>8.0f}ms  {heaviest}{flag}")
+    sys.exit(1 if any(result["over_budget"] for result in results) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark of the IVF-PQ compressed index against exact flat search.
+
+Builds a flat index of synthetic clustered vectors, encodes it with IVF-PQ,
+and reports the resident memory of each index, query latency percentiles and
+recall@k of the compressed index for several nprobe values.
+
+Usage:
+    python -m rag_project.bench.pq_index --vectors 200000 --dimension 1536 --nprobe 4,16,64
+"""
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from langchain_core.documents import Document
+from rag_project.core.flat_index import FlatIndex, FlatIndexWriter
+from rag_project.core.pq_index import PQIndex, build_pq_index
+from rag_project.utils.metrics import percentile
+
+def synthetic_vectors(count, dimension, clusters=200, seed=0):
+    """Build unit-length vectors grouped around random topics, like text embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def time_queries(index, queries, k):
+    """
+    Search queries one at a time.
+
+    Returns:
+        tuple: (rows of each query, latencies in milliseconds)
+    """
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = index.search_vectors(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(rows[0])
+    return results, latencies
+
+def run(vectors=100000, dimension=384, queries=200, k=10, nprobes=(4, 16, 64), rerank=100,
+        subquantizers=None, dtype="float16", seed=0, directory=None):
+    """
+    Run the benchmark.
+
+    Args:
+        vectors (int): Number of indexed vectors
+        dimension (int): Vector size
+        queries (int): Number of timed queries
+        k (int): Neighbours per query
+        nprobes (iterable): nprobe values to measure
+        rerank (int): Candidates re-ranked exactly
+        subquantizers (int): Bytes per PQ code. If None, uses PQ_SUBQUANTIZERS from settings.
+        dtype (str): Storage type of the flat index
+        seed (int): Random seed
+        directory (str): Where to build the indexes (default: a temporary directory)
+
+    Returns:
+        list: One result dict per configuration
+    """
+    data = synthetic_vectors(vectors + queries, dimension, seed=seed)
+    corpus, query_vectors = data[:vectors], data[vectors:]
+
+    with tempfile.TemporaryDirectory(dir=directory) as persist_directory:
+        writer = FlatIndexWriter(persist_directory, dtype=dtype)
+        block = 10000
+        for start in range(0, vectors, block):
+            rows = range(start, min(start + block, vectors))
+            writer.add([Document(page_content=str(i)) for i in rows], [str(i) for i in rows], corpus[start:start + block])
+        writer.close()
+
+        flat = FlatIndex(persist_directory, None)
+        start = time.perf_counter()
+        build_pq_index(flat, subquantizers=subquantizers, seed=seed)
+        build_seconds = time.perf_counter() - start
+
+        exact, exact_latencies = time_queries(flat, query_vectors, k)
+        results = [{
+            "index": "flat (exact)",
+            "memory_mb": flat.vectors.nbytes / 1e6,
+            "p50_ms": percentile(exact_latencies, 50),
+            "p99_ms": percentile(exact_latencies, 99),
+            "recall": 1.0,
+        }]
+
+        for nprobe in nprobes:
+            index = PQIndex(persist_directory, None, nprobe=nprobe, rerank=rerank)
+            found, latencies = time_queries(index, query_vectors, k)
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)])
+            results.append({
+                "index": f"ivf-pq nprobe={nprobe}",
+                "memory_mb": index.memory_bytes() / 1e6,
+                "p50_ms": percentile(latencies, 50),
+                "p99_ms": percentile(latencies, 99),
+                "recall": float(recall),
+                "build_seconds": build_seconds,
+                "lists": index.quantizer.nlist,
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IVF-PQ index against exact search")
+    parser.add_argument("--vectors", type=int, default=100000, help="Indexed vectors")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector size")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--nprobe", default="4,16,64", help="Comma-separated nprobe values")
+    parser.add_argument("--rerank", type=int, default=100, help="Candidates re-ranked exactly")
+    parser.add_argument("--subquantizers", type=int, default=None, help="Bytes per PQ code")
+    parser.add_argument("--dtype", default="float16", help="Storage type of the flat index")
+    args = parser.parse_args()
+
+    results = run(
+        vectors=args.vectors,
+        dimension=args.dimension,
+        queries=args.queries,
+        k=args.k,
+        nprobes=[int(n) for n in args.nprobe.split(",")],
+        rerank=args.rerank,
+        subquantizers=args.subquantizers,
+        dtype=args.dtype
+    )
+
+    print(f"{'Index':<22} {'memory':>10} {'p50':>9} {'p99':>9} {'recall@' + str(args.k):>10}")
+    for result in results:
+        print(f"{result['index']:<22} {result['memory_mb']:>8.1f}MB {result['p50_ms']:>7.2f}ms "
+              f"{result['p99_ms']:>7.2f}ms {result['recall']:>10.3f}")
+    if len(results) > 1:
+        print(f"IVF-PQ build: {results[1]['build_seconds']:.1f}s, {results[1]['lists']} lists")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark of query embedding micro-batching under concurrent load.
+
+Concurrent clients embed distinct questions, as retrievals of simultaneous
+requests do, against the local stub server standing in for the OpenAI API:
+first with one embedding request per question, then through
+BatchingEmbeddings, which sends the questions arriving together as one
+request. Reports throughput, API requests, client latency and the batch
+sizes and queueing delays of the batcher.
+
+Usage:
+    python -m rag_project.bench.query_batching --concurrency 1,8,32 --queries 2000 --wait-ms 5
+"""
+
+import argparse
+import threading
+import time
+from langchain_openai import OpenAIEmbeddings
+from rag_project.bench.embedding_backends import synthetic_chunks
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.core.embedding_batcher import BatchingEmbeddings
+from rag_project.utils.metrics import percentile
+
+def measure(embedding_model, questions, concurrency):
+    """
+    Embed questions with embed_query from concurrent clients.
+
+    Args:
+        embedding_model (Embeddings): Model embedding the questions
+        questions (list): Questions, each embedded once
+        concurrency (int): Simultaneous clients
+
+    Returns:
+        dict: Throughput and latency percentiles
+    """
+    latencies = []
+    lock = threading.Lock()
+    remaining = iter(questions)
+
+    def client():
+        while True:
+            with lock:
+                question = next(remaining, None)
+            if question is None:
+                return
+            start = time.perf_counter()
+            embedding_model.embed_query(question)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return {
+        "queries_s": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+def run(concurrency=(1, 8, 32), queries=2000, latency_ms=20, wait_ms=5, max_batch_size=64,
+        max_in_flight=4, seed=0):
+    """
+    Run the benchmark.
+
+    Args:
+        concurrency (iterable): Numbers of simultaneous clients to measure
+        queries (int): Questions embedded per measurement
+        latency_ms (float): Latency of the stub server, per request
+        wait_ms (float): Batching window of the batcher
+        max_batch_size (int): Queries per batched request
+        max_in_flight (int): Batches sent at once
+        seed (int): Seed of the synthetic questions
+
+    Returns:
+        list: One result dict per concurrency and mode
+    """
+    results = []
+    server = StubOpenAIServer(latency_ms=latency_ms).start()
+    try:
+        embedding_model = OpenAIEmbeddings(
+            model="text-embedding-3-small", base_url=server.base_url,
+            api_key="stub", check_embedding_ctx_length=False
+        )
+        # Warm-up (connections)
+        embedding_model.embed_query("bonjour")
+
+        for i, clients in enumerate(concurrency):
+            questions = synthetic_chunks(queries, seed=seed + 1 + i, sentences=(1, 2))
+            batcher = BatchingEmbeddings(
+                embedding_model, max_wait_ms=wait_ms, max_batch_size=max_batch_size, max_in_flight=max_in_flight
+            )
+            for mode, model in (("single", embedding_model), ("batched", batcher)):
+                requests_before = sum(server.requests.values())
+                result = {"concurrency": clients, "mode": mode}
+                result.update(measure(model, questions, clients))
+                result["requests"] = sum(server.requests.values()) - requests_before
+                if model is batcher:
+                    stats = batcher.batch_stats()
+                    result["mean_batch_size"] = stats["mean_batch_size"]
+                    result["wait_p95_ms"] = stats["wait"]["p95_ms"]
+                results.append(result)
+    finally:
+        server.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query embedding micro-batching under concurrent load")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated numbers of simultaneous clients")
+    parser.add_argument("--queries", type=int, default=2000, help="Questions embedded per measurement")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of the stub server")
+    parser.add_argument("--wait-ms", type=float, default=5, help="Batching window")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Queries per batched request")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Batches sent at once")
+    args = parser.parse_args()
+
+    results = run(
+        concurrency=[int(count) for count in args.concurrency.split(",")],
+        queries=args.queries,
+        latency_ms=args.latency_ms,
+        wait_ms=args.wait_ms,
+        max_batch_size=args.max_batch_size,
+        max_in_flight=args.max_in_flight
+    )
+
+    print(f"{'Clients':>7} {'Mode':<8} {'throughput':>14} {'API requests':>13} {'p50':>8} {'p95':>8} "
+          f"{'batch size':>11} {'wait p95':>9}")
+    for result in results:
+        batch = f"{result['mean_batch_size']:>11.1f} {result['wait_p95_ms']:>7.1f}ms" if "mean_batch_size" in result else ""
+        print(f"{result['concurrency']:>7} {result['mode']:<8} {result['queries_s']:>10.1f} q/s "
+              f"{result['requests']:>13} {result['p50_ms']:>6.1f}ms {result['p95_ms']:>6.1f}ms {batch}")
+
+if __name__ == "__main__":
+    main()
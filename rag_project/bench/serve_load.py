@@ -0,0 +1,244 @@
+"""Load test of the rag serve query API: throughput against the number of workers.
+
+Builds a flat vector database of synthetic chunks and starts the stub server
+standing in for the OpenAI API, each in its own process. Then, for each worker
+count, starts `rag serve`, waits until every worker is ready, and sends
+questions to POST /query from concurrent clients. Each request opens a new
+connection, so the kernel spreads them over the workers.
+
+Retrieval, context packing and the LangGraph machinery run on the CPU under
+the GIL, so one worker saturates a core; more workers should scale until
+the cores, or the stub server, run out. Run it on a machine with at least as
+many cores as the largest worker count.
+
+Usage:
+    python -m rag_project.bench.serve_load --workers 1,2,4 --concurrency 32 --requests 400
+    python -m rag_project.bench.serve_load --url http://127.0.0.1:8000 --concurrency 32
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+from rag_project.bench.embedding_backends import synthetic_chunks
+from rag_project.utils.metrics import percentile
+from rag_project.config import settings
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _request(url, method, path, body=None, timeout=120):
+    """Send one request on a new connection, return (status, decoded JSON)."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        connection.request(method, path, body=data, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+def wait_ready(url, workers, timeout=120):
+    """
+    Wait until every worker of a server answers /readyz.
+
+    Args:
+        url (str): Base URL of the server
+        workers (int): Number of workers expected
+        timeout (float): Seconds to wait
+
+    Raises:
+        TimeoutError: If not every worker was seen ready in time
+    """
+    ready = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, body = _request(url, "GET", "/readyz", timeout=5)
+            if status == 200:
+                ready.add(body["pid"])
+                if len(ready) >= workers:
+                    return
+                continue
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{len(ready)} of {workers} workers ready after {timeout}s")
+
+def measure(url, questions, concurrency):
+    """
+    Send questions to POST /query from concurrent clients.
+
+    Args:
+        url (str): Base URL of the server
+        questions (list): Questions, each sent once
+        concurrency (int): Simultaneous clients
+
+    Returns:
+        dict: Throughput, latency percentiles, errors and workers that answered
+    """
+    latencies, errors, workers = [], [], set()
+    lock = threading.Lock()
+    remaining = iter(questions)
+
+    def client():
+        while True:
+            with lock:
+                question = next(remaining, None)
+            if question is None:
+                return
+            start = time.perf_counter()
+            try:
+                status, _ = _request(url, "POST", "/query", {"question": question})
+            except OSError as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                (latencies if status == 200 else errors).append(elapsed if status == 200 else status)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return {
+        "requests_s": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "errors": len(errors),
+    }
+
+def build_index(persist_directory, base_url, chunks, seed=0):
+    """
+    Build a flat vector database of synthetic chunks, embedded by the stub server.
+
+    Args:
+        persist_directory (str): Directory of the database
+        base_url (str): Base URL of the stub server
+        chunks (int): Number of chunks
+        seed (int): Seed of the texts
+    """
+    from langchain_core.documents import Document
+    from langchain_openai import OpenAIEmbeddings
+    from rag_project.core.embeddings import create_vectorstore
+
+    documents = [
+        Document(page_content=text, metadata={"chunk_id": f"chunk-{i}", "source": f"synthetic-{i // 10}.md"})
+        for i, text in enumerate(synthetic_chunks(chunks, seed=seed))
+    ]
+    embeddings = OpenAIEmbeddings(
+        model=settings.EMBEDDING_MODEL, base_url=base_url, api_key="stub", check_embedding_ctx_length=False
+    )
+    create_vectorstore(documents, persist_directory=persist_directory, embedding_model=embeddings, backend="flat")
+
+def run(workers=(1, 2, 4), concurrency=32, requests=400, chunks=2000, latency_ms=20, seed=0, directory=None):
+    """
+    Run the load test against `rag serve` with each worker count.
+
+    Args:
+        workers (iterable): Worker counts to measure
+        concurrency (int): Simultaneous clients
+        requests (int): Questions sent per worker count
+        chunks (int): Number of indexed chunks
+        latency_ms (float): Latency of every stub API call
+        seed (int): Seed of the synthetic texts
+        directory (str): Where to build the workspace (default: a temporary directory)
+
+    Returns:
+        list: One result dict per worker count
+    """
+    results = []
+    with tempfile.TemporaryDirectory(dir=directory) as workspace:
+        stub_port = _free_port()
+        stub = subprocess.Popen([
+            sys.executable, "-m", "rag_project.bench.stub_server",
+            "--port", str(stub_port), "--latency-ms", str(latency_ms)
+        ], stdout=subprocess.DEVNULL)
+        try:
+            base_url = f"http://127.0.0.1:{stub_port}/v1"
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", stub_port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.1)
+
+            persist_directory = os.path.join(workspace, "vectorstore")
+            build_index(persist_directory, base_url, chunks, seed=seed)
+            environment = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="stub")
+
+            for i, count in enumerate(workers):
+                port = _free_port()
+                url = f"http://127.0.0.1:{port}"
+                server = subprocess.Popen([
+                    sys.executable, "-m", "rag_project.cli.main", "serve", "--workers", str(count),
+                    "--port", str(port), "--vectorstore-dir", persist_directory, "--backend", "flat"
+                ], env=environment, cwd=workspace, stdout=subprocess.DEVNULL)
+                try:
+                    wait_ready(url, count)
+                    # Distinct questions, so the answer cache never hits
+                    questions = synthetic_chunks(requests, seed=seed + 1 + i, sentences=(1, 2))
+                    result = {"workers": count}
+                    result.update(measure(url, questions, concurrency))
+                    results.append(result)
+                    print(f"{count} worker(s): {result['requests_s']:.1f} req/s, p95 {result['p95_ms']:.0f}ms")
+                finally:
+                    server.send_signal(signal.SIGTERM)
+                    server.wait(timeout=settings.SERVE_SHUTDOWN_TIMEOUT + 10)
+        finally:
+            stub.terminate()
+            stub.wait()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the rag serve query API against the number of workers")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=32, help="Simultaneous clients")
+    parser.add_argument("--requests", type=int, default=400, help="Questions sent per worker count")
+    parser.add_argument("--chunks", type=int, default=2000, help="Indexed chunks")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of every stub API call")
+    parser.add_argument("--url", help="Measure a running server instead of starting one")
+    args = parser.parse_args()
+
+    if args.url:
+        questions = synthetic_chunks(args.requests, seed=1, sentences=(1, 2))
+        result = measure(args.url, questions, args.concurrency)
+        print(f"{result['requests_s']:.1f} req/s, p50 {result['p50_ms']:.0f}ms, p95 {result['p95_ms']:.0f}ms, "
+              f"p99 {result['p99_ms']:.0f}ms, {result['errors']} errors")
+        return
+
+    results = run(
+        workers=[int(count) for count in args.workers.split(",")],
+        concurrency=args.concurrency,
+        requests=args.requests,
+        chunks=args.chunks,
+        latency_ms=args.latency_ms
+    )
+
+    print(f"\n{'Workers':>7} {'throughput':>14} {'speedup':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    baseline = results[0]["requests_s"] if results else 0
+    for result in results:
+        speedup = result["requests_s"] / baseline if baseline else 0
+        print(f"{result['workers']:>7} {result['requests_s']:>8.1f} req/s {speedup:>7.2f}x "
+              f"{result['p50_ms']:>7.0f}ms {result['p95_ms']:>7.0f}ms {result['p99_ms']:>7.0f}ms {result['errors']:>7}")
+    print(f"\n{os.cpu_count()} cores available")
+
+if __name__ == "__main__":
+    main()
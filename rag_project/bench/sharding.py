@@ -0,0 +1,114 @@
+"""Benchmark of sharded vector databases against the number of shards.
+
+Builds the same synthetic chunks into databases of 1, 2, 4... shards with the
+local stub server standing in for the OpenAI API, then searches the same
+query vectors in each. Reports build time, search latency, and the overlap
+of the top-k results with the single store (1.0 for the exact flat index;
+below 1.0 for the approximate PQ index, where each shard has its own
+quantizer).
+
+Shards are built and searched in threads. NumPy and Chroma release the GIL
+while they score vectors, so the gains grow with the cores available.
+
+Usage:
+    python -m rag_project.bench.sharding --backend flat --chunks 50000 --shards 1,2,4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from rag_project.bench.embedding_backends import synthetic_chunks
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.core.embeddings import create_vectorstore, search_by_vectors
+from rag_project.utils.clients import get_http_client, get_async_http_client
+from rag_project.utils.metrics import percentile
+
+def run(shards=(1, 2, 4), backend="flat", chunks=20000, queries=200, top_k=10, seed=0, directory=None):
+    """
+    Run the benchmark.
+
+    Args:
+        shards (iterable): Numbers of shards to measure, starting with the reference
+        backend (str): Vector store backend ("chroma", "flat" or "pq")
+        chunks (int): Number of indexed chunks
+        queries (int): Number of searched query vectors
+        top_k (int): Results per query
+        seed (int): Seed of the synthetic texts
+        directory (str): Where to build the databases (default: a temporary directory)
+
+    Returns:
+        list: One result dict per number of shards
+    """
+    documents = [
+        Document(page_content=text, metadata={"chunk_id": f"chunk-{i}", "source": f"synthetic-{i // 10}.md"})
+        for i, text in enumerate(synthetic_chunks(chunks, seed=seed))
+    ]
+    results = []
+    reference = None
+
+    server = StubOpenAIServer().start()
+    try:
+        # Pooled clients open connections per event loop, and every build runs its own loops
+        embedding_model = OpenAIEmbeddings(
+            model="text-embedding-3-small", base_url=server.base_url, api_key="stub",
+            check_embedding_ctx_length=False, http_client=get_http_client(), http_async_client=get_async_http_client()
+        )
+        vectors = embedding_model.embed_documents(synthetic_chunks(queries, seed=seed + 1, sentences=(1, 2)))
+        with tempfile.TemporaryDirectory(dir=directory) as workspace:
+            for count in shards:
+                start = time.perf_counter()
+                vectorstore = create_vectorstore(
+                    documents, persist_directory=os.path.join(workspace, f"shards-{count}"),
+                    embedding_model=embedding_model, backend=backend, shards=count, lexical=False
+                )
+                build_seconds = time.perf_counter() - start
+
+                search_by_vectors(vectorstore, vectors[:1], top_k)  # warm-up (page cache, threads)
+                latencies, found = [], []
+                for vector in vectors:
+                    start = time.perf_counter()
+                    hits = search_by_vectors(vectorstore, [vector], top_k)[0]
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found.append({doc.metadata["chunk_id"] for doc, _ in hits})
+
+                if reference is None:
+                    reference = found
+                results.append({
+                    "shards": count,
+                    "build_s": build_seconds,
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                    "overlap": sum(len(a & b) for a, b in zip(found, reference)) / max(1, sum(map(len, reference))),
+                })
+    finally:
+        server.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded vector databases against the number of shards")
+    parser.add_argument("--shards", default="1,2,4", help="Comma-separated numbers of shards")
+    parser.add_argument("--backend", default="flat", help="Vector store backend: chroma, flat or pq")
+    parser.add_argument("--chunks", type=int, default=20000, help="Indexed chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Searched query vectors")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    args = parser.parse_args()
+
+    results = run(
+        shards=[int(count) for count in args.shards.split(",")],
+        backend=args.backend,
+        chunks=args.chunks,
+        queries=args.queries,
+        top_k=args.top_k
+    )
+
+    print(f"\n{'Shards':>6} {'build':>9} {'p50':>9} {'p95':>9} {'same top-k':>11}")
+    for result in results:
+        print(f"{result['shards']:>6} {result['build_s']:>8.2f}s {result['p50_ms']:>7.2f}ms "
+              f"{result['p95_ms']:>7.2f}ms {result['overlap']:>10.1%}")
+    print(f"\n{os.cpu_count()} cores available")
+
+if __name__ == "__main__":
+    main()
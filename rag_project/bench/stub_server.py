@@ -0,0 +1,305 @@
+"""Local OpenAI-compatible stub server for tests and benchmarks.
+
+Serves deterministic embeddings and chat completions (optionally streamed)
+without network access
+or API costs, with configurable injected latency and rate limiting.
+
+Usage:
+    python -m rag_project.bench.stub_server --port 8900 --latency-ms 50 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub rag ingest
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def stub_embedding(text, dimensions):
+    """
+    Compute a deterministic, unit-length pseudo-embedding of a text.
+
+    Args:
+        text (str): Text to embed
+        dimensions (int): Size of the vector
+
+    Returns:
+        list: Vector of floats
+    """
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(struct.unpack("<8i", digest))
+        counter += 1
+    vector = [v / 2 ** 31 for v in values[:dimensions]]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the subset of the OpenAI API used by the project."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks, delay):
+        """Send server-sent events with chunked transfer encoding, pausing before each chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay)
+            event = f"data: {chunk if isinstance(chunk, str) else json.dumps(chunk)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        self.server.stub.record_request(self.path)
+        if self.path.rstrip("/").endswith("/models"):
+            # Requested by clients.warm_up to open connections
+            self._send_json(200, {"object": "list", "data": []})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+
+    def do_POST(self):
+        stub = self.server.stub
+        request = self._read_json()
+        stub.record_request(self.path)
+
+        if stub.should_rate_limit():
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}},
+                headers={"Retry-After": str(stub.retry_after)}
+            )
+            return
+
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if self.path.rstrip("/").endswith("/embeddings"):
+            self._send_json(200, stub.embeddings_response(request))
+        elif self.path.rstrip("/").endswith("/chat/completions") and request.get("stream"):
+            self._send_stream(stub.chat_stream_chunks(request), stub.token_latency)
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(200, stub.chat_response(request))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for load tests."""
+
+    daemon_threads = True
+    # The default backlog of 5 drops connections under hundreds of concurrent clients
+    request_queue_size = 1024
+
+class StubOpenAIServer:
+    """OpenAI-compatible server answering with deterministic fake results."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, rate_limit_rate=0.0,
+                 retry_after=0.05, dimensions=1536, completion_words=60, token_latency_ms=0, seed=0):
+        """
+        Initialize the server.
+
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind, 0 picks a free port
+            latency_ms (float): Latency injected into every successful response
+            rate_limit_rate (float): Fraction of requests answered with HTTP 429
+            retry_after (float): Retry-After value sent with 429 responses, in seconds
+            dimensions (int): Size of the returned embeddings
+            completion_words (int): Maximum words of the returned chat completions
+            token_latency_ms (float): Delay between the tokens of streamed chat completions
+            seed (int): Seed of the rate-limit injection, for reproducible runs
+        """
+        self.latency = latency_ms / 1000.0
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.dimensions = dimensions
+        self.completion_words = completion_words
+        self.token_latency = token_latency_ms / 1000.0
+        self.requests = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.httpd = StubHTTPServer((host, port), StubHandler)
+        self.httpd.stub = self
+
+    @property
+    def base_url(self):
+        """Base URL to pass as OPENAI_BASE_URL."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self, path):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def should_rate_limit(self):
+        with self._lock:
+            return self._random.random() < self.rate_limit_rate
+
+    def embeddings_response(self, request):
+        """Build the response of a /v1/embeddings request."""
+        inputs = request.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+
+        data = []
+        total_tokens = 0
+        for index, item in enumerate(inputs):
+            # Clients may send token ids instead of text
+            text = item if isinstance(item, str) else " ".join(map(str, item))
+            total_tokens += len(item) if isinstance(item, list) else max(1, len(item) // 4)
+            embedding = stub_embedding(text, request.get("dimensions") or self.dimensions)
+            if request.get("encoding_format") == "base64":
+                # Like the real API, which the openai client asks for base64 float32 by default
+                embedding = base64.b64encode(struct.pack(f"<{len(embedding)}f", *embedding)).decode("ascii")
+            data.append({
+                "object": "embedding",
+                "index": index,
+                "embedding": embedding,
+            })
+
+        return {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "stub"),
+            "usage": {"prompt_tokens": total_tokens, "total_tokens": total_tokens},
+        }
+
+    def completion_text(self, request):
+        """Build the deterministic answer of a chat request from its last message."""
+        messages = request.get("messages") or [{"content": ""}]
+        content = messages[-1].get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content)
+        words = content.split()[-self.completion_words:]
+        return "Réponse simulée : " + " ".join(words)
+
+    def chat_response(self, request):
+        """Build the response of a /v1/chat/completions request."""
+        text = self.completion_text(request)
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in request.get("messages", []))
+        completion_tokens = max(1, len(text) // 4)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def chat_stream_chunks(self, request):
+        """
+        Build the events of a streamed /v1/chat/completions request, one word per token.
+
+        Returns:
+            list: Chunk payloads, ending with the "[DONE]" marker
+        """
+        response = self.chat_response(request)
+        words = response["choices"][0]["message"]["content"].split(" ")
+        base = {"id": response["id"], "object": "chat.completion.chunk",
+                "created": response["created"], "model": response["model"]}
+
+        def chunk(delta, finish_reason=None):
+            return dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+
+        chunks = [chunk({"role": "assistant", "content": ""})]
+        chunks.extend(chunk({"content": word if i == 0 else " " + word}) for i, word in enumerate(words))
+        chunks.append(chunk({}, finish_reason="stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunks.append(dict(base, choices=[], usage=response["usage"]))
+        chunks.append("[DONE]")
+        return chunks
+
+    def start(self):
+        """
+        Serve requests in a background thread.
+
+        Returns:
+            StubOpenAIServer: The started server
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    """Run the stub server in the foreground."""
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8900, help="Port to bind")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Size of the returned embeddings")
+    parser.add_argument("--completion-words", type=int, default=60, help="Maximum words of chat completions")
+    parser.add_argument("--token-latency-ms", type=float, default=0, help="Delay between streamed tokens")
+    args = parser.parse_args()
+
+    server = StubOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        rate_limit_rate=args.rate_limit_rate,
+        dimensions=args.dimensions,
+        completion_words=args.completion_words,
+        token_latency_ms=args.token_latency_ms
+    )
+    print(f"Stub OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Offline performance benchmark suite of the RAG pipeline (rag bench).
+
+Generates a synthetic French-markdown corpus, starts the local stub server
+standing in for the OpenAI embedding and chat endpoints (deterministic
+results, configurable latency), then runs each stage of the pipeline on it:
+
+- process: process_files, cleaning and rewriting every file
+- load_documents: load_documents on the corpus
+- create_chunks: create_chunks on the loaded documents
+- create_vectorstore: embedding and indexing of the chunks
+- retrieve: DocumentRetriever.get_relevant_documents, one question at a time
+- rag_chain: rag_chain.invoke, one question at a time
+
+Each scenario reports its throughput, the p50/p95/p99 latency of one
+operation (one question, or one full run for batch stages repeated with
+--repeat) and its peak resident memory. Results are written as JSON; pass a
+previous file to --compare to see the changes.
+
+Usage:
+    rag bench --documents 200 --queries 100 --latency-ms 20 --output bench.json
+    rag bench --scenarios retrieve,rag_chain --compare bench.json
+"""
+
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from rag_project.bench.corpus import synthetic_corpus, synthetic_sentence
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.utils.metrics import percentile
+from rag_project.config import settings
+
+SCENARIOS = ("process", "load_documents", "create_chunks", "create_vectorstore", "retrieve", "rag_chain")
+
+class PeakMemory:
+    """
+    Peak resident memory of the process while a block runs.
+
+    RSS is sampled from /proc/self/statm in a background thread. Where it is
+    not available, the process-wide peak from getrusage is reported instead.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _rss_mb():
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self._rss_mb())
+
+    def __enter__(self):
+        self.peak_mb = self._rss_mb()
+        if self.peak_mb is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = max(self.peak_mb, self._rss_mb())
+        else:
+            import resource
+            # ru_maxrss is in KiB on Linux, bytes on macOS
+            scale = 2**20 if sys.platform == "darwin" else 2**10
+            self.peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def write_corpus(directory, documents, seed=0, paragraphs=8):
+    """
+    Write a synthetic markdown corpus.
+
+    Args:
+        directory (str): Directory to write the files to
+        documents (int): Number of files
+        seed (int): Seed of the texts
+        paragraphs (int): Paragraphs per file
+
+    Returns:
+        int: Number of bytes written
+    """
+    os.makedirs(directory, exist_ok=True)
+    size = 0
+    for i, text in enumerate(synthetic_corpus(documents, seed=seed, paragraphs=paragraphs)):
+        with open(os.path.join(directory, f"article_{i:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(text)
+        size += len(text.encode("utf-8"))
+    return size
+
+def _measure(name, unit, operation, runs):
+    """
+    Run an operation and summarize it.
+
+    Args:
+        name (str): Scenario name
+        unit (str): What the throughput counts
+        operation (callable): Called with the run index, returns the number of items processed
+        runs (int): Number of calls
+
+    Returns:
+        dict: Scenario result
+    """
+    latencies, items = [], 0
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        for i in range(runs):
+            run_start = time.perf_counter()
+            items += operation(i)
+            latencies.append((time.perf_counter() - run_start) * 1000)
+        seconds = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "items": items,
+        "unit": unit,
+        "seconds": seconds,
+        "throughput": items / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "peak_rss_mb": memory.peak_mb,
+    }
+
+def run(scenarios=SCENARIOS, documents=100, paragraphs=8, queries=100, latency_ms=20, token_latency_ms=0,
+        backend="flat", repeat=1, seed=0, directory=None):
+    """
+    Run the benchmark suite.
+
+    Args:
+        scenarios (iterable): Scenarios to run, in pipeline order
+        documents (int): Files of the synthetic corpus
+        paragraphs (int): Paragraphs per file
+        queries (int): Questions of the retrieve and rag_chain scenarios
+        latency_ms (float): Latency of every stub API call
+        token_latency_ms (float): Delay between streamed tokens of the stub
+        backend (str): Vector store backend ("chroma", "flat" or "pq")
+        repeat (int): Runs of the batch scenarios (process to create_vectorstore)
+        seed (int): Seed of the corpus and questions
+        directory (str): Where to build the workspace (default: a temporary directory)
+
+    Returns:
+        dict: Parameters, environment and one result per scenario
+    """
+    from langchain_core.documents import Document
+    from langchain_core.messages import HumanMessage
+    from langchain_openai import OpenAIEmbeddings
+
+    scenarios = [name for name in SCENARIOS if name in set(scenarios)]
+    results = []
+    server = StubOpenAIServer(latency_ms=latency_ms, token_latency_ms=token_latency_ms).start()
+    try:
+        with tempfile.TemporaryDirectory(dir=directory) as workspace:
+            input_dir = os.path.join(workspace, "input")
+            persist_directory = os.path.join(workspace, "vectorstore")
+            corpus_bytes = write_corpus(input_dir, documents, seed=seed, paragraphs=paragraphs)
+
+            # Every API call goes to the stub, and every call is measured
+            settings.OPENAI_BASE_URL = server.base_url
+            settings.OPENAI_API_KEY = "stub"
+            settings.VECTORSTORE_DIR = persist_directory
+            settings.VECTORSTORE_BACKEND = backend
+            settings.EMBEDDING_CACHE_ENABLED = False
+            settings.REWRITE_CACHE_ENABLED = False
+            settings.RAG_CACHE_ENABLED = False
+
+            def stub_embeddings():
+                return OpenAIEmbeddings(
+                    model=settings.EMBEDDING_MODEL, base_url=server.base_url,
+                    api_key="stub", check_embedding_ctx_length=False
+                )
+
+            def record(result):
+                results.append(result)
+                print(f"{result['scenario']}: {result['throughput']:.1f} {result['unit']}/s, "
+                      f"p95 {result['p95_ms']:.1f}ms")
+
+            def failed(name, error):
+                results.append({"scenario": name, "error": f"{type(error).__name__}: {error}"})
+                print(f"{name}: failed ({type(error).__name__}: {error})")
+
+            if "process" in scenarios:
+                from rag_project.data_processing.processors import process_files
+                output_dir = os.path.join(workspace, "processed")
+                record(_measure("process", "files", lambda i: process_files(
+                    input_dir=input_dir, output_dir=f"{output_dir}_{i}", clean_only=False
+                ), repeat))
+
+            from rag_project.data_processing.ingest import load_documents, create_chunks, list_files
+            loaded = None
+            if "load_documents" in scenarios:
+                def load(_):
+                    nonlocal loaded
+                    loaded = load_documents(directory=input_dir, show_progress=False)
+                    return len(loaded)
+                try:
+                    record(_measure("load_documents", "documents", load, repeat))
+                except ImportError as e:
+                    # The markdown loader needs unstructured[md]
+                    failed("load_documents", e)
+            if loaded is None:
+                loaded = []
+                for path in list_files(input_dir):
+                    with open(path, "r", encoding="utf-8") as f:
+                        loaded.append(Document(page_content=f.read(), metadata={"source": path}))
+
+            chunks = None
+            def chunk(_):
+                nonlocal chunks
+                chunks = create_chunks(loaded)
+                return len(chunks)
+            if "create_chunks" in scenarios:
+                record(_measure("create_chunks", "chunks", chunk, repeat))
+            needs_index = {"create_vectorstore", "retrieve", "rag_chain"} & set(scenarios)
+            if chunks is None and needs_index:
+                chunk(0)
+
+            if needs_index:
+                from rag_project.core.embeddings import create_vectorstore
+                from rag_project.data_processing.manifest import assign_chunk_ids
+                ids = assign_chunk_ids(chunks)
+                def index(_):
+                    create_vectorstore(
+                        chunks, persist_directory=persist_directory, embedding_model=stub_embeddings(), ids=ids
+                    )
+                    return len(chunks)
+                if "create_vectorstore" in scenarios:
+                    record(_measure("create_vectorstore", "chunks", index, repeat))
+                else:
+                    index(0)
+
+            rng = random.Random(seed + 1)
+            questions = [synthetic_sentence(rng) for _ in range(queries)]
+            if "retrieve" in scenarios or "rag_chain" in scenarios:
+                from rag_project.core.retriever import DocumentRetriever
+                retriever = DocumentRetriever(persist_directory=persist_directory, embedding_model=stub_embeddings())
+                if "retrieve" in scenarios:
+                    def retrieve(i):
+                        retriever.get_relevant_documents(questions[i])
+                        return 1
+                    record(_measure("retrieve", "queries", retrieve, queries))
+                if "rag_chain" in scenarios:
+                    from rag_project.core import rag_graph
+                    rag_graph.doc_retriever = retriever
+                    rag_graph.rag_cache = None
+                    chain = rag_graph.get_rag_chain()
+                    def answer(i):
+                        chain.invoke({"messages": [HumanMessage(content=questions[i])], "context": []})
+                        return 1
+                    record(_measure("rag_chain", "queries", answer, queries))
+    finally:
+        server.stop()
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "documents": documents, "paragraphs": paragraphs, "corpus_bytes": corpus_bytes,
+            "queries": queries, "latency_ms": latency_ms, "token_latency_ms": token_latency_ms,
+            "backend": backend, "repeat": repeat, "seed": seed,
+        },
+        "scenarios": results,
+    }
+
+def compare(report, previous):
+    """
+    Compare two reports scenario by scenario.
+
+    Args:
+        report (dict): Current results
+        previous (dict): Results of an earlier run
+
+    Returns:
+        list: Per scenario present in both, the relative change of throughput and p95 latency
+    """
+    before = {result["scenario"]: result for result in previous.get("scenarios", []) if "error" not in result}
+    changes = []
+    for result in report["scenarios"]:
+        old = before.get(result["scenario"])
+        if "error" in result or old is None:
+            continue
+        changes.append({
+            "scenario": result["scenario"],
+            "throughput_change": result["throughput"] / old["throughput"] - 1 if old["throughput"] else None,
+            "p95_change": result["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else None,
+        })
+    return changes
+
+def print_report(report, changes=None):
+    """Print the results as a table, with the changes from a previous run if given."""
+    print(f"\n{'Scenario':<20} {'throughput':>18} {'p50':>10} {'p95':>10} {'p99':>10} {'peak RSS':>10}")
+    for result in report["scenarios"]:
+        if "error" in result:
+            print(f"{result['scenario']:<20} {result['error']}")
+            continue
+        throughput = f"{result['throughput']:.1f} {result['unit']}/s"
+        print(f"{result['scenario']:<20} {throughput:>18} {result['p50_ms']:>8.1f}ms {result['p95_ms']:>8.1f}ms "
+              f"{result['p99_ms']:>8.1f}ms {result['peak_rss_mb'] or 0:>8.0f}MB")
+    if changes:
+        print(f"\n{'Scenario':<20} {'throughput':>12} {'p95':>10}  (change from the previous run)")
+        for change in changes:
+            throughput = "-" if change["throughput_change"] is None else f"{change['throughput_change']:+.1%}"
+            p95 = "-" if change["p95_change"] is None else f"{change['p95_change']:+.1%}"
+            print(f"{change['scenario']:<20} {throughput:>12} {p95:>10}")
+
+def main(args):
+    """
+    Run the suite from the rag bench arguments, print and save the results.
+
+    Args:
+        args: Parsed command line arguments of rag bench
+    """
+    scenarios = SCENARIOS if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(SCENARIOS)})")
+
+    report = run(
+        scenarios=scenarios,
+        documents=args.documents,
+        paragraphs=args.paragraphs,
+        queries=args.queries,
+        latency_ms=args.latency_ms,
+        token_latency_ms=args.token_latency_ms,
+        backend=args.backend,
+        repeat=args.repeat,
+        seed=args.seed
+    )
+
+    changes = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            changes = compare(report, json.load(f))
+        report["compared_to"] = args.compare
+        report["changes"] = changes
+    print_report(report, changes)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved in {args.output}")
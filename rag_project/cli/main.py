@@ -1,14 +1,16 @@
 """Command-line interface for the RAG application."""
 
 import argparse
+import contextlib
 import sys
 import textwrap
 import os
-from rag_project.data.ingest import load_documents, create_chunks
-from rag_project.core.embeddings import create_vectorstore
-from rag_project.data.processors import process_files
+from rag_project.utils.tracing import tracer
 from rag_project.config import settings
 
+# Commands import their dependencies (LangChain, Chroma, OpenAI clients) when
+# they run, so the CLI starts fast; check with python -m rag_project.bench.import_time
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
@@ -17,20 +19,68 @@ def parse_args():
     )
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
     
+    # Options shared by every command
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument("--profile", nargs="?", const=settings.PROFILE_DIR, metavar="DIR",
+                               help=f"Save cProfile and tracemalloc snapshots of the command (default directory: {settings.PROFILE_DIR})")
+    
     # Ingest command
-    ingest_parser = subparsers.add_parser("ingest", help="Ingest documents into the vector database")
+    ingest_parser = subparsers.add_parser("ingest", parents=[common_parser], help="Ingest documents into the vector database")
     ingest_parser.add_argument("--input-dir", help="Directory containing input files", default=settings.INPUT_DATA_DIR)
     ingest_parser.add_argument("--chunk-size", type=int, help="Size of document chunks", default=500)
     ingest_parser.add_argument("--chunk-overlap", type=int, help="Overlap between chunks", default=100)
+    ingest_parser.add_argument("--incremental", action="store_true", help="Only embed new or changed chunks and delete removed ones")
+    ingest_parser.add_argument("--stream", action="store_true", help="Stream files through chunking and embedding with bounded memory")
+    ingest_parser.add_argument("--concurrency", type=int, help="Concurrent embedding requests", default=settings.EMBEDDING_CONCURRENCY)
+    ingest_parser.add_argument("--batch-tokens", type=int, help="Maximum tokens per embedding request", default=settings.EMBEDDING_BATCH_MAX_TOKENS)
     
     # Process command
-    process_parser = subparsers.add_parser("process", help="Process text files")
+    process_parser = subparsers.add_parser("process", parents=[common_parser], help="Process text files")
     process_parser.add_argument("--input-dir", help="Directory containing input files", default=settings.INPUT_DATA_DIR)
     process_parser.add_argument("--output-dir", help="Directory to save processed files", default=settings.PROCESSED_DATA_DIR)
     process_parser.add_argument("--clean-only", action="store_true", help="Only clean text without rewriting")
+    process_parser.add_argument("--parallel", action="store_true", help="Clean on a process pool and rewrite concurrently")
+    process_parser.add_argument("--workers", type=int, help="Number of cleaning processes (default: number of cores)", default=settings.PROCESS_WORKERS)
+    process_parser.add_argument("--rewrite-concurrency", type=int, help="Concurrent rewrite requests", default=settings.REWRITE_CONCURRENCY)
+    process_parser.add_argument("--no-resume", action="store_true", help="Reprocess files already recorded in the journal")
+    
+    # Reshard command
+    reshard_parser = subparsers.add_parser("reshard", parents=[common_parser], help="Re-partition the vector database over a new number of shards")
+    reshard_parser.add_argument("--shards", type=int, required=True, help="New number of shards, 1 for a single store")
+    reshard_parser.add_argument("--vectorstore-dir", help="Vector database directory", default=settings.VECTORSTORE_DIR)
+    reshard_parser.add_argument("--backend", choices=["chroma", "flat", "pq"], help="Vector store backend", default=settings.VECTORSTORE_BACKEND)
+    
+    # Calibrate command
+    calibrate_parser = subparsers.add_parser("calibrate", parents=[common_parser], help="Derive adaptive retrieval thresholds from test questions")
+    calibrate_parser.add_argument("--test-dir", help="Directory containing the labelled questions", default=settings.TEST_DATA_DIR)
+    calibrate_parser.add_argument("--top-k", type=int, help="Results searched per question", default=settings.DEFAULT_TOP_K)
+    calibrate_parser.add_argument("--dry-run", action="store_true", help="Print the thresholds without saving them")
+    
+    # Benchmark command
+    bench_parser = subparsers.add_parser("bench", parents=[common_parser], help="Benchmark the pipeline offline against stub OpenAI endpoints")
+    bench_parser.add_argument("--documents", type=int, help="Files of the synthetic corpus", default=100)
+    bench_parser.add_argument("--paragraphs", type=int, help="Paragraphs per file", default=8)
+    bench_parser.add_argument("--queries", type=int, help="Questions of the retrieval and chain scenarios", default=100)
+    bench_parser.add_argument("--latency-ms", type=float, help="Latency of every stub API call", default=20)
+    bench_parser.add_argument("--token-latency-ms", type=float, help="Delay between streamed tokens of the stub", default=0)
+    bench_parser.add_argument("--backend", choices=["chroma", "flat", "pq"], help="Vector store backend", default=settings.VECTORSTORE_BACKEND)
+    bench_parser.add_argument("--scenarios", help="Comma-separated scenarios (default: all)", default="all")
+    bench_parser.add_argument("--repeat", type=int, help="Runs of the batch scenarios", default=1)
+    bench_parser.add_argument("--seed", type=int, help="Seed of the corpus and questions", default=0)
+    bench_parser.add_argument("--output", help="JSON file to save the results to")
+    bench_parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    
+    # Query API command
+    serve_parser = subparsers.add_parser("serve", parents=[common_parser], help="Serve the JSON/SSE query API with pre-forked workers")
+    serve_parser.add_argument("--host", help="Interface to bind", default=settings.SERVE_HOST)
+    serve_parser.add_argument("--port", type=int, help="Port to bind", default=settings.SERVE_PORT)
+    serve_parser.add_argument("--workers", type=int, help="Worker processes (default: number of cores)", default=settings.SERVE_WORKERS)
+    serve_parser.add_argument("--vectorstore-dir", help="Vector database directory", default=settings.VECTORSTORE_DIR)
+    serve_parser.add_argument("--backend", choices=["chroma", "flat", "pq"], help="Vector store backend", default=settings.VECTORSTORE_BACKEND)
     
     # Web interface command
-    web_parser = subparsers.add_parser("web", help="Launch web interface")
+    web_parser = subparsers.add_parser("web", parents=[common_parser], help="Launch web interface")
+    web_parser.add_argument("--api-url", help="URL of a rag serve API to query instead of an in-process chain", default=settings.WEB_API_URL)
     
     return parser.parse_args()
 
@@ -41,18 +91,75 @@ def ingest_command(args):
     Args:
         args: Command line arguments
     """
+    from rag_project.data_processing.ingest import load_documents, create_chunks, iter_documents, iter_chunks
+    from rag_project.data_processing.incremental import incremental_ingest, record_ingest, ManifestRecorder
+    from rag_project.data_processing.manifest import assign_chunk_ids, iter_with_chunk_ids
+    from rag_project.core.embeddings import create_vectorstore
+    
+    if args.incremental:
+        print(f"Incrementally ingesting documents from {args.input_dir}...")
+        with tracer.span("incremental_ingest"):
+            stats = incremental_ingest(
+                directory=args.input_dir,
+                chunk_size=args.chunk_size,
+                chunk_overlap=args.chunk_overlap,
+                concurrency=args.concurrency,
+                max_batch_tokens=args.batch_tokens
+            )
+        print(f"Files: {stats['files_added']} added, {stats['files_updated']} updated, "
+              f"{stats['files_removed']} removed, {stats['files_unchanged']} unchanged")
+        print(f"Chunks: {stats['chunks_added']} added, {stats['chunks_removed']} removed, "
+              f"{stats['chunks_unchanged']} unchanged")
+        print("Ingestion complete!")
+        return
+    
+    if args.stream:
+        print(f"Streaming documents from {args.input_dir} with size={args.chunk_size}, overlap={args.chunk_overlap}...")
+        # Loader, splitter and embedder are chained generators: the embedding
+        # pipeline only pulls more files when its bounded queue has room
+        chunks = iter_with_chunk_ids(iter_chunks(
+            iter_documents(directory=args.input_dir),
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap
+        ))
+        recorder = ManifestRecorder()
+        with tracer.span("stream_ingest"):
+            create_vectorstore(
+                documents=recorder.track(chunks),
+                concurrency=args.concurrency,
+                max_batch_tokens=args.batch_tokens
+            )
+        recorder.save(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        print("Ingestion complete!")
+        return
+    
     print(f"Loading documents from {args.input_dir}...")
-    documents = load_documents(directory=args.input_dir)
+    with tracer.span("load_documents") as span:
+        documents = load_documents(directory=args.input_dir)
+        span.set(documents=len(documents))
     
     print(f"Creating chunks with size={args.chunk_size}, overlap={args.chunk_overlap}...")
-    chunks = create_chunks(
-        documents=documents,
-        chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
-    )
+    with tracer.span("create_chunks") as span:
+        chunks = create_chunks(
+            documents=documents,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap
+        )
+        span.set(chunks=len(chunks))
     
     print("Creating vector database...")
-    create_vectorstore(documents=chunks)
+    with tracer.span("create_vectorstore"):
+        chunk_ids = assign_chunk_ids(chunks)
+        create_vectorstore(
+            documents=chunks,
+            ids=chunk_ids,
+            concurrency=args.concurrency,
+            max_batch_tokens=args.batch_tokens
+        )
+    
+    # Record what was ingested so later runs can be incremental
+    with tracer.span("record_ingest"):
+        record_ingest(chunks, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
     
     print("Ingestion complete!")
 
@@ -63,14 +170,88 @@ def process_command(args):
     Args:
         args: Command line arguments
     """
+    from rag_project.data_processing.processors import process_files, process_files_parallel
+    
     print(f"Processing files from {args.input_dir} to {args.output_dir}...")
-    num_files = process_files(
-        input_dir=args.input_dir,
-        output_dir=args.output_dir,
-        clean_only=args.clean_only
-    )
+    with tracer.span("process_files", parallel=args.parallel, clean_only=args.clean_only):
+        if args.parallel:
+            num_files = process_files_parallel(
+                input_dir=args.input_dir,
+                output_dir=args.output_dir,
+                clean_only=args.clean_only,
+                workers=args.workers,
+                rewrite_concurrency=args.rewrite_concurrency,
+                resume=not args.no_resume
+            )
+        else:
+            num_files = process_files(
+                input_dir=args.input_dir,
+                output_dir=args.output_dir,
+                clean_only=args.clean_only
+            )
     print(f"Processed {num_files} files!")
 
+def reshard_command(args):
+    """
+    Re-partition the vector database over a new number of shards.
+    
+    Args:
+        args: Command line arguments
+    """
+    from rag_project.core.embeddings import reshard_vectorstore
+    
+    print(f"Re-partitioning {args.vectorstore_dir} over {args.shards} shard(s)...")
+    reshard_vectorstore(args.shards, persist_directory=args.vectorstore_dir, backend=args.backend)
+
+def calibrate_command(args):
+    """
+    Calibrate the adaptive retrieval thresholds of the vector database.
+    
+    Args:
+        args: Command line arguments
+    """
+    from rag_project.core.calibration import load_questions, calibrate, save_calibration
+    from rag_project.core.retriever import DocumentRetriever
+    
+    questions = load_questions(args.test_dir)
+    print(f"Calibrating on {len(questions)} questions from {args.test_dir}...")
+    retriever = DocumentRetriever(persist_directory=settings.VECTORSTORE_DIR, top_k=args.top_k)
+    calibration = calibrate(retriever, questions)
+    
+    print(f"Questions: {calibration['answerable']} answerable, {calibration['unanswerable']} unanswerable")
+    print(f"Distance threshold: {calibration['max_distance']:.4f} "
+          f"({calibration['accuracy']:.0%} of questions classified correctly)")
+    if calibration["score_gap"] is not None:
+        print(f"Score gap: {calibration['score_gap']:.3f}")
+    if args.dry_run:
+        return
+    save_calibration(settings.VECTORSTORE_DIR, calibration)
+    print(f"Calibration saved in {settings.VECTORSTORE_DIR}")
+
+def bench_command(args):
+    """
+    Run the offline performance benchmark suite.
+    
+    Args:
+        args: Command line arguments
+    """
+    from rag_project.bench.suite import main as run_bench
+    
+    run_bench(args)
+
+def serve_command(args):
+    """
+    Serve the query API.
+    
+    Args:
+        args: Command line arguments
+    """
+    from rag_project.web.server import serve
+    
+    settings.VECTORSTORE_DIR = args.vectorstore_dir
+    settings.VECTORSTORE_BACKEND = args.backend
+    sys.exit(serve(host=args.host, port=args.port, workers=args.workers))
+
 def web_command(args):
     """
     Launch web interface.
@@ -80,6 +261,7 @@ def web_command(args):
     """
     from rag_project.web.app import launch_app
     
+    settings.WEB_API_URL = args.api_url
     print("Launching web interface...")
     launch_app()
 
@@ -95,7 +277,9 @@ def print_custom_help():
     │                        RAG PROJECT USER GUIDE                          │
     ╰────────────────────────────────────────────────────────────────────────╯
     
-    This RAG (Retrieval Augmented Generation) tool offers the following commands:
+    This RAG (Retrieval Augmented Generation) tool offers the following commands.
+    Every command accepts --profile [DIR] to save cProfile and tracemalloc
+    snapshots of its run (default directory: {}).
     
     ╭─────────────────────╮
     │  1. PROCESS COMMAND │
@@ -110,6 +294,11 @@ def print_custom_help():
       --input-dir   : Directory with markdown files (default: {})
       --output-dir  : Directory to save processed files (default: {})
       --clean-only  : Only clean text without rewriting
+      --parallel    : Clean on a process pool and rewrite concurrently,
+                      resuming interrupted runs from a journal
+      --workers     : Number of cleaning processes (default: number of cores)
+      --rewrite-concurrency : Concurrent rewrite requests (default: {})
+      --no-resume   : Reprocess files already recorded in the journal
     
     ╭────────────────────╮
     │  2. INGEST COMMAND │
@@ -124,19 +313,124 @@ def print_custom_help():
       --input-dir     : Directory with markdown files (default: {})
       --chunk-size    : Size of text chunks (default: 500)
       --chunk-overlap : Overlap between chunks (default: 100)
+      --incremental   : Only embed new or changed chunks and delete removed ones
+      --stream        : Stream files through chunking and embedding with
+                        memory bounded by batch size, not corpus size
+      --concurrency   : Concurrent embedding requests (default: {})
+      --batch-tokens  : Maximum tokens per embedding request (default: {})
+    
+    ╭─────────────────────╮
+    │  3. RESHARD COMMAND │
+    ╰─────────────────────╯
+    
+    Re-partition the vector database over a new number of shards, offline
+    and without re-embedding. Chunks are placed by source file; searches
+    query the shards in parallel and merge their results. New databases
+    get VECTORSTORE_SHARDS shards (default: {}).
+    
+    Example:
+      rag reshard --shards 4
+      
+    Options:
+      --shards          : New number of shards, 1 for a single store
+      --vectorstore-dir : Vector database directory (default: {})
+      --backend         : Vector store backend (default: {})
+    
+    ╭───────────────────────╮
+    │  4. CALIBRATE COMMAND │
+    ╰───────────────────────╯
+    
+    Derive the distance threshold and score gap of adaptive retrieval
+    from labelled questions in the test directory ({}),
+    one JSON object per line: {{"question": "...", "answerable": true}}
+    
+    Example:
+      rag calibrate --test-dir data/test_data
+      
+    Options:
+      --test-dir : Labelled questions directory (default: {})
+      --top-k    : Results searched per question (default: {})
+      --dry-run  : Print the thresholds without saving them
+    
+    ╭───────────────────╮
+    │  5. BENCH COMMAND │
+    ╰───────────────────╯
+    
+    Benchmark processing, chunking, indexing, retrieval and the full chain
+    on a synthetic corpus, against local stub OpenAI endpoints (no network,
+    no API key). Reports throughput, p50/p95/p99 latency and peak memory.
+    
+    Example:
+      rag bench --documents 200 --latency-ms 20 --output bench.json
+      rag bench --scenarios retrieve,rag_chain --compare bench.json
+      
+    Options:
+      --documents        : Files of the synthetic corpus (default: 100)
+      --paragraphs       : Paragraphs per file (default: 8)
+      --queries          : Questions of the retrieve and rag_chain scenarios (default: 100)
+      --latency-ms       : Latency of every stub API call (default: 20)
+      --token-latency-ms : Delay between streamed tokens (default: 0)
+      --backend          : Vector store backend (default: {})
+      --scenarios        : process, load_documents, create_chunks,
+                           create_vectorstore, retrieve, rag_chain (default: all)
+      --repeat           : Runs of the batch scenarios (default: 1)
+      --seed             : Seed of the corpus and questions (default: 0)
+      --output           : JSON file to save the results to
+      --compare          : Previous JSON results to compare with
+    
+    ╭───────────────────╮
+    │  6. SERVE COMMAND │
+    ╰───────────────────╯
+    
+    Serve a JSON and server-sent events query API over the RAG chain, with
+    pre-forked worker processes sharing the memory-mapped index.
+    
+    Example:
+      rag serve --workers 4 --port 8000
+      curl -X POST localhost:8000/query -d '{{"question": "..."}}'
+      
+    Options:
+      --host            : Interface to bind (default: {})
+      --port            : Port to bind (default: {})
+      --workers         : Worker processes (default: number of cores)
+      --vectorstore-dir : Vector database directory (default: {})
+      --backend         : Vector store backend (default: {})
+    
+    Endpoints: POST /query, POST /query/stream, GET /healthz, GET /readyz,
+    GET /metrics
     
     ╭─────────────────╮
-    │  3. WEB COMMAND │
+    │  7. WEB COMMAND │
     ╰─────────────────╯
     
-    Launch the Gradio web interface to interact with the RAG system.
+    Launch the Gradio web interface to interact with the RAG system
+    (install with pip install -e ".[web]").
     
     Example:
       rag web
+      rag web --api-url http://localhost:8000
+      
+    Options:
+      --api-url : Query a rag serve API instead of an in-process chain
     """.format(
+        settings.PROFILE_DIR,
         settings.INPUT_DATA_DIR,
         settings.PROCESSED_DATA_DIR,
-        settings.INPUT_DATA_DIR
+        settings.REWRITE_CONCURRENCY,
+        settings.INPUT_DATA_DIR,
+        settings.EMBEDDING_CONCURRENCY,
+        settings.EMBEDDING_BATCH_MAX_TOKENS,
+        settings.VECTORSTORE_SHARDS,
+        settings.VECTORSTORE_DIR,
+        settings.VECTORSTORE_BACKEND,
+        settings.CALIBRATION_QUESTIONS_FILE,
+        settings.TEST_DATA_DIR,
+        settings.DEFAULT_TOP_K,
+        settings.VECTORSTORE_BACKEND,
+        settings.SERVE_HOST,
+        settings.SERVE_PORT,
+        settings.VECTORSTORE_DIR,
+        settings.VECTORSTORE_BACKEND
     )
     
     # Wrap the text to fit the terminal width
@@ -166,16 +460,29 @@ def main():
         
     args = parse_args()
     
-    # Execute the appropriate command
-    if args.command == "ingest":
-        ingest_command(args)
-    elif args.command == "process":
-        process_command(args)
-    elif args.command == "web":
-        web_command(args)
-    else:
+    commands = {
+        "ingest": ingest_command,
+        "reshard": reshard_command,
+        "process": process_command,
+        "calibrate": calibrate_command,
+        "bench": bench_command,
+        "serve": serve_command,
+        "web": web_command,
+    }
+    if args.command not in commands:
         print("Please specify a command. Use --help for basic options or --help-examples for detailed examples.")
         sys.exit(1)
+    
+    # Execute the appropriate command, as one trace, profiled on request
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            from rag_project.utils.profiling import profile
+            stack.enter_context(profile(args.command, args.profile))
+        trace = stack.enter_context(tracer.trace(args.command))
+        commands[args.command](args)
+    stages = trace.stage_seconds() if trace is not None else {}
+    if stages and args.command != "bench":
+        print("Stage timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in stages.items()))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
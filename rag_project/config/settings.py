@@ -4,20 +4,166 @@ import os
 # OpenAI API key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Optional OpenAI-compatible endpoint (e.g. a local stub server for tests and benchmarks)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+# HTTP client settings (pools shared by every OpenAI call of the process)
+HTTP_MAX_CONNECTIONS = 64 # per pool, further requests wait for a free connection
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32 # idle connections kept open
+HTTP_KEEPALIVE_EXPIRY = 60.0 # seconds before an idle connection is closed
+HTTP_TIMEOUT = 120.0 # seconds, for reads, writes and waiting on the pool
+HTTP_CONNECT_TIMEOUT = 10.0 # seconds
+HTTP_WARMUP = True # open connections before the first question (web page load, serve workers)
+HTTP_WARMUP_CONNECTIONS = 4
+
 # Vector database settings
 VECTORSTORE_DIR = "vectorstore"
+VECTORSTORE_BACKEND = "chroma" # "chroma", "flat" (memory-mapped exact search) or "pq" (compressed)
+EMBEDDING_INFO_FILE = "embedding_info.json" # provider, model and dimension that built the database
+INGEST_GENERATION_FILE = "generation.json" # rewritten by every ingest, invalidates the RAG cache
+
+# Sharding settings (chunks partitioned by source file over several stores of VECTORSTORE_BACKEND)
+VECTORSTORE_SHARDS = 1 # shards of a new vector database; existing ones keep theirs until rag reshard
+SHARDS_FILE = "shards.json" # shard layout of a sharded vector database
+SHARD_SEARCH_WORKERS = None # shards searched at once per query, None searches them all in parallel
+SHARD_BUILD_QUEUE_SIZE = 1024 # chunks buffered per shard while building
+
+# Flat index settings (VECTORSTORE_BACKEND = "flat")
+FLAT_INDEX_DTYPE = "float16" # storage type of the vectors, "float16" halves memory
+FLAT_INDEX_BLOCK_ROWS = 65536 # rows scored per matrix product
+
+# Compressed index settings (VECTORSTORE_BACKEND = "pq": IVF-PQ codes in memory,
+# exact re-ranking from the flat index on disk)
+PQ_NLIST = 1024 # coarse clusters (inverted lists), capped for small corpora
+PQ_SUBQUANTIZERS = 64 # bytes per vector code (lowered to a divisor of the dimension)
+PQ_NPROBE = 16 # lists scanned per query: higher means better recall, slower queries
+PQ_RERANK = 100 # candidates re-ranked with exact distances
+PQ_TRAIN_SIZE = 100000 # vectors sampled to train the quantizers
+PQ_KMEANS_ITERATIONS = 20
+
+# Lexical retrieval settings (BM25 index built by rag ingest, stored in VECTORSTORE_DIR)
+LEXICAL_INDEX_ENABLED = True
+LEXICAL_INDEX_FILE = "lexical_index.npz"
+BM25_K1 = 1.2 # term-frequency saturation
+BM25_B = 0.75 # document-length normalization
+HYBRID_RETRIEVAL = True # fuse dense and lexical results with reciprocal-rank fusion
+RRF_K = 60 # rank offset of the fusion
+LEXICAL_FAST_PATH = True # answer from the lexical index alone when its best hit is decisive
+LEXICAL_FAST_PATH_MIN_SCORE = 4.0 # minimum BM25 score of the best hit (a rare term scores about 5+)
+LEXICAL_FAST_PATH_RATIO = 2.0 # minimum ratio between the best and second best scores
+
+# Incremental ingestion manifest (per-file and per-chunk content hashes)
+INGEST_MANIFEST_PATH = f"{VECTORSTORE_DIR}_manifest.json"
+
+# Embedding model settings
+EMBEDDING_PROVIDER = "openai" # "openai" (remote API) or "local" (in-process CPU model)
+EMBEDDING_MODEL = "text-embedding-3-small" # OpenAI model
+
+# Local embedding settings (EMBEDDING_PROVIDER = "local", needs sentence-transformers and torch)
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+LOCAL_EMBEDDING_THREADS = None # inference threads, None keeps torch's default
+LOCAL_EMBEDDING_QUANTIZATION = None # None, "int8" (dynamic quantization) or "onnx" (needs sentence-transformers[onnx])
+LOCAL_EMBEDDING_BATCH_TOKENS = 8192 # padded tokens per inference batch
+LOCAL_EMBEDDING_MAX_BATCH_SIZE = 64 # texts per inference batch
+
+# Embedding cache settings (keyed by model name and normalized text hash)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = ".cache/embeddings.sqlite3"
+EMBEDDING_CACHE_MEMORY_MB = 256 # size of the in-memory LRU tier
+
+# Embedding pipeline settings (used when building the vector database)
+EMBEDDING_CONCURRENCY = 8 # concurrent embedding requests, halved on rate limiting
+EMBEDDING_BATCH_MAX_TOKENS = 50000 # tokens per embedding request
+EMBEDDING_BATCH_MAX_SIZE = 512 # texts per embedding request
+EMBEDDING_MAX_RETRIES = 8 # retries of a batch after a 429 response
+VECTORSTORE_WRITE_BATCH_SIZE = 1000 # vectors written to the database at once
 
-# Embedding model settings (OpenAI)
-EMBEDDING_MODEL = "text-embedding-3-small"
+# Query embedding batching (concurrent retrievals share embedding requests)
+QUERY_BATCHING_ENABLED = True
+QUERY_BATCH_MAX_WAIT_MS = 5.0 # longest a query waits for others to join its batch
+QUERY_BATCH_MAX_SIZE = 64 # queries per embedding request
+QUERY_BATCH_MAX_IN_FLIGHT = 4 # batches sent at once, later queries queue for the next one
 
 # Rewriter LLM settings
 LLM_MODEL = "gpt-4.1-nano"
 LLM_TEMPERATURE = 0.2
 LLM_MAX_TOKENS = 3000
 
+# Text rewriting settings (rag process)
+REWRITE_MODEL = "gpt-4.1-nano"
+REWRITE_TEMPERATURE = 0.7
+REWRITE_MAX_TOKENS = 3000
+REWRITE_CACHE_ENABLED = True # keyed by model, prompt template, temperature, max tokens and input hash
+REWRITE_CACHE_PATH = ".cache/rewrites.sqlite3"
+
+# Parallel processing settings (rag process --parallel)
+PROCESS_WORKERS = None # cleaning processes, None uses every core
+REWRITE_CONCURRENCY = 8 # concurrent rewrite requests
+PROCESS_JOURNAL_FILE = ".process_journal.jsonl" # written in the output directory
+
+# RAG cache settings (retrieval results and answers, dropped when a new ingest is published)
+RAG_CACHE_ENABLED = True
+RAG_CACHE_MAX_ENTRIES = 1024 # per level, least recently used entries go first
+RAG_CACHE_TTL = 3600 # seconds
+SEMANTIC_CACHE_ENABLED = False # also match near-duplicate queries (one query embedding per miss)
+SEMANTIC_CACHE_THRESHOLD = 0.95 # minimum cosine similarity of a near-duplicate
+PROMPT_VERSION = 1 # bump when the answer prompt changes, to drop cached answers
+
+# Context packing settings (retrieved chunks fitted into the answer prompt)
+CONTEXT_PACKING_ENABLED = True
+CONTEXT_TOKEN_BUDGET = 3000 # tokens of retrieved text in the prompt
+CONTEXT_ENCODING = "o200k_base" # tiktoken encoding of LLM_MODEL
+CONTEXT_MERGE_GAP = 2 # characters between two chunks of a file still merged
+CONTEXT_MAX_TEXT_OVERLAP = 200 # longest overlap searched in chunks without offsets (chunk_overlap)
+CONTEXT_DEDUP_THRESHOLD = 0.8 # share of a chunk's word trigrams already packed to drop it
+
+# Conversation session settings (server-side history of each web chat)
+SESSION_TTL = 3600 # seconds of inactivity before a session is dropped
+SESSION_HISTORY_MAX_TOKENS = 2000 # history above which older turns are compacted into the summary
+SESSION_KEEP_MESSAGES = 4 # latest messages kept verbatim by a compaction
+SESSION_SUMMARY_MAX_TOKENS = 400 # length of the rolling summary
+
+# Query rewriting settings (follow-up questions made standalone before retrieval)
+QUERY_REWRITE_ENABLED = True
+QUERY_REWRITE_HISTORY_MESSAGES = 4 # latest messages shown to the rewriter, with the summary
+QUERY_REWRITE_MAX_TOKENS = 200
+
+# Web interface settings
+WEB_CONCURRENCY_LIMIT = None # concurrent chats, None for no limit (the async handler holds no thread)
+
+# Query API settings (rag serve)
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8000
+SERVE_WORKERS = None # pre-forked worker processes, None uses every core
+SERVE_MAX_CONCURRENCY = 32 # requests answered at once per worker, others wait
+SERVE_BACKLOG = 1024 # connections waiting to be accepted
+SERVE_KEEPALIVE_TIMEOUT = 5.0 # seconds before an idle keep-alive connection is closed
+SERVE_SHUTDOWN_TIMEOUT = 30.0 # seconds given to in-flight requests on shutdown
+SERVE_MAX_BODY_BYTES = 1 << 20 # larger request bodies are rejected with 400
+WEB_API_URL = None # rag serve URL used by rag web instead of an in-process chain
+
+# Tracing and metrics settings (per-stage spans, token counts, retrieved chunks, cache lookups)
+TRACING_ENABLED = True
+TRACE_FILE = os.getenv("RAG_TRACE_FILE") # JSONL file of per-request and per-command traces, None to disable
+METRICS_PORT = 9464 # Prometheus endpoint of rag web (http://host:port/metrics), None to disable
+METRICS_HOST = "127.0.0.1" # "0.0.0.0" to let a remote Prometheus scrape it
+
+# Profiling settings (rag <command> --profile)
+PROFILE_DIR = "profiles" # cProfile stats, tracemalloc snapshots and summaries
+PROFILE_TRACEMALLOC_FRAMES = 10 # stack frames kept per allocation
+PROFILE_TOP = 30 # functions and allocation sites listed in the summary
+
 # Retriever settings
 DEFAULT_TOP_K = 8 # default 5, then try 8
 
+# Adaptive retrieval settings (fewer than DEFAULT_TOP_K chunks when the distances drop off)
+ADAPTIVE_RETRIEVAL = True
+RETRIEVAL_MAX_DISTANCE = None # squared L2 distance above which a chunk is irrelevant, None uses rag calibrate's
+RETRIEVAL_SCORE_GAP = None # relative jump between consecutive distances that ends the results, None uses rag calibrate's
+RETRIEVAL_MIN_K = 2 # chunks kept despite a score gap, if they clear the distance threshold
+RETRIEVAL_CALIBRATION_FILE = "retrieval_calibration.json" # written by rag calibrate in the vector database directory
+CALIBRATION_QUESTIONS_FILE = "calibration_questions.jsonl" # labelled questions in TEST_DATA_DIR
+
 # Data directories
 INPUT_DATA_DIR = "data/input_data"  # Raw markdown files
 PROCESSED_DATA_DIR = "data/processed_data" # Processed markdown files
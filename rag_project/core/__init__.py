@@ -1,4 +1,14 @@
 """Core components for RAG functionality."""
 
-from rag_project.core.retriever import DocumentRetriever
-from rag_project.core.rag_graph import rag_chain
+# Imported on first access: the RAG chain opens the vector database and
+# builds API clients, which commands such as rag process never need
+_LAZY_ATTRIBUTES = {
+    "DocumentRetriever": "rag_project.core.retriever",
+    "rag_chain": "rag_project.core.rag_graph",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,131 @@
+"""Module for calibrating the adaptive retrieval thresholds of a vector database."""
+
+import json
+import os
+from rag_project.utils.file_utils import atomic_write
+from rag_project.utils.metrics import percentile
+from rag_project.config import settings
+
+# Jumps between consecutive distances below this percentile are kept by the gap cutoff
+GAP_PERCENTILE = 95
+
+def load_questions(directory=None):
+    """
+    Load labelled calibration questions.
+
+    The file holds one JSON object per line, with the question and whether
+    the documents can answer it:
+    {"question": "...", "answerable": true}
+
+    Args:
+        directory (str): Directory of the file. If None, uses TEST_DATA_DIR from settings.
+
+    Returns:
+        list: (question, answerable) pairs
+
+    Raises:
+        FileNotFoundError: If the directory has no calibration file
+    """
+    if directory is None:
+        directory = settings.TEST_DATA_DIR
+    path = os.path.join(directory, settings.CALIBRATION_QUESTIONS_FILE)
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                questions.append((item["question"], bool(item.get("answerable", True))))
+    return questions
+
+def _best_threshold(answerable, unanswerable):
+    """
+    Distance separating the best distances of answerable and unanswerable questions.
+
+    Returns:
+        tuple: (threshold, share of questions classified correctly)
+    """
+    labelled = sorted([(d, True) for d in answerable] + [(d, False) for d in unanswerable])
+    best_correct, best_threshold = -1, None
+    # Threshold just below the i-th distance: the distances before it pass.
+    # Ties go to the higher threshold, which keeps answerable questions.
+    correct = len(unanswerable)
+    for i, (distance, is_answerable) in enumerate(labelled):
+        if correct >= best_correct:
+            previous = labelled[i - 1][0] if i else 0.0
+            best_correct, best_threshold = correct, (previous + distance) / 2
+        correct += 1 if is_answerable else -1
+    if correct >= best_correct:
+        best_correct, best_threshold = correct, labelled[-1][0]
+    return best_threshold, best_correct / len(labelled)
+
+def calibrate(retriever, questions, k=None):
+    """
+    Derive the distance threshold and score gap of adaptive retrieval.
+
+    The threshold best separates the nearest distances of answerable and
+    unanswerable questions (with only answerable questions, it admits all of
+    them). The gap is the GAP_PERCENTILE percentile of the relative jumps
+    between consecutive results of answerable questions, so only unusual
+    jumps end the results.
+
+    Args:
+        retriever (DocumentRetriever): Retriever of the vector database
+        questions (list): (question, answerable) pairs
+        k (int): Results searched per question. If None, uses the retriever's top_k.
+
+    Returns:
+        dict: max_distance, score_gap, number of questions and accuracy of the threshold
+    """
+    texts = [question for question, _ in questions]
+    results = retriever.batch_similarity_search_with_score(texts, k=k)
+
+    answerable, unanswerable, jumps = [], [], []
+    for (_, is_answerable), pairs in zip(questions, results):
+        if not pairs:
+            continue
+        distances = [distance for _, distance in pairs]
+        if not is_answerable:
+            unanswerable.append(distances[0])
+            continue
+        answerable.append(distances[0])
+        jumps.extend((b - a) / max(a, 1e-6) for a, b in zip(distances, distances[1:]))
+    if not answerable:
+        raise ValueError("Calibration needs at least one answerable question with results")
+
+    max_distance, accuracy = _best_threshold(answerable, unanswerable)
+    return {
+        "max_distance": max_distance,
+        "score_gap": percentile(jumps, GAP_PERCENTILE) if jumps else None,
+        "answerable": len(answerable),
+        "unanswerable": len(unanswerable),
+        "accuracy": accuracy,
+    }
+
+def save_calibration(persist_directory, calibration):
+    """
+    Store the calibration of a vector database next to it.
+
+    Args:
+        persist_directory (str): Directory of the vector database
+        calibration (dict): Result of calibrate()
+    """
+    atomic_write(
+        os.path.join(persist_directory, settings.RETRIEVAL_CALIBRATION_FILE),
+        json.dumps(calibration, indent=2)
+    )
+
+def load_calibration(persist_directory):
+    """
+    Load the calibration of a vector database.
+
+    Args:
+        persist_directory (str): Directory of the vector database
+
+    Returns:
+        dict: Stored calibration, or an empty dict if it was never calibrated
+    """
+    path = os.path.join(persist_directory, settings.RETRIEVAL_CALIBRATION_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
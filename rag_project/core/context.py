@@ -0,0 +1,249 @@
+"""Module for packing retrieved chunks into the answer prompt."""
+
+import re
+import threading
+from langchain_core.documents import Document
+from rag_project.utils.tokens import count_tokens, truncate_tokens
+from rag_project.config import settings
+
+# Chunks without start offsets (older databases) are joined when one ends with
+# at least this many characters the next one starts with
+MIN_TEXT_OVERLAP = 20
+
+_WORD = re.compile(r"\w+")
+
+class _Segment:
+    """Contiguous text of one source, built from one or more chunks."""
+
+    def __init__(self, document, rank):
+        self.source = document.metadata.get("source")
+        self.start = document.metadata.get("start_index")
+        self.text = document.page_content
+        self.rank = rank
+        self.documents = [document]
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+    def absorb(self, other, text):
+        self.text = text
+        self.rank = min(self.rank, other.rank)
+        self.documents.extend(other.documents)
+
+    def to_document(self):
+        if len(self.documents) == 1:
+            return self.documents[0]
+        documents = sorted(self.documents, key=lambda doc: doc.metadata.get("start_index") or 0)
+        metadata = dict(documents[0].metadata)
+        metadata["chunk_id"] = "+".join(str(doc.metadata.get("chunk_id")) for doc in documents)
+        metadata["merged_chunks"] = len(documents)
+        return Document(page_content=self.text, metadata=metadata)
+
+def _text_overlap(first, second, max_overlap):
+    """Length of the longest end of `first` that starts `second`, or 0."""
+    for length in range(min(len(first), len(second), max_overlap), MIN_TEXT_OVERLAP - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+def _merge_pair(first, second, max_gap, max_overlap):
+    """
+    Join two segments of a source, or return None if they are not adjacent.
+
+    Returns:
+        tuple: (text, start offset of the text or None when unknown), or None
+    """
+    if first.start is not None and second.start is not None:
+        if second.start < first.start:
+            first, second = second, first
+        if second.start > first.end + max_gap:
+            return None
+        if second.start >= first.end:
+            # The splitter strips the whitespace separating contiguous chunks:
+            # a paragraph break when two or more characters are missing
+            return first.text + ("\n\n" if second.start - first.end >= 2 else "\n") + second.text, first.start
+        # Overlapping offsets are only trusted when the texts agree: in an
+        # incremental database, unchanged chunks of an edited file keep the
+        # offsets of the previous version
+        shared = first.text[second.start - first.start:]
+        if second.end <= first.end and shared.startswith(second.text):
+            return first.text, first.start
+        if second.end > first.end and second.text.startswith(shared):
+            return first.text + second.text[len(shared):], first.start
+
+    for a, b in ((first, second), (second, first)):
+        overlap = _text_overlap(a.text, b.text, max_overlap)
+        if overlap:
+            # Joined by text overlap: the offset of the result is unknown
+            return a.text + b.text[overlap:], None
+    return None
+
+def merge_chunks(documents, max_gap=None, max_overlap=None):
+    """
+    Merge contiguous or overlapping chunks of the same source.
+
+    Chunks are located with their "start_index" metadata; for chunks without
+    it, overlap is detected from the text itself.
+
+    Args:
+        documents (list): Retrieved chunks, most relevant first
+        max_gap (int): Maximum characters between two chunks still merged.
+            If None, uses CONTEXT_MERGE_GAP from settings.
+        max_overlap (int): Longest text overlap searched for chunks without offsets
+
+    Returns:
+        list: Documents, ordered by their most relevant chunk. Merged documents
+            list the ids of their chunks in "chunk_id", joined with "+".
+    """
+    max_gap = settings.CONTEXT_MERGE_GAP if max_gap is None else max_gap
+    max_overlap = max_overlap or settings.CONTEXT_MAX_TEXT_OVERLAP
+
+    by_source, seen = {}, set()
+    for rank, document in enumerate(documents):
+        key = (document.metadata.get("source"), document.metadata.get("chunk_id"), document.page_content)
+        if key in seen:
+            # The same chunk retrieved twice (e.g. by several queries)
+            continue
+        seen.add(key)
+        segment = _Segment(document, rank)
+        by_source.setdefault(segment.source, []).append(segment)
+
+    segments = []
+    for source, group in by_source.items():
+        if source is None:
+            segments.extend(group)
+            continue
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(group)):
+                for j in range(i + 1, len(group)):
+                    merged_pair = _merge_pair(group[i], group[j], max_gap, max_overlap)
+                    if merged_pair is None:
+                        continue
+                    text, group[i].start = merged_pair
+                    group[i].absorb(group.pop(j), text)
+                    merged = True
+                    break
+                if merged:
+                    break
+        segments.extend(group)
+
+    segments.sort(key=lambda segment: segment.rank)
+    return [segment.to_document() for segment in segments]
+
+def _shingles(text, size=3):
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def drop_near_duplicates(documents, threshold=None):
+    """
+    Drop documents whose text is mostly contained in a more relevant one.
+
+    Args:
+        documents (list): Documents, most relevant first
+        threshold (float): Share of a document's word trigrams found in a kept
+            document above which it is dropped. If None, uses
+            CONTEXT_DEDUP_THRESHOLD from settings.
+
+    Returns:
+        list: Kept documents, in the same order
+    """
+    threshold = settings.CONTEXT_DEDUP_THRESHOLD if threshold is None else threshold
+    kept, kept_shingles = [], []
+    for document in documents:
+        shingles = _shingles(document.page_content)
+        if any(len(shingles & other) >= threshold * len(shingles) for other in kept_shingles):
+            continue
+        kept.append(document)
+        kept_shingles.append(shingles)
+    return kept
+
+class ContextPacker:
+    """
+    Fit retrieved chunks into a token budget for the answer prompt.
+
+    Adjacent chunks of a source are merged (removing the splitter's overlap),
+    near-duplicates are dropped, and documents are added by relevance until
+    the budget is full.
+    """
+
+    def __init__(self, token_budget=None, encoding_name=None, separator="\n\n"):
+        """
+        Args:
+            token_budget (int): Maximum tokens of packed context. If None, uses
+                CONTEXT_TOKEN_BUDGET from settings.
+            encoding_name (str): tiktoken encoding of the answer model. If None,
+                uses CONTEXT_ENCODING from settings.
+            separator (str): Text placed between documents in the prompt
+        """
+        self.token_budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+        self.encoding_name = encoding_name or settings.CONTEXT_ENCODING
+        self.separator = separator
+        self._lock = threading.Lock()
+        self._totals = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0}
+
+    def _tokens(self, documents):
+        if not documents:
+            return 0
+        return count_tokens(self.separator.join(doc.page_content for doc in documents), self.encoding_name)
+
+    def pack(self, documents):
+        """
+        Pack retrieved documents.
+
+        Args:
+            documents (list): Retrieved chunks, most relevant first
+
+        Returns:
+            tuple: (packed documents, report). The report holds the chunk and
+                token counts before and after packing and the tokens saved.
+        """
+        tokens_in = self._tokens(documents)
+        merged = merge_chunks(documents)
+        unique = drop_near_duplicates(merged)
+
+        packed, used = [], 0
+        separator_tokens = count_tokens(self.separator, self.encoding_name)
+        for document in unique:
+            tokens = count_tokens(document.page_content, self.encoding_name) + (separator_tokens if packed else 0)
+            if used + tokens <= self.token_budget:
+                packed.append(document)
+                used += tokens
+            elif not packed:
+                # Keep the start of the most relevant document rather than nothing
+                text = truncate_tokens(document.page_content, self.token_budget, self.encoding_name)
+                packed.append(Document(page_content=text, metadata=dict(document.metadata, truncated=True)))
+                used = count_tokens(text, self.encoding_name)
+
+        tokens_out = self._tokens(packed)
+        merged_away = sum(doc.metadata.get("merged_chunks", 1) - 1 for doc in merged)
+        report = {
+            "chunks_in": len(documents),
+            "merged": merged_away,
+            # Repeated chunks and near-duplicates
+            "duplicates": len(documents) - merged_away - len(unique),
+            "over_budget": len(unique) - len(packed),
+            "chunks_out": len(packed),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
+        with self._lock:
+            self._totals["requests"] += 1
+            for key in ("tokens_in", "tokens_out", "tokens_saved"):
+                self._totals[key] += report[key]
+        return packed, report
+
+    def stats(self):
+        """
+        Get the totals over every packed request.
+
+        Returns:
+            dict: Requests, tokens before and after packing, and tokens saved
+        """
+        with self._lock:
+            return dict(self._totals)
@@ -0,0 +1,181 @@
+"""Module for batching concurrent query embeddings into shared requests."""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+from langchain_core.embeddings import Embeddings
+from rag_project.utils.metrics import LatencyRecorder
+from rag_project.utils.tracing import tracer, COUNT_BUCKETS
+from rag_project.config import settings
+
+# Queueing delays are a few milliseconds, finer than the span buckets
+WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+tracer.describe("rag_embedding_batch_size", "histogram", "Queries sent per batched embedding request")
+tracer.describe("rag_embedding_batch_wait_seconds", "histogram", "Time queries waited for their batch to be sent")
+
+class _Pending:
+    """A query waiting for its batch, with the future its caller waits on."""
+
+    __slots__ = ("text", "future", "enqueued")
+
+    def __init__(self, text):
+        self.text = text
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that sends queries arriving together as one request.
+
+    The first query to arrive opens a batch, which is sent after max_wait_ms
+    or as soon as it holds max_batch_size queries. Identical queries of a
+    batch are embedded once. At most max_in_flight batches are sent at a
+    time; while they are all busy, queries keep queuing and the next batch
+    leaves with as many as are waiting, so batches grow with the load.
+
+    Sync callers block on their vector and async callers await it, so both
+    share batches. Documents are already batched by their callers and go
+    straight to the wrapped model.
+    """
+
+    def __init__(self, embedding_model, max_wait_ms=None, max_batch_size=None, max_in_flight=None):
+        """
+        Initialize the batcher.
+
+        Args:
+            embedding_model (Embeddings): Embedding model to wrap
+            max_wait_ms (float): Longest a query waits for others to join its batch.
+                If None, uses QUERY_BATCH_MAX_WAIT_MS from settings.
+            max_batch_size (int): Queries per request. If None, uses
+                QUERY_BATCH_MAX_SIZE from settings.
+            max_in_flight (int): Batches sent at once. If None, uses
+                QUERY_BATCH_MAX_IN_FLIGHT from settings.
+        """
+        if max_wait_ms is None:
+            max_wait_ms = settings.QUERY_BATCH_MAX_WAIT_MS
+
+        if max_batch_size is None:
+            max_batch_size = settings.QUERY_BATCH_MAX_SIZE
+
+        if max_in_flight is None:
+            max_in_flight = settings.QUERY_BATCH_MAX_IN_FLIGHT
+
+        self.embedding_model = embedding_model
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_concurrency = getattr(embedding_model, "max_concurrency", None)
+        self.wait = LatencyRecorder()
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._stats = {"queries": 0, "batches": 0, "requests_saved": 0}
+
+    def _start(self):
+        """Start the dispatcher thread, again in a forked child whose thread did not survive."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._queue
+            self._queue = queue.SimpleQueue()
+            self._slots = threading.BoundedSemaphore(self.max_in_flight)
+            self._executor = ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="embedding-batch")
+            threading.Thread(target=self._dispatch, args=(self._queue,), name="embedding-batcher", daemon=True).start()
+            self._pid = os.getpid()
+            return self._queue
+
+    def _submit(self, text):
+        pending = _Pending(text)
+        (self._queue if self._pid == os.getpid() else self._start()).put(pending)
+        return pending.future
+
+    def _dispatch(self, pending_queue):
+        """Collect queries into batches and hand each batch to a sender thread."""
+        while True:
+            batch = [pending_queue.get()]
+            deadline = batch[0].enqueued + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(pending_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # Queries that arrived while every sender was busy join this batch
+            self._slots.acquire()
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(pending_queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch):
+        """Embed a batch with one request and resolve the futures of its queries."""
+        try:
+            sent = time.perf_counter()
+            tracer.observe("rag_embedding_batch_size", len(batch), buckets=COUNT_BUCKETS)
+            for pending in batch:
+                waited = sent - pending.enqueued
+                self.wait.record("queue", waited)
+                tracer.observe("rag_embedding_batch_wait_seconds", waited, buckets=WAIT_BUCKETS)
+            with self._lock:
+                self._stats["queries"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["requests_saved"] += len(batch) - 1
+
+            texts = list(dict.fromkeys(pending.text for pending in batch))
+            vectors = dict(zip(texts, self.embedding_model.embed_documents(texts)))
+            for pending in batch:
+                pending.future.set_result(vectors[pending.text])
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def batch_stats(self):
+        """
+        Return the batching counters.
+
+        Returns:
+            dict: Queries, batches and requests saved, the mean batch size, and
+                percentiles of the time queries waited for their batch
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_batch_size"] = stats["queries"] / stats["batches"] if stats["batches"] else 0.0
+        stats["wait"] = self.wait.stats().get("queue")
+        return stats
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents directly with the wrapped model."""
+        return self.embedding_model.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronous version of embed_documents."""
+        return await self.embedding_model.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query in a batch with the queries arriving at the same time.
+
+        Args:
+            text (str): Query to embed
+
+        Returns:
+            List[float]: Query vector
+        """
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronous version of embed_query, waiting without blocking the event loop."""
+        return await asyncio.wrap_future(self._submit(text))
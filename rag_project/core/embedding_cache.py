@@ -0,0 +1,227 @@
+"""Module for caching embeddings on disk and in memory."""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List
+from langchain_core.embeddings import Embeddings
+from rag_project.utils.disk_cache import DiskCache
+from rag_project.utils.tracing import record_cache_lookups
+from rag_project.config import settings
+
+def normalize_text(text):
+    """
+    Normalize text before hashing it, so trivial variations share a cache entry.
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: NFC-normalized text with collapsed, stripped whitespace
+    """
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def cache_key(model_name, text):
+    """
+    Build the content-addressed cache key of a text.
+
+    Args:
+        model_name (str): Name of the embedding model
+        text (str): Text to embed
+
+    Returns:
+        str: Cache key combining the model name and the normalized text hash
+    """
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+def _encode(vector):
+    return array("f", vector).tobytes()
+
+def _decode(blob):
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends texts it has never seen to the wrapped model.
+
+    Vectors are looked up in an in-memory LRU tier first, then in a persistent
+    SQLite store shared by every process, and only the remaining texts are
+    embedded. The memory tier is bounded by size and evicts the least recently
+    used vectors first.
+    """
+
+    def __init__(self, embedding_model, model_name, cache_path=None, memory_limit_mb=None):
+        """
+        Initialize the cache.
+
+        Args:
+            embedding_model (Embeddings): Embedding model to wrap
+            model_name (str): Name of the wrapped model, part of every cache key
+            cache_path (str): Path of the SQLite cache file
+            memory_limit_mb (float): Maximum size of the in-memory tier in megabytes
+        """
+        if cache_path is None:
+            cache_path = settings.EMBEDDING_CACHE_PATH
+
+        if memory_limit_mb is None:
+            memory_limit_mb = settings.EMBEDDING_CACHE_MEMORY_MB
+
+        self.embedding_model = embedding_model
+        self.model_name = model_name
+        self.store = DiskCache(cache_path, table="embeddings")
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+
+        # Let the pipeline respect limits of the wrapped model (e.g. local models)
+        self.max_concurrency = getattr(embedding_model, "max_concurrency", None)
+
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: Hit, miss and eviction counts, plus the hit rate and memory usage
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        total = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+    def _remember(self, key, blob):
+        """Insert a vector in the memory tier, evicting old entries past the size limit."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = blob
+            self._memory_size += len(blob) + len(key)
+            while self._memory_size > self.memory_limit and self._memory:
+                old_key, old_blob = self._memory.popitem(last=False)
+                self._memory_size -= len(old_blob) + len(old_key)
+                self._stats["evictions"] += 1
+
+    def _lookup(self, keys):
+        """
+        Find cached vectors for a list of keys.
+
+        Returns:
+            dict: Mapping of found keys to their encoded vectors
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                blob = self._memory.get(key)
+                if blob is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = blob
+            self._stats["memory_hits"] += len(found)
+
+        remaining = [key for key in keys if key not in found]
+        if remaining:
+            on_disk = self.store.get_many(remaining)
+            for key, blob in on_disk.items():
+                self._remember(key, blob)
+            found.update(on_disk)
+            with self._lock:
+                self._stats["disk_hits"] += len(on_disk)
+
+        return found
+
+    def _split(self, texts):
+        """
+        Resolve cached texts and list the distinct texts that still need embedding.
+
+        Returns:
+            tuple: (keys per text, found vectors by key, {key: text} to embed)
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found = self._lookup(unique_keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self._stats["misses"] += len(missing)
+        record_cache_lookups("embedding", hits=len(found), misses=len(missing))
+        return keys, found, missing
+
+    def _store(self, found, missing, vectors):
+        """Record freshly computed vectors in both tiers."""
+        new_entries = {key: _encode(vector) for key, vector in zip(missing, vectors)}
+        self.store.set_many(new_entries)
+        for key, blob in new_entries.items():
+            self._remember(key, blob)
+        found.update(new_entries)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, only calling the wrapped model for uncached texts.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One vector per text
+        """
+        keys, found, missing = self._split(texts)
+        if missing:
+            vectors = self.embedding_model.embed_documents(list(missing.values()))
+            self._store(found, missing, vectors)
+        return [_decode(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, only calling the wrapped model if it is uncached.
+
+        Args:
+            text (str): Query to embed
+
+        Returns:
+            List[float]: Query vector
+        """
+        keys, found, missing = self._split([text])
+        if missing:
+            vector = self.embedding_model.embed_query(text)
+            self._store(found, missing, [vector])
+        return _decode(found[keys[0]])
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronous version of embed_documents."""
+        keys, found, missing = self._split(texts)
+        if missing:
+            vectors = await self.embedding_model.aembed_documents(list(missing.values()))
+            self._store(found, missing, vectors)
+        return [_decode(found[key]) for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Asynchronous version of embed_query."""
+        keys, found, missing = self._split([text])
+        if missing:
+            vector = await self.embedding_model.aembed_query(text)
+            self._store(found, missing, [vector])
+        return _decode(found[keys[0]])
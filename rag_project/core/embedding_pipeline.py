@@ -0,0 +1,273 @@
+"""Module for embedding large document sets with bounded, adaptive concurrency."""
+
+import asyncio
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from rag_project.utils.tokens import count_tokens
+from rag_project.config import settings
+
+def is_rate_limit_error(error):
+    """
+    Check whether an exception is a rate-limit (HTTP 429) response.
+
+    Args:
+        error (Exception): Exception raised by the embedding client
+
+    Returns:
+        bool: True if the request was rate limited
+    """
+    return getattr(error, "status_code", None) == 429
+
+def retry_after_seconds(error):
+    """
+    Read the Retry-After delay of a rate-limit response, if any.
+
+    Args:
+        error (Exception): Exception raised by the embedding client
+
+    Returns:
+        float: Delay in seconds, or None if the server did not send one
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def batch_documents(items, max_tokens, max_size):
+    """
+    Pack (document, id) pairs into batches bounded by tokens and by size.
+
+    A single document larger than the token budget gets a batch of its own.
+
+    Args:
+        items (iterable): Iterable of (document, id) pairs
+        max_tokens (int): Maximum total tokens per batch
+        max_size (int): Maximum number of documents per batch
+
+    Yields:
+        list: Batches of (document, id) pairs
+    """
+    batch = []
+    batch_tokens = 0
+    for document, doc_id in items:
+        tokens = count_tokens(document.page_content)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((document, doc_id))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit that backs off on rate limiting.
+
+    The limit is halved every time a request is rate limited, and grows back
+    by one after a full window of successful requests (AIMD).
+    """
+
+    def __init__(self, max_concurrency):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_concurrency (int): Upper bound of concurrent requests
+        """
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """Wait for a free request slot."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, rate_limited=False):
+        """
+        Free a request slot and adapt the limit.
+
+        Args:
+            rate_limited (bool): Whether the request was rate limited
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+class EmbeddingPipeline:
+    """Embed documents in token-budgeted batches through a pool of async workers."""
+
+    def __init__(self, embedding_model, concurrency=None, max_batch_tokens=None,
+                 max_batch_size=None, write_batch_size=None, max_retries=None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            embedding_model (Embeddings): Embedding model to call, without retries of
+                its own (get_embedding_model(max_retries=0)): a client retrying 429
+                responses hides them from the concurrency limiter
+            concurrency (int): Maximum number of concurrent embedding requests
+            max_batch_tokens (int): Maximum tokens per embedding request
+            max_batch_size (int): Maximum texts per embedding request
+            write_batch_size (int): Number of vectors written to the store at once
+            max_retries (int): Retries of a batch after rate limiting
+        """
+        self.embedding_model = embedding_model
+        self.concurrency = concurrency or settings.EMBEDDING_CONCURRENCY
+        # In-process models compute on local cores, where parallel calls only contend
+        model_limit = getattr(embedding_model, "max_concurrency", None)
+        if model_limit:
+            self.concurrency = min(self.concurrency, model_limit)
+        self.max_batch_tokens = max_batch_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_MAX_SIZE
+        self.write_batch_size = write_batch_size or settings.VECTORSTORE_WRITE_BATCH_SIZE
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+
+    def run(self, documents, writer, ids=None):
+        """
+        Embed documents and write them to a store, blocking until done.
+
+        Also works when called from a running event loop (Jupyter, async code),
+        by running the pipeline on its own loop in a worker thread; async
+        callers should rather await arun, which does not block their loop.
+
+        Args:
+            documents (iterable): Documents to embed
+            writer (callable): Called as writer(documents, ids, vectors) for each write batch
+            ids (iterable, optional): Vector ids of the documents. If None, uses each
+                document's "chunk_id" metadata, or a random id.
+
+        Returns:
+            dict: Pipeline statistics, including throughput in chunks per second
+                and the dimension of the vectors
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun(documents, writer, ids=ids))
+
+        # asyncio.run cannot start a loop inside a running one
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-pipeline") as executor:
+            return executor.submit(asyncio.run, self.arun(documents, writer, ids=ids)).result()
+
+    async def arun(self, documents, writer, ids=None):
+        """Asynchronous version of run, for callers already running an event loop."""
+        if ids is None:
+            items = (
+                (document, document.metadata.get("chunk_id") or str(uuid.uuid4()))
+                for document in documents
+            )
+        else:
+            items = zip(documents, ids)
+
+        stats = {"chunks": 0, "batches": 0, "rate_limited": 0, "writes": 0, "dimension": None}
+        limiter = AdaptiveConcurrency(self.concurrency)
+        # Bounded queue: batching stops reading input when the workers fall behind
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        write_lock = asyncio.Lock()
+        pending = []
+        start = time.perf_counter()
+
+        async def flush(force=False):
+            async with write_lock:
+                while pending and (force or len(pending) >= self.write_batch_size):
+                    batch = pending[:self.write_batch_size]
+                    del pending[:self.write_batch_size]
+                    await asyncio.to_thread(
+                        writer,
+                        [document for document, _, _ in batch],
+                        [doc_id for _, doc_id, _ in batch],
+                        [vector for _, _, vector in batch]
+                    )
+                    stats["writes"] += 1
+
+        async def produce():
+            batches = batch_documents(items, self.max_batch_tokens, self.max_batch_size)
+            while True:
+                # Reading and tokenizing input may block, so keep it off the event loop
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                await queue.put(batch)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def work():
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                texts = [document.page_content for document, _ in batch]
+                vectors = await self._embed(texts, limiter, stats)
+                if vectors and stats["dimension"] is None:
+                    stats["dimension"] = len(vectors[0])
+                pending.extend(
+                    (document, doc_id, vector) for (document, doc_id), vector in zip(batch, vectors)
+                )
+                stats["chunks"] += len(batch)
+                stats["batches"] += 1
+                await flush()
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        await flush(force=True)
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = elapsed
+        stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed > 0 else 0.0
+        stats["final_concurrency"] = limiter.limit
+        return stats
+
+    async def _embed(self, texts, limiter, stats):
+        """Embed one batch, backing off and retrying when rate limited."""
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                vectors = await self.embedding_model.aembed_documents(texts)
+            except Exception as error:
+                rate_limited = is_rate_limit_error(error)
+                await limiter.release(rate_limited=rate_limited)
+                if not rate_limited or attempt == self.max_retries:
+                    raise
+                stats["rate_limited"] += 1
+                delay = retry_after_seconds(error)
+                if delay is None:
+                    delay = min(60.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+                await asyncio.sleep(delay)
+            else:
+                await limiter.release()
+                return vectors
+
+def print_pipeline_stats(stats):
+    """
+    Print a one-line summary of an embedding pipeline run.
+
+    Args:
+        stats (dict): Statistics returned by EmbeddingPipeline.run
+    """
+    print(f"Embedded {stats['chunks']} chunks in {stats['batches']} batches "
+          f"in {stats['seconds']:.1f}s ({stats['chunks_per_second']:.1f} chunks/s, "
+          f"{stats['rate_limited']} rate-limited requests)")
@@ -1,69 +1,717 @@
 """Module for handling document embeddings and vector storage."""
 
+import json
 import os
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.documents import Document
+from rag_project.core.embedding_cache import CachedEmbeddings
+from rag_project.core.embedding_batcher import BatchingEmbeddings
+from rag_project.core.embedding_pipeline import EmbeddingPipeline, print_pipeline_stats
+from rag_project.core.flat_index import FlatIndex, FlatIndexWriter
+from rag_project.core.pq_index import PQIndex, build_pq_index
+from rag_project.core.lexical import LexicalIndex, LexicalIndexBuilder
+from rag_project.core.sharding import (
+    ShardedVectorStore, shard_of, read_layout, shard_directories, new_layout, publish_layout,
+    discard_layout, partition
+)
+from rag_project.utils.clients import get_openai_embeddings
+from rag_project.utils.file_utils import atomic_write
 from rag_project.config import settings
 
-def get_embedding_model(model_name=None):
+# Vector sizes of the OpenAI embedding models, to check a database without an API call
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+def get_embedding_model(model_name=None, use_cache=None, provider=None, batch_queries=None, max_retries=None):
     """
     Get an initialized embedding model.
     
     Args:
         model_name (str): Name of the embedding model to use
+        use_cache (bool): Whether to wrap the model in the persistent embedding
+            cache. If None, uses EMBEDDING_CACHE_ENABLED from settings.
+        provider (str): "openai" or "local". If None, uses EMBEDDING_PROVIDER from settings.
+        batch_queries (bool): Whether to send concurrent query embeddings as shared
+            requests. If None, uses QUERY_BATCHING_ENABLED from settings.
+        max_retries (int): Retries of the OpenAI client itself. If None, uses the
+            client default; ingestion passes 0 (see EmbeddingPipeline).
+        
+    Returns:
+        Embeddings: Initialized embedding model
+    """
+    if provider is None:
+        provider = settings.EMBEDDING_PROVIDER
+    
+    if use_cache is None:
+        use_cache = settings.EMBEDDING_CACHE_ENABLED
+    
+    if batch_queries is None:
+        batch_queries = settings.QUERY_BATCHING_ENABLED
+    
+    if provider == "local":
+        # Imported here so the OpenAI provider does not need torch
+        from rag_project.core.local_embeddings import LocalEmbeddings
+        embedding_model = LocalEmbeddings(model_name=model_name)
+        model_name = embedding_model.model_name
+    elif provider == "openai":
+        if model_name is None:
+            model_name = settings.EMBEDDING_MODEL
+        embedding_model = get_openai_embeddings(model_name, max_retries=max_retries)
+    else:
+        raise ValueError(f"Unknown embedding provider '{provider}', use 'openai' or 'local'")
+    
+    # Batching sits under the cache, so cached queries never wait for a batch
+    if batch_queries:
+        embedding_model = BatchingEmbeddings(embedding_model)
+    
+    if use_cache:
+        embedding_model = CachedEmbeddings(embedding_model, model_name=model_name)
+    
+    return embedding_model
+
+def _open_chroma(**kwargs):
+    """Open a Chroma collection; chromadb is only imported by the Chroma backend."""
+    from langchain_community.vectorstores import Chroma
+    return Chroma(**kwargs)
+
+def describe_embedding_model(embedding_model):
+    """
+    Describe the provider, model and vector size of an embedding model.
+    
+    Args:
+        embedding_model: Embedding model, possibly wrapped in the embedding cache
+            and the query batcher
+        
+    Returns:
+        dict: "provider", "model" and "dimension" (None when unknown)
+    """
+    from langchain_openai import OpenAIEmbeddings
+    
+    while isinstance(embedding_model, (CachedEmbeddings, BatchingEmbeddings)):
+        embedding_model = embedding_model.embedding_model
+    
+    if isinstance(embedding_model, OpenAIEmbeddings):
+        model_name = embedding_model.model
+        return {
+            "provider": "openai",
+            "model": model_name,
+            "dimension": embedding_model.dimensions or OPENAI_EMBEDDING_DIMENSIONS.get(model_name),
+        }
+    
+    return {
+        "provider": getattr(embedding_model, "provider", type(embedding_model).__name__),
+        "model": getattr(embedding_model, "model_name", None),
+        "dimension": getattr(embedding_model, "dimension", None),
+    }
+
+def write_embedding_info(persist_directory, embedding_model, dimension=None):
+    """
+    Record which embedding model built a vector database.
+    
+    Args:
+        persist_directory (str): Directory of the vector database
+        embedding_model: Embedding model used to build it
+        dimension (int): Size of the stored vectors, if measured
+    """
+    info = describe_embedding_model(embedding_model)
+    if dimension:
+        info["dimension"] = dimension
+    
+    path = os.path.join(persist_directory, settings.EMBEDDING_INFO_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+def read_embedding_info(persist_directory):
+    """
+    Read the embedding model recorded for a vector database.
+    
+    Args:
+        persist_directory (str): Directory of the vector database
+        
+    Returns:
+        dict: "provider", "model" and "dimension", or an empty dict for databases
+            created before the embedding info was recorded
+    """
+    path = os.path.join(persist_directory, settings.EMBEDDING_INFO_FILE)
+    if not os.path.exists(path):
+        return {}
+    
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def check_embedding_info(persist_directory, embedding_model):
+    """
+    Fail fast if a vector database was built by a different embedding model.
+    
+    Databases created before the embedding info was recorded are not checked.
+    
+    Args:
+        persist_directory (str): Directory of the vector database
+        embedding_model: Embedding model about to query or update it
+        
+    Raises:
+        ValueError: If the provider, model or vector size differs
+    """
+    stored = read_embedding_info(persist_directory)
+    if not stored:
+        return
+    
+    current = describe_embedding_model(embedding_model)
+    
+    for key in ("provider", "model", "dimension"):
+        if stored.get(key) is None or current.get(key) is None:
+            continue
+        if stored[key] != current[key]:
+            raise ValueError(
+                f"The vector database in {persist_directory} was built with "
+                f"{stored.get('provider')} model {stored.get('model')} ({stored.get('dimension')} dimensions), "
+                f"but the configured embedding model is {current.get('provider')} model "
+                f"{current.get('model')} ({current.get('dimension')} dimensions). "
+                f"Rebuild it with 'rag ingest' or change EMBEDDING_PROVIDER."
+            )
+
+def publish_generation(persist_directory):
+    """
+    Mark the content of a vector database as changed.
+    
+    Caches built on the database (see rag_cache.RAGCache) watch this file and
+    drop their entries when it is rewritten.
+    
+    Args:
+        persist_directory (str): Directory of the vector database
+        
+    Returns:
+        str: Id of the new generation
+    """
+    generation = uuid.uuid4().hex
+    atomic_write(
+        os.path.join(persist_directory, settings.INGEST_GENERATION_FILE),
+        json.dumps({"generation": generation, "published_at": time.time()})
+    )
+    return generation
+
+def print_cache_stats(embedding_model):
+    """
+    Print the embedding cache counters, if the model is cached.
+    
+    Args:
+        embedding_model: Embedding model to report on
+    """
+    if not isinstance(embedding_model, CachedEmbeddings):
+        return
+    
+    stats = embedding_model.stats()
+    print(f"Embedding cache: {stats['hits']} hits ({stats['hit_rate']:.0%}), "
+          f"{stats['misses']} misses, {stats['evictions']} evictions")
+
+def write_embeddings(vectorstore, documents, ids, vectors):
+    """
+    Write precomputed vectors into a vector database.
+    
+    Args:
+        vectorstore (Chroma or FlatIndexWriter): Vector database to write to
+        documents (list): Documents the vectors were computed from
+        ids (list): Vector ids of the documents
+        vectors (list): One vector per document
+    """
+    if isinstance(vectorstore, FlatIndexWriter):
+        vectorstore.add(documents, ids, vectors)
+        return
+    
+    vectorstore._collection.upsert(
+        ids=ids,
+        embeddings=vectors,
+        documents=[doc.page_content for doc in documents],
+        # Chroma rejects empty metadata dicts
+        metadatas=[doc.metadata or None for doc in documents]
+    )
+
+def embed_into_vectorstore(vectorstore, documents, ids=None, embedding_model=None, lexical_builder=None,
+                           written_ids=None, **pipeline_kwargs):
+    """
+    Embed documents through the batched embedding pipeline and store them.
+    
+    Args:
+        vectorstore (Chroma or FlatIndexWriter): Vector database to write to
+        documents (iterable): Documents to embed
+        ids (iterable, optional): Vector ids of the documents, in the same order
+        embedding_model: Embedding model to use. If None, uses the vectorstore's.
+        lexical_builder (LexicalIndexBuilder, optional): Lexical index fed with
+            the same documents as they are written
+        written_ids (set, optional): Filled with the ids of the written documents
+        **pipeline_kwargs: Overrides of the EmbeddingPipeline settings
         
     Returns:
-        OpenAIEmbeddings: Initialized embedding model
+        dict: Pipeline statistics
     """
-    if model_name is None:
-        model_name = settings.EMBEDDING_MODEL
+    if embedding_model is None:
+        embedding_model = vectorstore.embeddings
     
-    return OpenAIEmbeddings(model=model_name)
+    def writer(batch_documents, batch_ids, vectors):
+        write_embeddings(vectorstore, batch_documents, batch_ids, vectors)
+        if written_ids is not None:
+            written_ids.update(batch_ids)
+        # Writes are serialized by the pipeline, so the builder needs no lock
+        if lexical_builder is not None:
+            lexical_builder.add(batch_ids, [doc.page_content for doc in batch_documents])
+    
+    pipeline = EmbeddingPipeline(embedding_model, **pipeline_kwargs)
+    stats = pipeline.run(documents, writer=writer, ids=ids)
+    print_pipeline_stats(stats)
+    return stats
 
-def create_vectorstore(documents, persist_directory=None, embedding_model=None):
+def create_vectorstore(documents, persist_directory=None, embedding_model=None, ids=None, backend=None,
+                       shards=None, lexical=None, **pipeline_kwargs):
     """
     Create a vector database from documents.
     
     Args:
-        documents (list): List of documents to embed
+        documents (iterable): Documents to embed. A generator is consumed lazily,
+            so memory stays bounded by the pipeline batch sizes.
         persist_directory (str): Directory to save vector database
-        embedding_model: Embedding model to use
+        embedding_model: Embedding model to use. If None, uses get_embedding_model()
+            without client retries.
+        ids (list, optional): Vector ids of the documents, in the same order.
+            If None, uses each document's "chunk_id" metadata.
+        backend (str): "chroma", "flat" or "pq". If None, uses VECTORSTORE_BACKEND from settings.
+        shards (int): Number of shards. If None, keeps the shards of an existing
+            database, or uses VECTORSTORE_SHARDS from settings for a new one.
+        lexical (bool): Whether to build the lexical index. If None, uses
+            LEXICAL_INDEX_ENABLED from settings.
+        **pipeline_kwargs: Overrides of the EmbeddingPipeline settings
+            (concurrency, max_batch_tokens, max_batch_size, ...)
         
     Returns:
-        Chroma: Vector database
+        VectorStore: Vector database (Chroma, FlatIndex, PQIndex or ShardedVectorStore)
     """
     if persist_directory is None:
         persist_directory = settings.VECTORSTORE_DIR
     
     if embedding_model is None:
-        embedding_model = get_embedding_model()
+        # The pipeline retries rate-limited batches itself, adapting its concurrency
+        embedding_model = get_embedding_model(max_retries=0)
+    
+    if backend is None:
+        backend = settings.VECTORSTORE_BACKEND
+    
+    if lexical is None:
+        lexical = settings.LEXICAL_INDEX_ENABLED
     
     # Create directory if it doesn't exist
     os.makedirs(persist_directory, exist_ok=True)
     
-    # Create and persist vector database
-    vectorstore = Chroma.from_documents(
-        documents=documents,
-        embedding=embedding_model,
-        persist_directory=persist_directory
-    )
+    layout = read_layout(persist_directory)
+    if shards is None:
+        shards = layout["shards"] if layout else settings.VECTORSTORE_SHARDS
+    
+    try:
+        check_embedding_info(persist_directory, embedding_model)
+    except ValueError:
+        # Vectors of another model cannot be mixed with the new ones
+        print(f"Embedding model changed, clearing the vector database in {persist_directory}")
+        if backend == "chroma" and shards == 1:
+            clear_vectorstore(persist_directory, embedding_model, backend)
     
-    # Persist the database
-    vectorstore.persist()
+    lexical_builder = LexicalIndexBuilder() if lexical else None
+    
+    if shards > 1:
+        vectorstore, dimension = _create_shards(
+            documents, persist_directory, embedding_model, ids, backend, shards, lexical_builder, pipeline_kwargs
+        )
+        if layout is None:
+            # The database was a single store until now
+            clear_vectorstore(persist_directory, embedding_model, backend)
+    elif backend in ("flat", "pq"):
+        # A new index generation replaces the previous one when complete
+        writer = FlatIndexWriter(persist_directory)
+        stats = embed_into_vectorstore(writer, documents, ids=ids, embedding_model=embedding_model,
+                                       lexical_builder=lexical_builder, **pipeline_kwargs)
+        # The flat index stays on disk for the exact re-ranking of PQ candidates
+        _publish_flat(writer, embedding_model, backend)
+        if backend == "pq":
+            vectorstore = PQIndex(persist_directory, embedding_model)
+        else:
+            vectorstore = FlatIndex(persist_directory, embedding_model)
+        dimension = stats["dimension"]
+    elif backend == "chroma":
+        # Create the vector database and fill it through the batched pipeline
+        vectorstore = _open_chroma(
+            persist_directory=persist_directory,
+            embedding_function=embedding_model
+        )
+        written_ids = set()
+        stats = embed_into_vectorstore(vectorstore, documents, ids=ids, lexical_builder=lexical_builder,
+                                       written_ids=written_ids, **pipeline_kwargs)
+        
+        # The collection is updated in place, so processes that have it open keep
+        # answering; vectors of chunks deleted since the previous ingest are only
+        # removed once the new ones are stored
+        stale_ids = [doc_id for doc_id in _collection_ids(vectorstore) if doc_id not in written_ids]
+        if stale_ids:
+            print(f"Deleting {len(stale_ids)} chunks no longer in the documents")
+            for start in range(0, len(stale_ids), settings.VECTORSTORE_WRITE_BATCH_SIZE):
+                vectorstore.delete(ids=stale_ids[start:start + settings.VECTORSTORE_WRITE_BATCH_SIZE])
+        
+        # Persist the database
+        vectorstore.persist()
+        dimension = stats["dimension"]
+    else:
+        raise ValueError(f"Unknown vector store backend '{backend}', use 'chroma', 'flat' or 'pq'")
+    
+    if shards == 1 and layout is not None:
+        # Back to a single store: drop the shards
+        publish_layout(persist_directory, None)
+    
+    write_embedding_info(persist_directory, embedding_model, dimension=dimension)
+    if lexical_builder is not None:
+        print(f"Lexical index saved ({lexical_builder.save(persist_directory)} chunks)")
+    publish_generation(persist_directory)
     
     print(f"Vector database created and saved in {persist_directory}")
+    print_cache_stats(embedding_model)
     return vectorstore
 
-def load_vectorstore(persist_directory=None, embedding_model=None):
+def _create_shards(documents, persist_directory, embedding_model, ids, backend, shards, lexical_builder,
+                   pipeline_kwargs):
+    """
+    Build a new generation of shards in parallel and switch the database to it.
+    
+    Every shard runs its own embedding pipeline, with an equal part of the
+    embedding concurrency, so the API sees the same number of requests as
+    with a single store.
+    
+    Returns:
+        tuple: (ShardedVectorStore, dimension of the vectors)
+    """
+    if ids is None:
+        items = ((document, document.metadata.get("chunk_id") or str(uuid.uuid4())) for document in documents)
+    else:
+        items = zip(documents, ids)
+    
+    if lexical_builder is not None:
+        items = _feed_lexical(items, lexical_builder)
+    
+    concurrency = pipeline_kwargs.get("concurrency") or settings.EMBEDDING_CONCURRENCY
+    shard_kwargs = dict(pipeline_kwargs, concurrency=max(1, concurrency // shards))
+    
+    layout = new_layout(persist_directory, shards)
+    directories = shard_directories(persist_directory, layout)
+    
+    def build(shard, shard_documents, shard_ids):
+        return create_vectorstore(
+            shard_documents, persist_directory=directories[shard], embedding_model=embedding_model,
+            ids=shard_ids, backend=backend, shards=1, lexical=False, **shard_kwargs
+        )
+    
+    try:
+        vectorstores = partition(items, shards, build)
+    except BaseException:
+        discard_layout(persist_directory, layout)
+        raise
+    publish_layout(persist_directory, layout)
+    
+    dimension = max((read_embedding_info(directory).get("dimension") or 0 for directory in directories), default=0)
+    print(f"{shards} shards: {', '.join(str(count_vectors(vectorstore)) for vectorstore in vectorstores)} chunks")
+    return ShardedVectorStore(persist_directory, vectorstores, embedding_model), dimension or None
+
+def _feed_lexical(items, lexical_builder, batch_size=256):
+    """Pass (document, id) pairs through, adding them to the lexical index in batches."""
+    batch = []
+    for document, doc_id in items:
+        batch.append((document, doc_id))
+        if len(batch) >= batch_size:
+            lexical_builder.add([doc_id for _, doc_id in batch], [document.page_content for document, _ in batch])
+            batch = []
+        yield document, doc_id
+    if batch:
+        lexical_builder.add([doc_id for _, doc_id in batch], [document.page_content for document, _ in batch])
+
+def _publish_flat(writer, embedding_model, backend, quantizer=None):
+    """
+    Publish a flat index generation, with its PQ codes for the "pq" backend.
+    
+    The codes are encoded before index.json switches to the generation, so
+    readers never open a flat index without them.
+    
+    Args:
+        writer (FlatIndexWriter): Writer of the new generation
+        embedding_model: Embedding model of the index
+        backend (str): "flat" or "pq"
+        quantizer (ProductQuantizer, optional): Trained quantizer to reuse
+        
+    Returns:
+        int: Number of vectors in the index
+    """
+    count = writer.finish()
+    if backend == "pq":
+        build_pq_index(FlatIndex(writer.persist_directory, embedding_model, info=writer.info), quantizer=quantizer)
+    writer.publish()
+    return count
+
+def clear_vectorstore(persist_directory, embedding_model, backend=None):
+    """
+    Empty the single store of a vector database directory, if it has one.
+    
+    Used when the embedding model changes, and when a database becomes
+    sharded, so the vectors it held at its top level do not stay on disk.
+    
+    Args:
+        persist_directory (str): Directory of the vector database
+        embedding_model: Embedding model of the database
+        backend (str): "chroma", "flat" or "pq". If None, uses VECTORSTORE_BACKEND from settings.
+    """
+    if backend is None:
+        backend = settings.VECTORSTORE_BACKEND
+    
+    if backend in ("flat", "pq"):
+        if FlatIndex.exists(persist_directory):
+            # An empty generation has no PQ codes; publishing it removes the previous ones
+            FlatIndexWriter(persist_directory).close()
+    elif os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        _open_chroma(persist_directory=persist_directory, embedding_function=embedding_model).delete_collection()
+
+def update_vectorstore(documents, ids, delete_ids=None, persist_directory=None, embedding_model=None,
+                       backend=None, lexical=None, **pipeline_kwargs):
+    """
+    Add or replace documents in an existing vector database and delete stale ones.
+    
+    Only the given documents are embedded; vectors already stored under other
+    ids are left untouched.
+    
+    Args:
+        documents (list): List of documents to embed
+        ids (list): Vector ids of the documents, in the same order
+        delete_ids (list, optional): Vector ids to remove from the database
+        persist_directory (str): Directory of the vector database
+        embedding_model: Embedding model to use. If None, uses get_embedding_model()
+            without client retries.
+        backend (str): "chroma", "flat" or "pq". If None, uses VECTORSTORE_BACKEND from settings.
+        lexical (bool): Whether to update the lexical index. If None, uses
+            LEXICAL_INDEX_ENABLED from settings.
+        **pipeline_kwargs: Overrides of the EmbeddingPipeline settings
+        
+    Returns:
+        VectorStore: Vector database (Chroma, FlatIndex, PQIndex or ShardedVectorStore)
+    """
+    if persist_directory is None:
+        persist_directory = settings.VECTORSTORE_DIR
+    
+    if backend is None:
+        backend = settings.VECTORSTORE_BACKEND
+    
+    if lexical is None:
+        lexical = settings.LEXICAL_INDEX_ENABLED
+    
+    vectorstore = load_vectorstore(
+        persist_directory=persist_directory,
+        # The pipeline retries rate-limited batches itself, adapting its concurrency
+        embedding_model=embedding_model or get_embedding_model(max_retries=0),
+        backend=backend
+    )
+    
+    if lexical:
+        update_lexical_index(vectorstore, persist_directory, documents, ids, delete_ids)
+    
+    if isinstance(vectorstore, ShardedVectorStore):
+        if not documents and not delete_ids:
+            return vectorstore
+        _update_shards(vectorstore, documents, ids, delete_ids, backend, pipeline_kwargs)
+        publish_generation(persist_directory)
+        vectorstore.close()
+        return load_vectorstore(persist_directory, embedding_model=vectorstore.embeddings, backend=backend)
+    
+    if backend in ("flat", "pq"):
+        if not documents and not delete_ids:
+            return vectorstore
+        # The index is read-only: write a new generation with the kept rows and the new vectors
+        writer = FlatIndexWriter(persist_directory, dtype=vectorstore.dtype if len(vectorstore) else None)
+        writer.copy_from(vectorstore, exclude=set(delete_ids or ()) | set(ids))
+        if documents:
+            stats = embed_into_vectorstore(writer, documents, ids=ids, embedding_model=vectorstore.embeddings,
+                                           **pipeline_kwargs)
+        # Re-encode with the existing quantizers rather than retraining them
+        _publish_flat(writer, vectorstore.embeddings, backend,
+                      quantizer=vectorstore.quantizer if backend == "pq" else None)
+        if documents and not os.path.exists(os.path.join(persist_directory, settings.EMBEDDING_INFO_FILE)):
+            write_embedding_info(persist_directory, vectorstore.embeddings, dimension=stats["dimension"])
+        print_cache_stats(vectorstore.embeddings)
+        publish_generation(persist_directory)
+        if backend == "pq":
+            return PQIndex(persist_directory, vectorstore.embeddings)
+        return FlatIndex(persist_directory, vectorstore.embeddings)
+    
+    if delete_ids:
+        vectorstore.delete(ids=list(delete_ids))
+    
+    if documents:
+        # Vectors are upserted by id, so re-adding an existing id replaces it
+        stats = embed_into_vectorstore(vectorstore, documents, ids=ids, **pipeline_kwargs)
+        if not os.path.exists(os.path.join(persist_directory, settings.EMBEDDING_INFO_FILE)):
+            write_embedding_info(persist_directory, vectorstore.embeddings, dimension=stats["dimension"])
+    
+    if documents or delete_ids:
+        publish_generation(persist_directory)
+    print_cache_stats(vectorstore.embeddings)
+    return vectorstore
+
+def _update_shards(vectorstore, documents, ids, delete_ids, backend, pipeline_kwargs):
+    """
+    Route an update of a sharded database to the shards it touches, updated in parallel.
+    
+    New chunks go to the shard of their source file. Deleted ids are looked up,
+    so only the shards holding them are rewritten.
+    """
+    shards = len(vectorstore.shards)
+    routed = [([], []) for _ in range(shards)]
+    for document, doc_id in zip(documents, ids):
+        shard_documents, shard_ids = routed[shard_of(document, doc_id, shards)]
+        shard_documents.append(document)
+        shard_ids.append(doc_id)
+    
+    delete_ids = list(delete_ids or ())
+    held = vectorstore.map(get_documents_by_ids, delete_ids)
+    deleted = [[doc_id for doc_id, document in zip(delete_ids, found) if document is not None] for found in held]
+    
+    directories = shard_directories(vectorstore.persist_directory)
+    touched = [shard for shard in range(shards) if routed[shard][0] or deleted[shard]]
+    
+    concurrency = pipeline_kwargs.get("concurrency") or settings.EMBEDDING_CONCURRENCY
+    shard_kwargs = dict(pipeline_kwargs, concurrency=max(1, concurrency // max(1, len(touched))))
+    
+    def update(shard):
+        update_vectorstore(
+            routed[shard][0], routed[shard][1], delete_ids=deleted[shard], persist_directory=directories[shard],
+            embedding_model=vectorstore.embeddings, backend=backend, lexical=False, **shard_kwargs
+        )
+    
+    print(f"Updating {len(touched)} of {shards} shards")
+    with ThreadPoolExecutor(max(1, len(touched))) as executor:
+        list(executor.map(update, touched))
+
+def count_vectors(vectorstore):
+    """
+    Count the vectors of a vector database.
+    
+    Args:
+        vectorstore (VectorStore): Chroma, FlatIndex, PQIndex or ShardedVectorStore
+        
+    Returns:
+        int: Number of stored vectors
+    """
+    if isinstance(vectorstore, (FlatIndex, ShardedVectorStore)):
+        return len(vectorstore)
+    return vectorstore._collection.count()
+
+def get_documents_by_ids(vectorstore, ids):
+    """
+    Read documents from a vector database by id, without any embedding call.
+    
+    Args:
+        vectorstore (VectorStore): Chroma, FlatIndex, PQIndex or ShardedVectorStore
+        ids (list): Vector ids
+        
+    Returns:
+        list: Documents aligned with the ids, None for unknown ids
+    """
+    if not ids:
+        return []
+    if isinstance(vectorstore, ShardedVectorStore):
+        return vectorstore.get_documents_by_ids(ids)
+    if isinstance(vectorstore, FlatIndex):
+        return [next(iter(vectorstore.get_by_ids([doc_id])), None) for doc_id in ids]
+    
+    found = vectorstore.get(ids=list(ids), include=["documents", "metadatas"])
+    by_id = {
+        doc_id: Document(page_content=text, metadata=metadata or {})
+        for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+    }
+    return [by_id.get(doc_id) for doc_id in ids]
+
+def search_by_vectors(vectorstore, embeddings, k):
+    """
+    Search several query vectors in one call to a vector database.
+    
+    The flat and PQ indexes score all queries in one pass over the vectors;
+    Chroma receives them in a single query. A sharded database searches its
+    shards in parallel and merges their results.
+    
+    Args:
+        vectorstore (VectorStore): Chroma, FlatIndex, PQIndex or ShardedVectorStore
+        embeddings (list): Query vectors
+        k (int): Number of results per query
+        
+    Returns:
+        list: For each query, (document, distance) pairs, nearest first
+    """
+    if not embeddings:
+        return []
+    if isinstance(vectorstore, (FlatIndex, ShardedVectorStore)):
+        return vectorstore.similarity_search_with_score_by_vectors(embeddings, k=k)
+    if count_vectors(vectorstore) == 0:
+        return [[] for _ in embeddings]
+    
+    found = vectorstore._collection.query(
+        query_embeddings=[list(map(float, vector)) for vector in embeddings],
+        n_results=k,
+        include=["documents", "metadatas", "distances"]
+    )
+    return [
+        [
+            (Document(page_content=text, metadata=metadata or {}), distance)
+            for text, metadata, distance in zip(texts, metadatas, distances)
+        ]
+        for texts, metadatas, distances in zip(found["documents"], found["metadatas"], found["distances"])
+    ]
+
+def update_lexical_index(vectorstore, persist_directory, documents, ids, delete_ids=None):
+    """
+    Apply an update of a vector database to its lexical index.
+    
+    Args:
+        vectorstore (VectorStore): Vector database, before the update
+        persist_directory (str): Directory of the vector database
+        documents (list): Documents added or replaced
+        ids (list): Vector ids of the documents
+        delete_ids (list, optional): Vector ids removed
+    """
+    if not settings.LEXICAL_INDEX_ENABLED or (not documents and not delete_ids):
+        return
+    
+    index = LexicalIndex.load(persist_directory)
+    if index is not None:
+        builder = LexicalIndexBuilder.from_index(index, exclude=set(delete_ids or ()) | set(ids))
+    elif count_vectors(vectorstore) == 0:
+        builder = LexicalIndexBuilder()
+    else:
+        # A partial index would make lexical results misleading
+        print("No lexical index for this vector database; run a full 'rag ingest' to build it")
+        return
+    
+    builder.add(ids, [doc.page_content for doc in documents])
+    builder.save(persist_directory)
+
+def load_vectorstore(persist_directory=None, embedding_model=None, backend=None):
     """
     Load a vector database from disk.
     
     Args:
         persist_directory (str): Directory containing vector database
         embedding_model: Embedding model to use
+        backend (str): "chroma", "flat" or "pq". If None, uses VECTORSTORE_BACKEND from settings.
+            Flat and PQ indexes are opened read-only and memory-mapped.
         
     Returns:
-        Chroma: Vector database
+        VectorStore: Vector database (Chroma, FlatIndex, PQIndex, or ShardedVectorStore
+            if the database is sharded)
+        
+    Raises:
+        ValueError: If the database was built with a different embedding model
     """
     if persist_directory is None:
         persist_directory = settings.VECTORSTORE_DIR
@@ -71,10 +719,167 @@ def load_vectorstore(persist_directory=None, embedding_model=None):
     if embedding_model is None:
         embedding_model = get_embedding_model()
     
+    if backend is None:
+        backend = settings.VECTORSTORE_BACKEND
+    
+    check_embedding_info(persist_directory, embedding_model)
+    
+    layout = read_layout(persist_directory)
+    if layout is not None:
+        shards = [
+            load_vectorstore(directory, embedding_model=embedding_model, backend=backend)
+            for directory in shard_directories(persist_directory, layout)
+        ]
+        return ShardedVectorStore(persist_directory, shards, embedding_model)
+    
+    if backend in ("flat", "pq"):
+        if not FlatIndex.exists(persist_directory):
+            # Start from an empty index, like Chroma does for a new directory
+            FlatIndexWriter(persist_directory).close()
+        if backend == "pq":
+            return PQIndex(persist_directory, embedding_model)
+        return FlatIndex(persist_directory, embedding_model)
+    
     # Load the vector database
-    vectorstore = Chroma(
+    vectorstore = _open_chroma(
         persist_directory=persist_directory,
         embedding_function=embedding_model
     )
     
-    return vectorstore
\ No newline at end of file
+    return vectorstore
+
+def _collection_ids(vectorstore, batch_size=None):
+    """List the ids stored in a Chroma collection, read in batches."""
+    if batch_size is None:
+        batch_size = settings.VECTORSTORE_WRITE_BATCH_SIZE
+    
+    ids = []
+    for offset in range(0, count_vectors(vectorstore), batch_size):
+        ids.extend(vectorstore._collection.get(limit=batch_size, offset=offset, include=[])["ids"])
+    return ids
+
+def iter_vectors(vectorstore, batch_size=None):
+    """
+    Read back every stored document with its id and vector, in batches.
+    
+    Args:
+        vectorstore (VectorStore): Chroma, FlatIndex, PQIndex or ShardedVectorStore
+        batch_size (int): Vectors per batch. If None, uses VECTORSTORE_WRITE_BATCH_SIZE from settings.
+        
+    Yields:
+        tuple: (documents, ids, vectors) of a batch
+    """
+    if batch_size is None:
+        batch_size = settings.VECTORSTORE_WRITE_BATCH_SIZE
+    
+    if isinstance(vectorstore, ShardedVectorStore):
+        for shard in vectorstore.shards:
+            yield from iter_vectors(shard, batch_size)
+        return
+    
+    if isinstance(vectorstore, FlatIndex):
+        for start in range(0, len(vectorstore), batch_size):
+            rows = range(start, min(start + batch_size, len(vectorstore)))
+            yield (
+                vectorstore.get_documents(rows),
+                vectorstore.ids[rows.start:rows.stop],
+                np.asarray(vectorstore.vectors[rows.start:rows.stop], dtype=np.float32).tolist()
+            )
+        return
+    
+    for offset in range(0, count_vectors(vectorstore), batch_size):
+        found = vectorstore._collection.get(
+            limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"]
+        )
+        yield (
+            [Document(page_content=text, metadata=metadata or {})
+             for text, metadata in zip(found["documents"], found["metadatas"])],
+            found["ids"],
+            [list(map(float, vector)) for vector in found["embeddings"]]
+        )
+
+def reshard_vectorstore(shards, persist_directory=None, embedding_model=None, backend=None):
+    """
+    Re-partition a vector database over a new number of shards, offline.
+    
+    Stored vectors are copied to a new generation of shards, without any
+    embedding call, and the database switches to it once it is complete.
+    The lexical index, calibration and embedding info do not change. With
+    one shard, the database becomes a single store again.
+    
+    Args:
+        shards (int): New number of shards
+        persist_directory (str): Directory of the vector database
+        embedding_model: Embedding model of the database
+        backend (str): "chroma", "flat" or "pq". If None, uses VECTORSTORE_BACKEND from settings.
+        
+    Returns:
+        VectorStore: Re-partitioned vector database
+    """
+    if persist_directory is None:
+        persist_directory = settings.VECTORSTORE_DIR
+    
+    if backend is None:
+        backend = settings.VECTORSTORE_BACKEND
+    
+    if shards < 1:
+        raise ValueError(f"Invalid number of shards: {shards}")
+    
+    source = load_vectorstore(persist_directory, embedding_model=embedding_model, backend=backend)
+    embedding_model = source.embeddings
+    sharded = isinstance(source, ShardedVectorStore)
+    if shards == (len(source.shards) if sharded else 1):
+        print(f"The vector database in {persist_directory} already has {shards} shard(s)")
+        return source
+    
+    if shards > 1:
+        layout = new_layout(persist_directory, shards)
+        directories = shard_directories(persist_directory, layout)
+    else:
+        # The top-level store is unused while the database is sharded
+        layout = None
+        directories = [persist_directory]
+        clear_vectorstore(persist_directory, embedding_model, backend)
+    
+    if backend in ("flat", "pq"):
+        writers = [FlatIndexWriter(directory) for directory in directories]
+    else:
+        writers = [_open_chroma(persist_directory=directory, embedding_function=embedding_model)
+                   for directory in directories]
+    
+    dimension = None
+    try:
+        for documents, ids, vectors in iter_vectors(source):
+            routed = [([], [], []) for _ in directories]
+            for document, doc_id, vector in zip(documents, ids, vectors):
+                target = routed[shard_of(document, doc_id, shards)]
+                target[0].append(document)
+                target[1].append(doc_id)
+                target[2].append(vector)
+            for writer, (shard_documents, shard_ids, shard_vectors) in zip(writers, routed):
+                if shard_ids:
+                    write_embeddings(writer, shard_documents, shard_ids, shard_vectors)
+            dimension = dimension or (len(vectors[0]) if vectors else None)
+        
+        counts = []
+        for writer, directory in zip(writers, directories):
+            if backend in ("flat", "pq"):
+                counts.append(_publish_flat(writer, embedding_model, backend))
+            else:
+                writer.persist()
+                counts.append(count_vectors(writer))
+            write_embedding_info(directory, embedding_model, dimension=dimension)
+    except BaseException:
+        if layout is not None:
+            discard_layout(persist_directory, layout)
+        raise
+    
+    if sharded:
+        source.close()
+    publish_layout(persist_directory, layout)
+    if layout is not None and not sharded:
+        clear_vectorstore(persist_directory, embedding_model, backend)
+    publish_generation(persist_directory)
+    print(f"Vector database in {persist_directory} re-partitioned over {shards} shard(s): "
+          f"{', '.join(map(str, counts))} chunks")
+    return load_vectorstore(persist_directory, embedding_model=embedding_model, backend=backend)
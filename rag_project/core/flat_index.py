@@ -0,0 +1,395 @@
+"""Module for exact vector search over a memory-mapped NumPy matrix."""
+
+import glob
+import json
+import mmap
+import os
+import uuid
+from typing import List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from rag_project.utils.file_utils import atomic_write
+from rag_project.config import settings
+
+INDEX_FILE = "index.json"
+FLAT_INDEX_VERSION = 1
+# Files named "<prefix>-<generation>.<ext>": those of the flat index, and the
+# PQ codes built for it (see pq_index.build_pq_index)
+GENERATION_FILE_PREFIXES = ("vectors", "norms", "offsets", "docs", "ids", "pq_index")
+
+class FlatIndex(VectorStore):
+    """
+    Read-only vector store doing exact search over a contiguous vector matrix.
+
+    Vectors, their squared norms and the document offsets are memory-mapped, so
+    opening an index is almost instant and worker processes serving the same
+    index share its pages through the OS page cache. A search is one
+    matrix-vector product followed by a partial sort, and several queries are
+    served by a single matrix-matrix product.
+
+    Scores are squared L2 distances (lower is better), like Chroma's defaults,
+    so thresholds carry over between the two backends.
+    """
+
+    def __init__(self, persist_directory, embedding_function, info=None):
+        """
+        Open an index.
+
+        Args:
+            persist_directory (str): Directory written by FlatIndexWriter
+            embedding_function (Embeddings): Model embedding the queries
+            info (dict): Description of the generation to open, e.g. one finished
+                but not yet published (FlatIndexWriter.info). If None, opens the
+                published generation.
+        """
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+
+        if info is None:
+            with open(os.path.join(persist_directory, INDEX_FILE), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        self.info = info
+
+        self.count = self.info["count"]
+        self.dimension = self.info["dimension"]
+        self.dtype = np.dtype(self.info["dtype"])
+        self._ids = None
+        self._rows = None
+
+        if self.count:
+            self.vectors = np.load(self._path("vectors"), mmap_mode="r")
+            self.norms = np.load(self._path("norms"), mmap_mode="r")
+            self.offsets = np.load(self._path("offsets"), mmap_mode="r")
+            with open(self._path("docs"), "rb") as f:
+                self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.vectors = self.norms = self.offsets = self._docs = None
+
+    def _path(self, name):
+        return os.path.join(self.persist_directory, self.info["files"][name])
+
+    @staticmethod
+    def exists(persist_directory):
+        """Check whether a directory holds a flat index."""
+        return os.path.exists(os.path.join(persist_directory, INDEX_FILE))
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def ids(self):
+        """Vector ids, in row order (loaded on first access)."""
+        if self._ids is None:
+            if not self.count:
+                self._ids = []
+            else:
+                with open(self._path("ids"), "r", encoding="utf-8") as f:
+                    self._ids = f.read().split("\n")[:self.count]
+        return self._ids
+
+    def _record(self, row):
+        start, end = self.offsets[row]
+        return json.loads(self._docs[int(start):int(end)])
+
+    def get_documents(self, rows):
+        """
+        Read the documents stored at the given rows.
+
+        Args:
+            rows (iterable): Row numbers
+
+        Returns:
+            List[Document]: Documents, in the same order
+        """
+        documents = []
+        for row in rows:
+            record = self._record(row)
+            documents.append(Document(page_content=record["page_content"], metadata=record["metadata"]))
+        return documents
+
+    def get_by_ids(self, ids, /) -> List[Document]:
+        """
+        Read documents by vector id.
+
+        Args:
+            ids (list): Vector ids; unknown ids are skipped
+
+        Returns:
+            List[Document]: Documents, in the order of the ids
+        """
+        if self._rows is None:
+            self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return self.get_documents(self._rows[doc_id] for doc_id in ids if doc_id in self._rows)
+
+    def search_vectors(self, query_vectors, k):
+        """
+        Find the nearest rows of several query vectors at once.
+
+        Args:
+            query_vectors (array-like): Query vectors, one per row
+            k (int): Number of neighbours per query
+
+        Returns:
+            tuple: (rows, distances) arrays of shape (queries, k), nearest first
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        k = min(k, self.count)
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Query vectors have {queries.shape[1]} dimensions, the index has {self.dimension}")
+
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x, with ||x||^2 precomputed
+        distances = np.empty((len(queries), self.count), dtype=np.float32)
+        block_rows = settings.FLAT_INDEX_BLOCK_ROWS
+        for start in range(0, self.count, block_rows):
+            block = self.vectors[start:start + block_rows]
+            if block.dtype != np.float32:
+                # BLAS has no float16 kernels; converting block by block bounds the copy
+                block = block.astype(np.float32)
+            distances[:, start:start + len(block)] = queries @ block.T
+        distances *= -2
+        distances += self.norms
+        distances += np.einsum("ij,ij->i", queries, queries)[:, None]
+
+        # Partial sort: only the k best of each row are ordered
+        if k < self.count:
+            rows = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            rows = np.tile(np.arange(self.count), (len(queries), 1))
+        top = np.take_along_axis(distances, rows, axis=1)
+        order = np.argsort(top, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        return rows, np.maximum(np.take_along_axis(top, order, axis=1), 0)
+
+    def similarity_search_with_score_by_vectors(self, embeddings, k=4) -> List[List[tuple]]:
+        """
+        Search several query vectors in one pass.
+
+        Args:
+            embeddings (list): Query vectors
+            k (int): Number of results per query
+
+        Returns:
+            List[List[tuple]]: For each query, (document, distance) pairs
+        """
+        rows, distances = self.search_vectors(embeddings, k)
+        return [
+            list(zip(self.get_documents(query_rows), query_distances.tolist()))
+            for query_rows, query_distances in zip(rows, distances)
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4) -> List[tuple]:
+        """Search one query vector, returning (document, distance) pairs."""
+        return self.similarity_search_with_score_by_vectors([embedding], k=k)[0]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs) -> List[tuple]:
+        """Search a query text, returning (document, distance) pairs."""
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+
+    def similarity_search(self, query, k=4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError(
+            "FlatIndex is read-only; build it with create_vectorstore or update_vectorstore"
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory=None, **kwargs):
+        """Embed texts into a new index and open it."""
+        if persist_directory is None:
+            persist_directory = settings.VECTORSTORE_DIR
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        writer = FlatIndexWriter(persist_directory)
+        writer.add(
+            [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)],
+            ids,
+            embedding.embed_documents(list(texts))
+        )
+        writer.close()
+        return cls(persist_directory, embedding)
+
+class FlatIndexWriter:
+    """
+    Build a flat index incrementally, in bounded memory.
+
+    Vectors and documents are streamed to files of a new generation as they
+    arrive; finish() compacts them and publish() then switches index.json to
+    the new generation atomically, so readers always see a complete index.
+    Files derived from the generation (PQ codes) are built in between, so they
+    switch with it. close() does both steps. When an id is added twice, the
+    last vector wins.
+    """
+
+    def __init__(self, persist_directory, dtype=None):
+        """
+        Start a new index generation.
+
+        Args:
+            persist_directory (str): Directory of the index
+            dtype (str): Storage type of the vectors, "float16" or "float32".
+                If None, uses FLAT_INDEX_DTYPE from settings.
+        """
+        self.persist_directory = persist_directory
+        self.dtype = np.dtype(dtype or settings.FLAT_INDEX_DTYPE)
+        self.generation = uuid.uuid4().hex[:12]
+        self.dimension = None
+        self.info = None
+        self.ids = []
+        self.offsets = []
+        self.norms = []
+
+        os.makedirs(persist_directory, exist_ok=True)
+        self.files = {
+            "vectors": f"vectors-{self.generation}.npy",
+            "norms": f"norms-{self.generation}.npy",
+            "offsets": f"offsets-{self.generation}.npy",
+            "docs": f"docs-{self.generation}.jsonl",
+            "ids": f"ids-{self.generation}.txt",
+        }
+        self._raw_path = os.path.join(persist_directory, f"vectors-{self.generation}.raw")
+        self._raw = open(self._raw_path, "wb")
+        self._docs = open(os.path.join(persist_directory, self.files["docs"]), "wb")
+        self._docs_size = 0
+
+    def add(self, documents, ids, vectors):
+        """
+        Append documents with their vectors.
+
+        Args:
+            documents (list): Documents
+            ids (list): Vector ids of the documents
+            vectors (list): One vector per document
+        """
+        if not documents:
+            return
+        stored = np.asarray(vectors, dtype=np.float32).astype(self.dtype)
+        if self.dimension is None:
+            self.dimension = stored.shape[1]
+        elif stored.shape[1] != self.dimension:
+            raise ValueError(f"Got {stored.shape[1]}-dimensional vectors, the index has {self.dimension}")
+
+        self._raw.write(stored.tobytes())
+        # Norms of the stored (possibly rounded) values, so distances stay exact
+        self.norms.extend(np.square(stored.astype(np.float32)).sum(axis=1).tolist())
+
+        for document, doc_id in zip(documents, ids):
+            record = {"id": doc_id, "page_content": document.page_content, "metadata": document.metadata}
+            self._write_record((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"), doc_id)
+
+    def _write_record(self, line, doc_id):
+        self._docs.write(line)
+        self.offsets.append((self._docs_size, self._docs_size + len(line) - 1))
+        self._docs_size += len(line)
+        self.ids.append(doc_id)
+
+    def copy_from(self, index, exclude=()):
+        """
+        Copy the rows of an existing index, except the excluded ids.
+
+        Vectors are copied as stored, without re-embedding.
+
+        Args:
+            index (FlatIndex): Index to copy from
+            exclude (set): Vector ids to leave out
+        """
+        if not index.count:
+            return
+        if self.dimension is None:
+            self.dimension = index.dimension
+        keep = [row for row, doc_id in enumerate(index.ids) if doc_id not in exclude]
+        block_rows = settings.FLAT_INDEX_BLOCK_ROWS
+        for start in range(0, len(keep), block_rows):
+            rows = keep[start:start + block_rows]
+            stored = np.asarray(index.vectors[rows]).astype(self.dtype)
+            self._raw.write(stored.tobytes())
+            self.norms.extend(np.square(stored.astype(np.float32)).sum(axis=1).tolist())
+            for row in rows:
+                begin, end = index.offsets[row]
+                self._write_record(index._docs[int(begin):int(end) + 1], index.ids[row])
+
+    def close(self):
+        """
+        Finish the generation and make it the current index.
+
+        Returns:
+            int: Number of vectors in the index
+        """
+        count = self.finish()
+        self.publish()
+        return count
+
+    def finish(self):
+        """
+        Write the files of the generation, without publishing it.
+
+        The generation can then be opened with FlatIndex(persist_directory,
+        embedding_function, info=writer.info).
+
+        Returns:
+            int: Number of vectors in the index
+        """
+        self._raw.close()
+        self._docs.close()
+
+        # Keep the last occurrence of every id
+        last = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        keep = sorted(last.values())
+        count = len(keep)
+
+        if count:
+            raw = np.memmap(self._raw_path, dtype=self.dtype, mode="r", shape=(len(self.ids), self.dimension))
+            vectors = np.lib.format.open_memmap(
+                self._file("vectors"), mode="w+", dtype=self.dtype, shape=(count, self.dimension)
+            )
+            block_rows = settings.FLAT_INDEX_BLOCK_ROWS
+            for start in range(0, count, block_rows):
+                vectors[start:start + block_rows] = raw[keep[start:start + block_rows]]
+            vectors.flush()
+            del vectors, raw
+            np.save(self._file("norms"), np.asarray(self.norms, dtype=np.float32)[keep])
+            np.save(self._file("offsets"), np.asarray(self.offsets, dtype=np.int64)[keep])
+            with open(self._file("ids"), "w", encoding="utf-8") as f:
+                f.write("\n".join(self.ids[row] for row in keep))
+        os.remove(self._raw_path)
+
+        self.info = {
+            "version": FLAT_INDEX_VERSION,
+            "generation": self.generation,
+            "count": count,
+            "dimension": self.dimension,
+            "dtype": self.dtype.name,
+            "files": self.files,
+        }
+        return count
+
+    def publish(self):
+        """Make the finished generation the current index and remove the previous ones."""
+        atomic_write(os.path.join(self.persist_directory, INDEX_FILE), json.dumps(self.info, indent=2))
+        self._remove_old_generations()
+
+    def _file(self, name):
+        return os.path.join(self.persist_directory, self.files[name])
+
+    def _remove_old_generations(self):
+        # Processes still mapping the old files keep reading them until they reopen the index
+        for prefix in GENERATION_FILE_PREFIXES:
+            for path in glob.glob(os.path.join(self.persist_directory, f"{prefix}-*")):
+                if f"-{self.generation}." not in os.path.basename(path) and not path.endswith(".raw"):
+                    os.remove(path)
@@ -0,0 +1,287 @@
+"""Module for lexical (BM25) retrieval over French text."""
+
+import math
+import os
+import re
+import unicodedata
+import numpy as np
+from rag_project.config import settings
+
+FRENCH_STOPWORDS = frozenset("""
+a ai aie aient aies ait as au aucun aussi autre aux avaient avais avait avant avec avez aviez avions avoir
+avons ayant bon c ca car ce ceci cela celle celles celui ces cet cette ceux chaque ci comme comment d
+dans de des deux dois doit donc dont du elle elles en encore est et etaient etais etait etant ete etes
+etiez etions etre eu eux fait faire fois font hors i il ils j je jusqu l la le les leur leurs lorsqu lui
+m ma mais me meme mes moi moins mon n ne ni nos notre nous on ont or ou par parce pas peu peut plus pour
+pourquoi puisqu qu quand que quel quelle quelles quels qui s sa sans se sera ses si son sont sous suis
+sur t ta te tes toi ton tous tout toute toutes tres tu un une vos votre vous y
+""".split())
+
+# Contractions such as l'été, d'un, qu'il, jusqu'au (straight or typographic apostrophe)
+_ELISION = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu|quoiqu)['’]", re.IGNORECASE)
+_WORD = re.compile(r"\w+")
+
+def _strip_accents(text):
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def tokenize(text):
+    """
+    Split French text into normalized search terms.
+
+    Text is lowercased and stripped of accents, elided articles and pronouns
+    are removed, stopwords dropped, and common plural endings folded, so that
+    "l'Hôtel", "hôtel" and "hôtels" all give "hotel".
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Terms, in order
+    """
+    text = _strip_accents(_ELISION.sub(" ", text.lower()))
+    terms = []
+    for word in _WORD.findall(text):
+        if word in FRENCH_STOPWORDS:
+            continue
+        # Light plural folding: chateaux -> chateau, pommes -> pomme (but not prix, bus)
+        if word.endswith("eaux"):
+            word = word[:-1]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class LexicalIndexBuilder:
+    """
+    Collect per-document term frequencies and write them as a BM25 index.
+
+    Postings are accumulated as (document, term, frequency) triples, so an
+    existing index can be reopened, stripped of replaced documents and
+    extended without re-tokenizing the rest of the corpus.
+    """
+
+    def __init__(self):
+        self.terms = {}
+        self.ids = []
+        self.lengths = []
+        self._docs = []
+        self._term_ids = []
+        self._freqs = []
+
+    @classmethod
+    def from_index(cls, index, exclude=()):
+        """
+        Start from the documents of an existing index.
+
+        Args:
+            index (LexicalIndex): Index to copy
+            exclude (set): Document ids to leave out (deleted or about to be replaced)
+
+        Returns:
+            LexicalIndexBuilder: Builder holding the kept documents
+        """
+        builder = cls()
+        builder.terms = {term: term_id for term_id, term in enumerate(index.terms)}
+        keep = np.array([doc_id not in exclude for doc_id in index.ids], dtype=bool)
+        new_positions = np.cumsum(keep) - 1
+
+        # Expand the CSR postings back to triples and drop the excluded documents
+        term_ids = np.repeat(np.arange(len(index.terms)), np.diff(index.term_offsets))
+        kept = keep[index.postings_docs]
+        builder._docs.append(new_positions[index.postings_docs[kept]])
+        builder._term_ids.append(term_ids[kept])
+        builder._freqs.append(index.postings_freqs[kept])
+        builder.ids = [doc_id for doc_id, kept_doc in zip(index.ids, keep) if kept_doc]
+        builder.lengths = index.lengths[keep].tolist()
+        return builder
+
+    def add(self, ids, texts):
+        """
+        Add documents.
+
+        Args:
+            ids (list): Document ids (chunk ids)
+            texts (list): Document texts
+        """
+        docs, term_ids, freqs = [], [], []
+        for doc_id, text in zip(ids, texts):
+            counts = {}
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + 1
+            position = len(self.ids)
+            for term, freq in counts.items():
+                docs.append(position)
+                term_ids.append(self.terms.setdefault(term, len(self.terms)))
+                freqs.append(freq)
+            self.ids.append(doc_id)
+            self.lengths.append(sum(counts.values()))
+        self._docs.append(np.asarray(docs, dtype=np.int64))
+        self._term_ids.append(np.asarray(term_ids, dtype=np.int64))
+        self._freqs.append(np.asarray(freqs, dtype=np.float32))
+
+    def save(self, persist_directory):
+        """
+        Write the index next to the vector database.
+
+        When an id was added more than once, its last version is kept.
+
+        Args:
+            persist_directory (str): Directory of the vector database
+
+        Returns:
+            int: Number of indexed documents
+        """
+        docs = np.concatenate(self._docs) if self._docs else np.empty(0, dtype=np.int64)
+        term_ids = np.concatenate(self._term_ids) if self._term_ids else np.empty(0, dtype=np.int64)
+        freqs = np.concatenate(self._freqs) if self._freqs else np.empty(0, dtype=np.float32)
+
+        # Keep the last occurrence of every id, like the vector stores' upserts
+        last = {doc_id: position for position, doc_id in enumerate(self.ids)}
+        keep = np.zeros(len(self.ids), dtype=bool)
+        keep[list(last.values())] = True
+        new_positions = np.cumsum(keep) - 1
+        kept = keep[docs]
+        docs, term_ids, freqs = new_positions[docs[kept]], term_ids[kept], freqs[kept]
+
+        order = np.lexsort((docs, term_ids))
+        term_offsets = np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(self.terms)))))
+        terms = sorted(self.terms, key=self.terms.get)
+
+        path = os.path.join(persist_directory, settings.LEXICAL_INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.array(terms, dtype=str),
+                term_offsets=term_offsets,
+                postings_docs=docs[order].astype(np.int32),
+                postings_freqs=freqs[order],
+                ids=np.array([doc_id for doc_id, kept_doc in zip(self.ids, keep) if kept_doc], dtype=str),
+                lengths=np.asarray(self.lengths, dtype=np.float32)[keep]
+            )
+        os.replace(tmp_path, path)
+        return int(keep.sum())
+
+class LexicalIndex:
+    """BM25 inverted index over the chunks of a vector database."""
+
+    def __init__(self, terms, term_offsets, postings_docs, postings_freqs, ids, lengths, k1=None, b=None):
+        """
+        Args:
+            terms (list): Vocabulary, indexed by term id
+            term_offsets (np.ndarray): Start of each term's postings, plus the total
+            postings_docs (np.ndarray): Document positions of the postings, grouped by term
+            postings_freqs (np.ndarray): Term frequencies of the postings
+            ids (list): Document ids, indexed by position
+            lengths (np.ndarray): Number of terms of each document
+            k1 (float): BM25 term-frequency saturation
+            b (float): BM25 length normalization
+        """
+        self.terms = list(terms)
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_freqs = postings_freqs
+        self.ids = list(ids)
+        self.lengths = lengths
+        self.k1 = settings.BM25_K1 if k1 is None else k1
+        self.b = settings.BM25_B if b is None else b
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def load(cls, persist_directory):
+        """
+        Load the index stored next to a vector database.
+
+        Args:
+            persist_directory (str): Directory of the vector database
+
+        Returns:
+            LexicalIndex: Index, or None if the database has none
+        """
+        path = os.path.join(persist_directory, settings.LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(
+                data["terms"].tolist(), data["term_offsets"], data["postings_docs"],
+                data["postings_freqs"], data["ids"].tolist(), data["lengths"]
+            )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=10):
+        """
+        Rank documents by BM25 score.
+
+        Args:
+            query (str): Query text
+            k (int): Number of results
+
+        Returns:
+            list: (document id, score) pairs, best first
+        """
+        count = len(self.ids)
+        term_ids = [self.term_ids[term] for term in set(tokenize(query)) if term in self.term_ids]
+        if not count or not term_ids:
+            return []
+
+        scores = np.zeros(count, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / self.average_length)
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            freqs = self.postings_freqs[start:end]
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[position], float(scores[position])) for position in matched]
+
+def is_decisive(hits, min_score=None, ratio=None):
+    """
+    Check whether lexical results are confident enough to skip dense retrieval.
+
+    The best hit must reach a minimum BM25 score and beat the runner-up by a
+    clear ratio, as for exact product-name or keyword lookups.
+
+    Args:
+        hits (list): (document id, score) pairs, best first
+        min_score (float): Minimum score of the best hit
+        ratio (float): Minimum ratio between the best and second best scores
+
+    Returns:
+        bool: True if the lexical results can be served alone
+    """
+    min_score = settings.LEXICAL_FAST_PATH_MIN_SCORE if min_score is None else min_score
+    ratio = settings.LEXICAL_FAST_PATH_RATIO if ratio is None else ratio
+    if not hits or hits[0][1] < min_score:
+        return False
+    return len(hits) == 1 or hits[0][1] >= ratio * hits[1][1]
+
+def reciprocal_rank_fusion(rankings, k=None):
+    """
+    Merge several rankings with reciprocal-rank fusion.
+
+    Each item scores sum(1 / (k + rank)) over the rankings it appears in, so
+    items ranked well by several retrievers come first, whatever the scales of
+    the original scores.
+
+    Args:
+        rankings (list): Lists of ids, best first
+        k (int): Rank offset dampening the weight of the top ranks
+
+    Returns:
+        list: (id, fused score) pairs, best first
+    """
+    k = settings.RRF_K if k is None else k
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,129 @@
+"""Module for in-process CPU embeddings with sentence-transformers."""
+
+from typing import List
+from langchain_core.embeddings import Embeddings
+from rag_project.config import settings
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embedding model running in-process on the CPU.
+
+    Texts are sorted by length and grouped into batches under a padded-token
+    budget, so short texts are not padded to the length of long ones. The model
+    can optionally run with dynamic int8 quantization or on the ONNX runtime.
+    """
+
+    provider = "local"
+    # Inference already uses every configured thread, so parallel calls only contend
+    max_concurrency = 1
+
+    def __init__(self, model_name=None, threads=None, quantization=None,
+                 batch_tokens=None, max_batch_size=None):
+        """
+        Load the model.
+
+        Args:
+            model_name (str): sentence-transformers model name or path
+            threads (int): Number of CPU threads used for inference. If None,
+                uses LOCAL_EMBEDDING_THREADS from settings, or torch's default.
+            quantization (str): None, "int8" (dynamic quantization of linear
+                layers) or "onnx" (ONNX runtime backend)
+            batch_tokens (int): Padded-token budget of one inference batch
+            max_batch_size (int): Maximum texts per inference batch
+        """
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding provider needs sentence-transformers and torch: "
+                "pip install 'rag_project[local]'"
+            ) from e
+
+        self.model_name = model_name or settings.LOCAL_EMBEDDING_MODEL
+        self.quantization = settings.LOCAL_EMBEDDING_QUANTIZATION if quantization is None else quantization
+        self.batch_tokens = batch_tokens or settings.LOCAL_EMBEDDING_BATCH_TOKENS
+        self.max_batch_size = max_batch_size or settings.LOCAL_EMBEDDING_MAX_BATCH_SIZE
+
+        threads = threads or settings.LOCAL_EMBEDDING_THREADS
+        if threads:
+            torch.set_num_threads(threads)
+
+        if self.quantization == "onnx":
+            self.model = SentenceTransformer(self.model_name, device="cpu", backend="onnx")
+        else:
+            self.model = SentenceTransformer(self.model_name, device="cpu")
+            if self.quantization == "int8":
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            elif self.quantization:
+                raise ValueError(f"Unknown quantization '{self.quantization}', use 'int8' or 'onnx'")
+
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.max_seq_length = self.model.max_seq_length or 512
+
+    def _estimate_tokens(self, text):
+        # About four characters per token, truncated like the model does
+        return min(self.max_seq_length, len(text) // 4 + 2)
+
+    def _batches(self, texts):
+        """
+        Group text indices into length-sorted batches under the padded-token budget.
+
+        Yields:
+            list: Indices of the texts of one batch
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batch = []
+        batch_width = 0
+        for index in order:
+            width = max(batch_width, self._estimate_tokens(texts[index]))
+            if batch and (width * (len(batch) + 1) > self.batch_tokens or len(batch) >= self.max_batch_size):
+                yield batch
+                batch = []
+                width = self._estimate_tokens(texts[index])
+            batch.append(index)
+            batch_width = width
+        if batch:
+            yield batch
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents with dynamic batching.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One normalized vector per text
+        """
+        vectors = [None] * len(texts)
+        for batch in self._batches(texts):
+            encoded = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            for index, vector in zip(batch, encoded):
+                vectors[index] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query.
+
+        Args:
+            text (str): Query to embed
+
+        Returns:
+            List[float]: Normalized query vector
+        """
+        return self.model.encode(
+            [text],
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )[0].tolist()
@@ -0,0 +1,345 @@
+"""Module for approximate vector search with an IVF-PQ compressed index."""
+
+import json
+import os
+import numpy as np
+from rag_project.core.flat_index import FlatIndex, INDEX_FILE
+from rag_project.config import settings
+
+# One file per generation of the flat index, published and removed with it
+PQ_INDEX_FILE = "pq_index-{generation}.npz"
+
+def pq_index_path(persist_directory, generation):
+    """Path of the PQ codes of a generation of the flat index."""
+    return os.path.join(persist_directory, PQ_INDEX_FILE.format(generation=generation))
+
+def nearest_centroids(data, centroids, block_rows=65536):
+    """
+    Assign each vector to its nearest centroid.
+
+    Args:
+        data (np.ndarray): Vectors, one per row
+        centroids (np.ndarray): Centroids, one per row
+        block_rows (int): Rows scored per matrix product
+
+    Returns:
+        np.ndarray: Index of the nearest centroid of each vector
+    """
+    centroid_norms = np.square(centroids).sum(axis=1)
+    scaled = np.ascontiguousarray(-2 * centroids.T, dtype=np.float32)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), block_rows):
+        block = np.asarray(data[start:start + block_rows], dtype=np.float32)
+        # ||x||^2 is the same for every centroid, so it does not change the argmin
+        scores = block @ scaled
+        scores += centroid_norms
+        labels[start:start + len(block)] = scores.argmin(axis=1)
+    return labels
+
+def kmeans(data, k, iterations=20, seed=0):
+    """
+    Cluster vectors with Lloyd's algorithm.
+
+    Args:
+        data (np.ndarray): float32 training vectors, one per row
+        k (int): Number of clusters
+        iterations (int): Number of assignment/update rounds
+        seed (int): Seed of the initialization
+
+    Returns:
+        np.ndarray: Centroids of shape (k, dimension)
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = nearest_centroids(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        # Sum the members of each cluster in one pass over the sorted vectors
+        order = np.argsort(labels, kind="stable")
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+        # Empty clusters restart from random vectors
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+class ProductQuantizer:
+    """
+    Coarse quantizer plus product quantizer of the residuals (IVF-PQ).
+
+    Each vector is assigned to one of `nlist` coarse clusters; its residual to
+    the cluster centroid is split into `subquantizers` sub-vectors, each encoded
+    as one byte, the index of its nearest centroid among 256.
+    """
+
+    def __init__(self, coarse, codebooks):
+        """
+        Args:
+            coarse (np.ndarray): Coarse centroids, shape (nlist, dimension)
+            codebooks (np.ndarray): Sub-vector centroids, shape (subquantizers, ksub, dimension / subquantizers)
+        """
+        self.coarse = np.asarray(coarse, dtype=np.float32)
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.nlist = len(self.coarse)
+        self.subquantizers, self.ksub, self.sub_dimension = self.codebooks.shape
+
+    @classmethod
+    def train(cls, vectors, nlist=None, subquantizers=None, train_size=None, iterations=None, seed=0):
+        """
+        Train the quantizers on a sample of the vectors.
+
+        Args:
+            vectors (np.ndarray): Vectors to sample from (may be memory-mapped)
+            nlist (int): Number of coarse clusters, capped for small corpora
+            subquantizers (int): Number of sub-vectors, lowered to a divisor of the dimension
+            train_size (int): Number of sampled training vectors
+            iterations (int): k-means iterations
+            seed (int): Random seed
+
+        Returns:
+            ProductQuantizer: Trained quantizer
+        """
+        nlist = nlist or settings.PQ_NLIST
+        subquantizers = subquantizers or settings.PQ_SUBQUANTIZERS
+        train_size = train_size or settings.PQ_TRAIN_SIZE
+        iterations = iterations or settings.PQ_KMEANS_ITERATIONS
+
+        count, dimension = vectors.shape
+        # Sub-vectors must split the dimension evenly: fall back to the nearest divisor
+        subquantizers = min(subquantizers, dimension)
+        while dimension % subquantizers:
+            subquantizers -= 1
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(count, min(count, train_size), replace=False))
+        data = np.asarray(vectors[sample], dtype=np.float32)
+
+        # About 40 training vectors per cluster keeps the centroids meaningful
+        nlist = max(1, min(nlist, len(data) // 40))
+        coarse = kmeans(data, nlist, iterations, seed)
+        residuals = data - coarse[nearest_centroids(data, coarse)]
+
+        sub_dimension = dimension // subquantizers
+        ksub = min(256, len(data))
+        # Small codebooks converge on far fewer points than the coarse clusters need
+        residuals = residuals[rng.permutation(len(residuals))[:ksub * 64]]
+        codebooks = np.empty((subquantizers, ksub, sub_dimension), dtype=np.float32)
+        for m in range(subquantizers):
+            part = np.ascontiguousarray(residuals[:, m * sub_dimension:(m + 1) * sub_dimension])
+            codebooks[m] = kmeans(part, ksub, iterations, seed + m + 1)
+        return cls(coarse, codebooks)
+
+    def encode(self, vectors, block_rows=65536):
+        """
+        Encode vectors.
+
+        Args:
+            vectors (np.ndarray): Vectors to encode (may be memory-mapped)
+            block_rows (int): Rows converted at once
+
+        Returns:
+            tuple: (coarse cluster of each vector, uint8 codes of shape (count, subquantizers))
+        """
+        lists = np.empty(len(vectors), dtype=np.int64)
+        codes = np.empty((len(vectors), self.subquantizers), dtype=np.uint8)
+        for start in range(0, len(vectors), block_rows):
+            block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+            block_lists = nearest_centroids(block, self.coarse)
+            residuals = block - self.coarse[block_lists]
+            lists[start:start + len(block)] = block_lists
+            for m in range(self.subquantizers):
+                part = residuals[:, m * self.sub_dimension:(m + 1) * self.sub_dimension]
+                codes[start:start + len(block), m] = nearest_centroids(part, self.codebooks[m])
+        return lists, codes
+
+    def distance_table(self, query, coarse_id):
+        """
+        Squared distances between the query residual and every sub-vector centroid.
+
+        Returns:
+            np.ndarray: Lookup table of shape (subquantizers, ksub)
+        """
+        residual = (query - self.coarse[coarse_id]).reshape(self.subquantizers, 1, self.sub_dimension)
+        return np.square(self.codebooks - residual).sum(axis=2)
+
+def build_pq_index(flat_index, quantizer=None, **train_kwargs):
+    """
+    Encode a flat index into an IVF-PQ index stored next to it.
+
+    The codes belong to the generation of the flat index. Build them from a
+    finished, unpublished generation (FlatIndex(..., info=writer.info)) so
+    that publishing it switches the flat index and its codes together.
+
+    Args:
+        flat_index (FlatIndex): Index holding the exact vectors
+        quantizer (ProductQuantizer, optional): Trained quantizer to reuse, e.g.
+            when the index is updated. If None, one is trained on the vectors.
+        **train_kwargs: Overrides of the training settings (nlist, subquantizers, ...)
+
+    Returns:
+        ProductQuantizer: Quantizer used for the encoding
+    """
+    if not len(flat_index):
+        # An empty index has no codes
+        return quantizer
+
+    if quantizer is None or quantizer.coarse.shape[1] != flat_index.dimension:
+        quantizer = ProductQuantizer.train(flat_index.vectors, **train_kwargs)
+        print(f"Trained IVF-PQ quantizer: {quantizer.nlist} lists, "
+              f"{quantizer.subquantizers} bytes per vector")
+
+    lists, codes = quantizer.encode(flat_index.vectors)
+
+    # Group rows by coarse cluster so each inverted list is one contiguous slice
+    order = np.argsort(lists, kind="stable")
+    list_offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=quantizer.nlist))))
+    row_type = np.int32 if len(flat_index) < 2 ** 31 else np.int64
+
+    path = pq_index_path(flat_index.persist_directory, flat_index.info["generation"])
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            generation=np.array(flat_index.info["generation"]),
+            coarse=quantizer.coarse,
+            codebooks=quantizer.codebooks,
+            list_offsets=list_offsets,
+            list_rows=order.astype(row_type),
+            codes=codes[order]
+        )
+    os.replace(tmp_path, path)
+    return quantizer
+
+class PQIndex(FlatIndex):
+    """
+    Vector store searching compact IVF-PQ codes, then re-ranking exactly.
+
+    Only the codes, the inverted lists and the quantizers live in memory,
+    about `subquantizers` bytes per vector instead of 2 or 4 per dimension.
+    A query scans the `nprobe` nearest inverted lists with table lookups and
+    re-ranks the `rerank` best candidates with exact distances, reading just
+    those rows from the memory-mapped flat index on disk. Raise `nprobe` and
+    `rerank` for recall, lower them for latency.
+    """
+
+    def __init__(self, persist_directory, embedding_function, nprobe=None, rerank=None):
+        """
+        Open an index.
+
+        Args:
+            persist_directory (str): Directory holding the flat index and its PQ codes
+            embedding_function (Embeddings): Model embedding the queries
+            nprobe (int): Inverted lists scanned per query
+            rerank (int): Candidates re-ranked with exact distances
+
+        Raises:
+            ValueError: If the current generation of the flat index has no PQ codes
+        """
+        super().__init__(persist_directory, embedding_function)
+        self.nprobe = nprobe or settings.PQ_NPROBE
+        self.rerank = rerank or settings.PQ_RERANK
+        self.quantizer = None
+
+        if not self.count:
+            return
+
+        path = pq_index_path(persist_directory, self.info["generation"])
+        if not os.path.exists(path):
+            raise ValueError(
+                f"The flat index in {persist_directory} has no PQ codes; rebuild it with 'rag ingest'"
+            )
+        with np.load(path) as data:
+            self.quantizer = ProductQuantizer(data["coarse"], data["codebooks"])
+            self.list_offsets = data["list_offsets"]
+            self.list_rows = data["list_rows"]
+            self.codes = data["codes"]
+
+    def memory_bytes(self):
+        """Size of the in-memory part of the index (codes, lists and quantizers)."""
+        if self.quantizer is None:
+            return 0
+        return sum(array.nbytes for array in (
+            self.codes, self.list_rows, self.list_offsets, self.quantizer.coarse, self.quantizer.codebooks
+        ))
+
+    def _candidates(self, query, limit):
+        """Scan the nearest inverted lists and return the best rows by approximate distance."""
+        quantizer = self.quantizer
+        coarse_scores = np.square(quantizer.coarse - query).sum(axis=1)
+        probe_order = np.argsort(coarse_scores)
+        subquantizer_ids = np.arange(quantizer.subquantizers)
+
+        rows = []
+        approx = []
+        scanned = 0
+        for probed, list_id in enumerate(probe_order):
+            # Keep probing past nprobe until there are enough candidates to re-rank
+            if probed >= self.nprobe and scanned >= limit:
+                break
+            start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if start == end:
+                continue
+            table = quantizer.distance_table(query, list_id)
+            approx.append(table[subquantizer_ids, self.codes[start:end]].sum(axis=1))
+            rows.append(self.list_rows[start:end])
+            scanned += end - start
+
+        rows = np.concatenate(rows)
+        approx = np.concatenate(approx)
+        if len(rows) > limit:
+            best = np.argpartition(approx, limit - 1)[:limit]
+            rows = rows[best]
+        return rows
+
+    def search_vectors(self, query_vectors, k):
+        """
+        Find the nearest rows of query vectors: PQ candidates, then exact re-rank.
+
+        Args:
+            query_vectors (array-like): Query vectors, one per row
+            k (int): Number of neighbours per query
+
+        Returns:
+            tuple: (rows, distances) arrays of shape (queries, k), nearest first
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        k = min(k, self.count)
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Query vectors have {queries.shape[1]} dimensions, the index has {self.dimension}")
+
+        all_rows = np.empty((len(queries), k), dtype=np.int64)
+        all_distances = np.empty((len(queries), k), dtype=np.float32)
+        for i, query in enumerate(queries):
+            # Sorted rows read the memory-mapped vectors in file order
+            rows = np.sort(self._candidates(query, max(self.rerank, k)))
+            vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+            distances = self.norms[rows] - 2 * (vectors @ query) + query @ query
+            top = np.argsort(distances)[:k]
+            all_rows[i] = rows[top]
+            all_distances[i] = np.maximum(distances[top], 0)
+        return all_rows, all_distances
+
+def load_quantizer(persist_directory):
+    """
+    Load the quantizer of an existing PQ index, to re-encode updated vectors.
+
+    Returns:
+        ProductQuantizer: Quantizer, or None if there is no PQ index
+    """
+    index_path = os.path.join(persist_directory, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        path = pq_index_path(persist_directory, json.load(f)["generation"])
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return ProductQuantizer(data["coarse"], data["codebooks"])
@@ -0,0 +1,260 @@
+"""Module for caching retrieval results and answers of the RAG chain."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from rag_project.config import settings
+
+def normalize_query(query):
+    """
+    Normalize a query so trivially different phrasings share cache entries.
+
+    Args:
+        query (str): User query
+
+    Returns:
+        str: NFC-normalized, case-folded query with collapsed whitespace and no
+            trailing punctuation
+    """
+    query = unicodedata.normalize("NFC", query).casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip(" ?!.…")
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time-to-live."""
+
+    def __init__(self, max_entries, ttl):
+        """
+        Args:
+            max_entries (int): Maximum number of entries; the least recently used go first
+            ttl (float): Lifetime of an entry in seconds, None for no expiry
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0}
+
+    def get(self, key):
+        """Return the cached value of a key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return the hit, miss, expiration and eviction counts."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+class RAGCache:
+    """
+    Two-level cache of the RAG chain.
+
+    The retrieval level maps a normalized query to its retrieved documents,
+    optionally also matching near-duplicate phrasings by query-embedding
+    similarity. The answer level maps (query, retrieved chunk ids, model,
+    prompt version) to the generated answer. Both levels are dropped as soon
+    as a new ingest generation is published for the vector database.
+    """
+
+    def __init__(self, persist_directory=None, max_entries=None, ttl=None, embedding_model=None,
+                 semantic_threshold=None):
+        """
+        Initialize the cache.
+
+        Args:
+            persist_directory (str): Directory of the vector database whose
+                generation invalidates the cache
+            max_entries (int): Maximum entries of each level
+            ttl (float): Lifetime of an entry in seconds
+            embedding_model (Embeddings, optional): Model embedding queries for the
+                semantic lookup. If None, only exact (normalized) queries match.
+            semantic_threshold (float): Minimum cosine similarity of a semantic match
+        """
+        self.persist_directory = persist_directory or settings.VECTORSTORE_DIR
+        max_entries = max_entries or settings.RAG_CACHE_MAX_ENTRIES
+        ttl = settings.RAG_CACHE_TTL if ttl is None else ttl
+        self.retrievals = TTLCache(max_entries, ttl)
+        self.answers = TTLCache(max_entries, ttl)
+        self.embedding_model = embedding_model
+        self.semantic_threshold = semantic_threshold or settings.SEMANTIC_CACHE_THRESHOLD
+
+        self._lock = threading.Lock()
+        self._semantic = OrderedDict()
+        self._semantic_matrix = None
+        self._generation_stamp = self._read_generation_stamp()
+        self._stats = {"semantic_hits": 0, "invalidations": 0}
+
+    def _generation_path(self):
+        return os.path.join(self.persist_directory, settings.INGEST_GENERATION_FILE)
+
+    def _read_generation_stamp(self):
+        try:
+            stat = os.stat(self._generation_path())
+            # The file is replaced atomically, so a new inode also marks a new generation
+            return stat.st_mtime_ns, stat.st_ino
+        except FileNotFoundError:
+            return None
+
+    def check_generation(self):
+        """
+        Drop every cached entry if a new ingest generation was published.
+
+        Returns:
+            bool: True if the cache was invalidated
+        """
+        # A stat() is cheap enough to run on every lookup
+        stamp = self._read_generation_stamp()
+        if stamp == self._generation_stamp:
+            return False
+        self.clear()
+        with self._lock:
+            self._generation_stamp = stamp
+            self._stats["invalidations"] += 1
+        return True
+
+    def clear(self):
+        """Drop every cached entry."""
+        self.retrievals.clear()
+        self.answers.clear()
+        with self._lock:
+            self._semantic.clear()
+            self._semantic_matrix = None
+
+    def _embed(self, query):
+        vector = np.asarray(self.embedding_model.embed_query(query), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get_retrieval(self, query):
+        """
+        Look up the documents retrieved for a query.
+
+        Args:
+            query (str): User query
+
+        Returns:
+            tuple: (canonical query, documents), or None on a miss. The canonical
+                query is the cached phrasing when a near-duplicate matched.
+        """
+        self.check_generation()
+        normalized = normalize_query(query)
+        documents = self.retrievals.get(normalized)
+        if documents is not None:
+            return normalized, documents
+
+        if self.embedding_model is None:
+            return None
+
+        with self._lock:
+            if not self._semantic:
+                return None
+            if self._semantic_matrix is None:
+                self._semantic_matrix = (list(self._semantic), np.array(list(self._semantic.values())))
+            queries, vectors = self._semantic_matrix
+
+        similarities = vectors @ self._embed(query)
+        best = int(similarities.argmax())
+        if similarities[best] < self.semantic_threshold:
+            return None
+        documents = self.retrievals.get(queries[best])
+        if documents is None:
+            return None
+        with self._lock:
+            self._stats["semantic_hits"] += 1
+        return queries[best], documents
+
+    def set_retrieval(self, query, documents):
+        """
+        Cache the documents retrieved for a query.
+
+        Args:
+            query (str): User query
+            documents (list): Retrieved documents
+
+        Returns:
+            str: Canonical (normalized) query
+        """
+        normalized = normalize_query(query)
+        self.retrievals.set(normalized, list(documents))
+        if self.embedding_model is not None:
+            vector = self._embed(query)
+            with self._lock:
+                # Keep the semantic index as bounded as the retrieval level
+                self._semantic.pop(normalized, None)
+                self._semantic[normalized] = vector
+                while len(self._semantic) > self.retrievals.max_entries:
+                    self._semantic.popitem(last=False)
+                self._semantic_matrix = None
+        return normalized
+
+    @staticmethod
+    def answer_key(query, documents, model, prompt_version):
+        """
+        Build the answer cache key.
+
+        Args:
+            query (str): Canonical query
+            documents (list): Retrieved documents
+            model (str): LLM model
+            prompt_version (str): Version of the answer prompt
+
+        Returns:
+            str: Hash of the query, retrieved chunk ids, model and prompt version
+        """
+        chunk_ids = [doc.metadata.get("chunk_id") or doc.page_content for doc in documents]
+        payload = json.dumps([normalize_query(query), chunk_ids, model, str(prompt_version)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_answer(self, key):
+        """Return the cached answer of a key, or None."""
+        self.check_generation()
+        return self.answers.get(key)
+
+    def set_answer(self, key, answer):
+        """Cache an answer."""
+        self.answers.set(key, answer)
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Counters of the retrieval and answer levels, semantic hits and invalidations
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["retrieval"] = self.retrievals.stats()
+        stats["answer"] = self.answers.stats()
+        return stats
@@ -1,25 +1,251 @@
 """Module for LangGraph-based RAG implementation."""
 
-from typing import TypedDict, Annotated, List, Union
-from langchain_core.messages import HumanMessage, AIMessage
+import asyncio
+import hashlib
+import operator
+import threading
+import time
+from typing import TypedDict, Annotated, List, NotRequired, Union
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, RemoveMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import START, END, StateGraph
 from langgraph.graph.message import add_messages
-from langchain_openai import ChatOpenAI
 from langchain.schema import Document
 from rag_project.core.retriever import DocumentRetriever
+from rag_project.core.context import ContextPacker
+from rag_project.core.rag_cache import RAGCache
+from rag_project.core.sessions import SessionCheckpointer
+from rag_project.utils.clients import get_chat_model
+from rag_project.utils.metrics import LatencyRecorder
+from rag_project.utils.tokens import count_tokens
+from rag_project.utils.tracing import (
+    tracer, traced, annotate, record_tokens, record_cache_lookups, COUNT_BUCKETS
+)
 from rag_project.config import settings
 
+tracer.describe("rag_context_tokens_saved_total", "counter", "Prompt tokens removed by context packing")
+
+# Answer given without calling the LLM when retrieval finds nothing relevant
+NO_INFORMATION_ANSWER = "Je ne dispose pas d'informations sur ce sujet dans ma base de connaissances actuelle."
+
+# Prompt of the answer generation; cached answers are keyed on its hash
+ANSWER_PROMPT = """
+Tu es un assistant spécialisé UNIQUEMENT sur les documents qui te sont fournis. 
+Tu dois STRICTEMENT te limiter à ces informations.
+
+Contexte fourni:
+{context}
+
+Question de l'utilisateur: {question}
+
+INSTRUCTIONS IMPORTANTES:
+1. ANALYSE SI la question peut être répondue avec les informations du contexte ci-dessus.
+2. Si tu peux répondre avec ces informations, fais-le en te basant EXCLUSIVEMENT sur le contexte.
+3. Si tu ne peux PAS répondre avec ces informations, réponds UNIQUEMENT: "{no_information}"
+
+Réponse:
+"""
+# Prompt making a follow-up question understandable without the conversation
+CONDENSE_PROMPT = """
+Résumé de la conversation:
+{summary}
+
+Derniers échanges:
+{history}
+
+Nouvelle question de l'utilisateur: {question}
+
+Reformule la nouvelle question pour qu'elle soit compréhensible sans la conversation, 
+en reprenant les noms et détails auxquels elle fait référence. Si elle l'est déjà, 
+recopie-la telle quelle. Réponds UNIQUEMENT par la question.
+"""
+
+# Prompt folding older turns into the rolling summary of a session
+SUMMARY_PROMPT = """
+Résumé actuel de la conversation:
+{summary}
+
+Nouveaux échanges:
+{history}
+
+Mets à jour le résumé avec les nouveaux échanges, en conservant les sujets abordés, 
+les noms, les faits et les réponses données. Réponds UNIQUEMENT par le résumé.
+"""
+
+PROMPT_VERSION = f"{settings.PROMPT_VERSION}:{hashlib.sha256((ANSWER_PROMPT + NO_INFORMATION_ANSWER).encode('utf-8')).hexdigest()[:12]}"
+
 # Define the state type for the RAG chain
 class RAGState(TypedDict):
     messages: Annotated[List[Union[HumanMessage, AIMessage]], add_messages]
     context: List[Document]
+    query: NotRequired[str]  # Canonical form of the question, shared by its cached phrasings
+    context_stats: NotRequired[dict]  # Chunks and tokens before and after context packing
+    search_query: NotRequired[str]  # Last question rewritten to stand alone, used for retrieval
+    summary: NotRequired[str]  # Rolling summary of the turns compacted out of a session
+    turns: Annotated[int, operator.add]  # Questions sent to a session, compacted ones included
 
-# Initialize the document retriever
-doc_retriever = DocumentRetriever(
-    persist_directory=settings.VECTORSTORE_DIR, 
-    top_k=10
-)
+# The retriever, the cache and the chains are built on first use, so importing
+# this module neither opens the vector database nor creates API clients.
+# Assign doc_retriever or rag_cache (None disables it) to replace them.
+_NOT_BUILT = object()
+_build_lock = threading.RLock()
+_chains = {}
+
+# Document retriever (up to DEFAULT_TOP_K chunks, fewer with adaptive retrieval)
+doc_retriever = None
+
+# Packs retrieved chunks into the answer prompt's token budget
+context_packer = ContextPacker() if settings.CONTEXT_PACKING_ENABLED else None
+
+# Time to first token and total time of streamed answers
+answer_latency = LatencyRecorder()
+
+# Latest state of each web chat session
+session_checkpointer = SessionCheckpointer()
+tracer.add_collector(lambda: [("rag_sessions", {}, session_checkpointer.session_count())])
+
+# Cache of retrievals and answers, invalidated by every new ingest generation
+rag_cache = _NOT_BUILT
+
+def get_doc_retriever():
+    """
+    Get the retriever of the RAG chain, opening the vector database on first use.
+    
+    Returns:
+        DocumentRetriever: Shared retriever
+    """
+    global doc_retriever
+    if doc_retriever is None:
+        with _build_lock:
+            if doc_retriever is None:
+                doc_retriever = DocumentRetriever(persist_directory=settings.VECTORSTORE_DIR)
+    return doc_retriever
+
+def get_rag_cache():
+    """
+    Get the cache of the RAG chain, creating it on first use.
+    
+    Returns:
+        RAGCache: Shared cache, or None if caching is disabled
+    """
+    global rag_cache
+    if rag_cache is _NOT_BUILT:
+        with _build_lock:
+            if rag_cache is _NOT_BUILT:
+                rag_cache = RAGCache(
+                    persist_directory=settings.VECTORSTORE_DIR,
+                    embedding_model=get_doc_retriever().embedding_model if settings.SEMANTIC_CACHE_ENABLED else None
+                ) if settings.RAG_CACHE_ENABLED else None
+    return rag_cache
+
+def _lookup_retrieval(query):
+    """Return the cached (canonical query, documents) of a query, or None."""
+    cache = get_rag_cache()
+    if cache is None:
+        return None
+    cached = cache.get_retrieval(query)
+    record_cache_lookups("retrieval", hits=int(cached is not None), misses=int(cached is None))
+    return cached
+
+def _store_retrieval(query, docs):
+    """Cache retrieved documents and build the state update of the retrieve node."""
+    cache = get_rag_cache()
+    if cache is not None:
+        query = cache.set_retrieval(query, docs)
+    return _retrieved(docs, query)
+
+def _retrieved(docs, query):
+    """Build the state update of the retrieve node, counting the chunks retrieved."""
+    tracer.observe("rag_retrieved_chunks", len(docs), buckets=COUNT_BUCKETS)
+    annotate(chunks=len(docs))
+    return {"context": docs, "query": query}
+
+def _semantic_cache():
+    """Whether cache lookups embed the query, and so must run off the event loop."""
+    cache = get_rag_cache()
+    return cache is not None and cache.embedding_model is not None
+
+def _format_history(messages):
+    """Render messages as "Utilisateur: ..." / "Assistant: ..." lines."""
+    return "\n".join(
+        f"{'Utilisateur' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+        for message in messages
+    )
+
+def _condense_prompt(state):
+    """Build the prompt rewriting the last question, or None if it has no conversation to refer to."""
+    messages = state["messages"]
+    last_message = messages[-1]
+    history = messages[:-1][-settings.QUERY_REWRITE_HISTORY_MESSAGES:]
+    if not settings.QUERY_REWRITE_ENABLED or not isinstance(last_message, HumanMessage):
+        return None
+    if not history and not state.get("summary"):
+        return None
+    return CONDENSE_PROMPT.format(
+        summary=state.get("summary") or "-",
+        history=_format_history(history) or "-",
+        question=last_message.content
+    )
+
+def _rewriter_model():
+    return get_chat_model(settings.LLM_MODEL, 0.0, settings.QUERY_REWRITE_MAX_TOKENS)
+
+def _record_usage(source, prompt, message):
+    """Count the tokens of an LLM call, estimated when the API did not report them."""
+    usage = message.usage_metadata
+    if usage:
+        record_tokens(source, settings.LLM_MODEL, usage["input_tokens"], usage["output_tokens"])
+    else:
+        record_tokens(
+            source, settings.LLM_MODEL,
+            count_tokens(prompt, settings.CONTEXT_ENCODING), count_tokens(message.content, settings.CONTEXT_ENCODING)
+        )
 
+@traced("condense")
+def condense(state: RAGState) -> RAGState:
+    """
+    Rewrite the user's question so it can be understood without the conversation.
+    
+    Follow-up questions ("and how much does it cost?") retrieve nothing useful
+    on their own. The rewrite only sees the session summary and the latest
+    messages, so its cost does not grow with the conversation.
+    
+    Args:
+        state (RAGState): Current state of the conversation
+    
+    Returns:
+        RAGState: Updated state with the standalone question
+    """
+    prompt = _condense_prompt(state)
+    if prompt is None:
+        return {"search_query": state["messages"][-1].content}
+    response = _rewriter_model().invoke(prompt)
+    _record_usage("condense", prompt, response)
+    return {"search_query": response.content.strip()}
+
+@traced("condense")
+async def acondense(state: RAGState) -> RAGState:
+    """
+    Rewrite the user's question, without blocking the event loop.
+    
+    Args:
+        state (RAGState): Current state of the conversation
+    
+    Returns:
+        RAGState: Updated state with the standalone question
+    """
+    prompt = _condense_prompt(state)
+    if prompt is None:
+        return {"search_query": state["messages"][-1].content}
+    response = await _rewriter_model().ainvoke(prompt)
+    _record_usage("condense", prompt, response)
+    return {"search_query": response.content.strip()}
+
+def _question(state):
+    """Question to retrieve and answer: the standalone rewrite if there is one."""
+    return state.get("search_query") or state["messages"][-1].content
+
+@traced("retrieve")
 def retrieve(state: RAGState) -> RAGState:
     """
     Retrieve relevant documents based on the user's message.
@@ -35,74 +261,374 @@ def retrieve(state: RAGState) -> RAGState:
     if not isinstance(last_message, HumanMessage):
         return {"context": []}
     
+    question = _question(state)
+    cached = _lookup_retrieval(question)
+    if cached is not None:
+        query, docs = cached
+        return _retrieved(docs, query)
+    
     # Retrieve relevant documents using the retriever
-    docs = doc_retriever.get_relevant_documents(last_message.content)
-    return {"context": docs}
+    docs = get_doc_retriever().get_relevant_documents(question)
+    return _store_retrieval(question, docs)
+
+@traced("retrieve")
+async def aretrieve(state: RAGState) -> RAGState:
+    """
+    Retrieve relevant documents based on the user's message, without blocking the event loop.
+    
+    Args:
+        state (RAGState): Current state of the conversation
+    
+    Returns:
+        RAGState: Updated state with retrieved documents
+    """
+    last_message = state["messages"][-1]
+    if not isinstance(last_message, HumanMessage):
+        return {"context": []}
+    
+    # The semantic cache lookup embeds the query, so it runs off the event loop
+    question = _question(state)
+    if _semantic_cache():
+        cached = await asyncio.to_thread(_lookup_retrieval, question)
+    else:
+        cached = _lookup_retrieval(question)
+    if cached is not None:
+        query, docs = cached
+        return _retrieved(docs, query)
+    
+    docs = await get_doc_retriever().aget_relevant_documents(question)
+    if _semantic_cache():
+        return await asyncio.to_thread(_store_retrieval, question, docs)
+    return _store_retrieval(question, docs)
+
+@traced("pack")
+def pack_context(state: RAGState) -> RAGState:
+    """
+    Merge, deduplicate and trim the retrieved documents to the prompt's token budget.
+    
+    Args:
+        state (RAGState): Current state with retrieved documents
+    
+    Returns:
+        RAGState: Updated state with packed documents and the packing report
+    """
+    if context_packer is None or not state["context"]:
+        return {}
+    docs, report = context_packer.pack(state["context"])
+    # Reported on the "pack" span of traces, and as a counter in the Prometheus export
+    annotate(**report)
+    tracer.count("rag_context_tokens_saved_total", report["tokens_saved"])
+    return {"context": docs, "context_stats": report}
 
+def _prepare_generation(state):
+    """
+    Look up the cached answer of a state and build the prompt otherwise.
+    
+    When retrieval found nothing relevant, the fixed no-information answer
+    is returned without calling the LLM.
+    
+    Returns:
+        tuple: (answer cache key or None, cached or fixed answer or None, prompt)
+    """
+    if not state["context"]:
+        return None, NO_INFORMATION_ANSWER, None
+    
+    answer_key = None
+    cache = get_rag_cache()
+    if cache is not None:
+        answer_key = cache.answer_key(
+            state.get("query") or _question(state), state["context"], settings.LLM_MODEL, PROMPT_VERSION
+        )
+        answer = cache.get_answer(answer_key)
+        record_cache_lookups("answer", hits=int(answer is not None), misses=int(answer is None))
+        if answer is not None:
+            return answer_key, answer, None
+    
+    # Prepare context for the LLM
+    context_str = "\n\n".join([doc.page_content for doc in state["context"]])
+    
+    # Prepare prompt with context
+    return answer_key, None, ANSWER_PROMPT.format(
+        context=context_str, question=_question(state), no_information=NO_INFORMATION_ANSWER
+    )
+
+def _answer_message(content, message_id, start, first_token):
+    """Build the answer message, with the generation timings in its metadata."""
+    end = time.perf_counter()
+    timings = {
+        "ttft_ms": ((first_token or end) - start) * 1000,
+        "total_ms": (end - start) * 1000,
+    }
+    return AIMessage(content=content, id=message_id, response_metadata=timings)
+
+@traced("generate")
 def generate(state: RAGState) -> RAGState:
     """
     Generate a response based on the retrieved documents.
     
+    The LLM response is streamed, so graph streams in "messages" mode
+    receive its tokens as they arrive.
+    
     Args:
         state (RAGState): Current state with context and messages
     
     Returns:
         RAGState: Updated state with AI response
     """
-    # Initialize the model
-    llm = ChatOpenAI(
-        temperature=settings.LLM_TEMPERATURE, 
-        model=settings.LLM_MODEL, 
-        max_tokens=settings.LLM_MAX_TOKENS
-    )
+    start = time.perf_counter()
+    answer_key, answer, augmented_prompt = _prepare_generation(state)
+    if answer is not None:
+        return {"messages": [_answer_message(answer, None, start, None)]}
     
-    # Prepare context for the LLM
-    context_str = "\n\n".join([doc.page_content for doc in state["context"]])
+    # Generate response
+    response, first_token = None, None
+    for chunk in get_chat_model(settings.LLM_MODEL, settings.LLM_TEMPERATURE, settings.LLM_MAX_TOKENS).stream(augmented_prompt):
+        if chunk.content and first_token is None:
+            first_token = time.perf_counter()
+        response = chunk if response is None else response + chunk
+    _record_usage("answer", augmented_prompt, response)
+    if answer_key is not None:
+        get_rag_cache().set_answer(answer_key, response.content)
     
-    # Prepare prompt with context
-    last_message = state["messages"][-1]
-    augmented_prompt = f"""
-    Tu es un assistant spécialisé UNIQUEMENT sur les documents qui te sont fournis. 
-    Tu dois STRICTEMENT te limiter à ces informations.
+    # Same id as the streamed chunks, so streams do not emit the answer twice
+    return {"messages": [_answer_message(response.content, response.id, start, first_token)]}
 
-    Contexte fourni:
-    {context_str}
+@traced("generate")
+async def agenerate(state: RAGState) -> RAGState:
+    """
+    Generate a response based on the retrieved documents, without blocking the event loop.
+    
+    Args:
+        state (RAGState): Current state with context and messages
+    
+    Returns:
+        RAGState: Updated state with AI response
+    """
+    start = time.perf_counter()
+    answer_key, answer, augmented_prompt = _prepare_generation(state)
+    if answer is not None:
+        return {"messages": [_answer_message(answer, None, start, None)]}
+    
+    response, first_token = None, None
+    async for chunk in get_chat_model(settings.LLM_MODEL, settings.LLM_TEMPERATURE, settings.LLM_MAX_TOKENS).astream(augmented_prompt):
+        if chunk.content and first_token is None:
+            first_token = time.perf_counter()
+        response = chunk if response is None else response + chunk
+    _record_usage("answer", augmented_prompt, response)
+    if answer_key is not None:
+        get_rag_cache().set_answer(answer_key, response.content)
+    
+    return {"messages": [_answer_message(response.content, response.id, start, first_token)]}
 
-    Question de l'utilisateur: {last_message.content}
+def _compaction_prompt(state):
+    """
+    Build the prompt folding the older turns into the summary.
+    
+    Returns:
+        tuple: (messages to remove, prompt), or None while the history is short enough
+    """
+    messages = state["messages"]
+    history_tokens = count_tokens(_format_history(messages), settings.CONTEXT_ENCODING)
+    if history_tokens <= settings.SESSION_HISTORY_MAX_TOKENS:
+        return None
+    older = messages[:-settings.SESSION_KEEP_MESSAGES]
+    if not older:
+        return None
+    prompt = SUMMARY_PROMPT.format(summary=state.get("summary") or "-", history=_format_history(older))
+    return older, prompt
+
+def _summary_model():
+    return get_chat_model(settings.LLM_MODEL, 0.0, settings.SESSION_SUMMARY_MAX_TOKENS)
 
-    INSTRUCTIONS IMPORTANTES:
-    1. ANALYSE SI la question peut être répondue avec les informations du contexte ci-dessus.
-    2. Si tu peux répondre avec ces informations, fais-le en te basant EXCLUSIVEMENT sur le contexte.
-    3. Si tu ne peux PAS répondre avec ces informations, réponds UNIQUEMENT: "Je ne dispose pas d'informations sur ce sujet dans ma base de connaissances actuelle."
+@traced("compact")
+def compact(state: RAGState) -> RAGState:
+    """
+    Fold the older turns of a session into its rolling summary.
+    
+    Once the history exceeds SESSION_HISTORY_MAX_TOKENS, every message but the
+    latest SESSION_KEEP_MESSAGES is summarized and removed from the state, so
+    the state carried from turn to turn stays bounded.
     
-    Réponse:
+    Args:
+        state (RAGState): State after the answer
+    
+    Returns:
+        RAGState: Updated state with the new summary and the older messages removed
     """
+    plan = _compaction_prompt(state)
+    if plan is None:
+        return {}
+    older, prompt = plan
+    response = _summary_model().invoke(prompt)
+    _record_usage("summary", prompt, response)
+    return {"summary": response.content.strip(), "messages": [RemoveMessage(id=message.id) for message in older]}
+
+@traced("compact")
+async def acompact(state: RAGState) -> RAGState:
+    """
+    Fold the older turns of a session into its summary, without blocking the event loop.
     
-    # Generate response
-    response = llm.invoke(augmented_prompt)
+    Args:
+        state (RAGState): State after the answer
+    
+    Returns:
+        RAGState: Updated state with the new summary and the older messages removed
+    """
+    plan = _compaction_prompt(state)
+    if plan is None:
+        return {}
+    older, prompt = plan
+    response = await _summary_model().ainvoke(prompt)
+    _record_usage("summary", prompt, response)
+    return {"summary": response.content.strip(), "messages": [RemoveMessage(id=message.id) for message in older]}
+
+def reset_session(session_id):
+    """
+    Forget the conversation of a session.
+    
+    Args:
+        session_id (str): Id of the session
+    """
+    session_checkpointer.delete_thread(session_id)
+
+def session_turns(session_id):
+    """
+    Get the number of questions a session has received.
+    
+    Args:
+        session_id (str): Id of the session
+    
+    Returns:
+        int: Questions sent to the session, 0 for an unknown or expired session
+    """
+    state = get_session_chain().get_state({"configurable": {"thread_id": session_id}})
+    return state.values.get("turns", 0)
+
+def _user_turns(messages):
+    return sum(1 for message in messages if isinstance(message, HumanMessage))
+
+async def astream_answer(messages, session_id=None, history=None):
+    """
+    Run the RAG chain and yield the answer as it is generated.
+    
+    Without a session, messages is the whole conversation. With a session,
+    only the new messages are sent: earlier turns, compacted into a summary
+    once they grow long, are kept server-side by session_chain. The client's
+    history is then only used to check the session: when their numbers of
+    questions differ (a retried, undone or edited turn, an expired session),
+    the session is rebuilt from the history.
+    
+    The time to the first token and the total time of every request are
+    recorded in answer_latency (paths "ttft" and "total"), and its node and
+    API call spans are written as one "chat" trace.
+    
+    Args:
+        messages (list): Conversation, or new messages of the session, ending
+            with the user's question
+        session_id (str, optional): Id of the conversation session
+        history (list, optional): Earlier messages of the conversation, as
+            the client shows them. If None, the session is trusted as is.
+    
+    Yields:
+        str: Answer generated so far
+    """
+    start = time.perf_counter()
+    chain, config = get_rag_chain(), None
+    if session_id is not None:
+        session_checkpointer.prune(settings.SESSION_TTL)
+        chain, config = get_session_chain(), {"configurable": {"thread_id": session_id}}
+        if history is not None and session_turns(session_id) != _user_turns(history):
+            reset_session(session_id)
+            messages = list(history) + list(messages)
     
-    return {"messages": [AIMessage(content=response.content)]}
+    with tracer.trace("chat", session=session_id is not None):
+        answer, first_token = "", None
+        async for message, metadata in chain.astream(
+            {"messages": messages, "context": [], "turns": _user_turns(messages)}, config, stream_mode="messages"
+        ):
+            if metadata.get("langgraph_node") != "generate" or not isinstance(message, AIMessage):
+                continue
+            if isinstance(message, AIMessageChunk):
+                answer += message.content
+            elif not answer:
+                # Cached answers are not streamed, the final message arrives at once
+                answer = message.content
+            else:
+                continue
+            if not answer:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+                answer_latency.record("ttft", first_token - start)
+            yield answer
+        answer_latency.record("total", time.perf_counter() - start)
 
 # Create RAG chain
-def create_rag_chain():
+def create_rag_chain(checkpointer=None):
     """
     Create and compile the RAG chain.
     
+    Args:
+        checkpointer (BaseCheckpointSaver, optional): Saver of the state of each
+            conversation (thread_id in the run's config). With one, the chain
+            also compacts long histories into a summary.
+    
     Returns:
         StateGraph: Compiled RAG chain
     """
     # Define the graph
     builder = StateGraph(RAGState)
-    builder.add_node("retrieve", retrieve)
-    builder.add_node("generate", generate)
+    # Each node runs its sync version under invoke and its async one under ainvoke
+    builder.add_node("condense", RunnableLambda(condense, afunc=acondense, name="condense"))
+    builder.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve, name="retrieve"))
+    builder.add_node("pack", pack_context)
+    builder.add_node("generate", RunnableLambda(generate, afunc=agenerate, name="generate"))
     
     # Define transitions
-    builder.add_edge(START, "retrieve")
-    builder.add_edge("retrieve", "generate")
-    builder.add_edge("generate", END)
+    builder.add_edge(START, "condense")
+    builder.add_edge("condense", "retrieve")
+    builder.add_edge("retrieve", "pack")
+    builder.add_edge("pack", "generate")
+    if checkpointer is None:
+        builder.add_edge("generate", END)
+    else:
+        builder.add_node("compact", RunnableLambda(compact, afunc=acompact, name="compact"))
+        builder.add_edge("generate", "compact")
+        builder.add_edge("compact", END)
     
     # Compile the graph
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
+
+def get_rag_chain():
+    """
+    Get the stateless RAG chain, compiling it on first use.
+    
+    Returns:
+        StateGraph: Compiled RAG chain, also available as rag_chain
+    """
+    if "rag_chain" not in _chains:
+        with _build_lock:
+            if "rag_chain" not in _chains:
+                _chains["rag_chain"] = create_rag_chain()
+    return _chains["rag_chain"]
+
+def get_session_chain():
+    """
+    Get the RAG chain of the web chat, keeping each session's state server-side.
+    
+    Returns:
+        StateGraph: Compiled RAG chain, also available as session_chain
+    """
+    if "session_chain" not in _chains:
+        with _build_lock:
+            if "session_chain" not in _chains:
+                _chains["session_chain"] = create_rag_chain(checkpointer=session_checkpointer)
+    return _chains["session_chain"]
 
-# Create the RAG chain
-rag_chain = create_rag_chain()
\ No newline at end of file
+def __getattr__(name):
+    # rag_chain and session_chain are compiled on first access
+    if name == "rag_chain":
+        return get_rag_chain()
+    if name == "session_chain":
+        return get_session_chain()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -1,20 +1,66 @@
 """Module for retrieving relevant documents."""
 
+import asyncio
+import time
 from typing import List
 from langchain.schema import Document
-from rag_project.core.embeddings import load_vectorstore, get_embedding_model
+from rag_project.core.embeddings import (
+    load_vectorstore, get_embedding_model, get_documents_by_ids, search_by_vectors
+)
+from rag_project.core.lexical import LexicalIndex, is_decisive, reciprocal_rank_fusion
+from rag_project.core.calibration import load_calibration
+from rag_project.utils.metrics import LatencyRecorder
+from rag_project.utils.tracing import tracer
 from rag_project.config import settings
 
+def adaptive_cutoff(results, max_distance=None, score_gap=None, min_k=1):
+    """
+    Keep the results of a search until they stop being relevant.
+    
+    Args:
+        results (list): (document, distance) pairs, nearest first
+        max_distance (float): Distance above which results are dropped, or None
+        score_gap (float): Relative jump between consecutive distances (0.25 for
+            25% farther than the previous result) that drops the rest, or None
+        min_k (int): Results kept despite a score gap
+        
+    Returns:
+        list: Kept (document, distance) pairs
+    """
+    kept = []
+    for doc, distance in results:
+        if max_distance is not None and distance > max_distance:
+            break
+        if score_gap is not None and len(kept) >= min_k:
+            previous = kept[-1][1]
+            if distance - previous > score_gap * max(previous, 1e-6):
+                break
+        kept.append((doc, distance))
+    return kept
+
 class DocumentRetriever:
     """Class for retrieving relevant documents from a vector database."""
     
-    def __init__(self, persist_directory=None, top_k=None):
+    def __init__(self, persist_directory=None, top_k=None, hybrid=None, lexical_fast_path=None,
+                 embedding_model=None, adaptive=None, max_distance=None, score_gap=None):
         """
         Initialize the document retriever.
         
         Args:
-            persist_directory (str): Directory of the Chroma vector database
-            top_k (int): Number of documents to retrieve
+            persist_directory (str): Directory of the vector database
+            top_k (int): Number of documents to retrieve (at most, with adaptive retrieval)
+            hybrid (bool): Whether to fuse dense and lexical results. If None,
+                uses HYBRID_RETRIEVAL from settings.
+            lexical_fast_path (bool): Whether to answer from the lexical index alone
+                when its best hit is decisive. If None, uses LEXICAL_FAST_PATH from settings.
+            embedding_model (Embeddings, optional): Model embedding the queries.
+                If None, uses get_embedding_model().
+            adaptive (bool): Whether to drop results past the distance threshold
+                or a score gap. If None, uses ADAPTIVE_RETRIEVAL from settings.
+            max_distance (float): Distance threshold. If None, uses
+                RETRIEVAL_MAX_DISTANCE from settings, then the database's calibration.
+            score_gap (float): Relative score gap. If None, uses
+                RETRIEVAL_SCORE_GAP from settings, then the database's calibration.
         """
         if persist_directory is None:
             persist_directory = settings.VECTORSTORE_DIR
@@ -25,7 +71,7 @@ class DocumentRetriever:
         self.top_k = top_k
         
         # Initialize embedding model
-        self.embedding_model = get_embedding_model()
+        self.embedding_model = embedding_model or get_embedding_model()
         
         # Load vector database
         self.vectorstore = load_vectorstore(
@@ -37,18 +83,227 @@ class DocumentRetriever:
         self.retriever = self.vectorstore.as_retriever(
             search_kwargs={"k": self.top_k}
         )
+        
+        # Lexical index built by rag ingest, if any
+        self.lexical_index = LexicalIndex.load(persist_directory) if settings.LEXICAL_INDEX_ENABLED else None
+        self.hybrid = settings.HYBRID_RETRIEVAL if hybrid is None else hybrid
+        self.lexical_fast_path = settings.LEXICAL_FAST_PATH if lexical_fast_path is None else lexical_fast_path
+        self.latency = LatencyRecorder()
+        
+        # Thresholds of adaptive retrieval, calibrated per database by rag calibrate
+        calibration = load_calibration(persist_directory)
+        self.adaptive = settings.ADAPTIVE_RETRIEVAL if adaptive is None else adaptive
+        self.max_distance = next(
+            (value for value in (max_distance, settings.RETRIEVAL_MAX_DISTANCE, calibration.get("max_distance"))
+             if value is not None), None
+        )
+        self.score_gap = next(
+            (value for value in (score_gap, settings.RETRIEVAL_SCORE_GAP, calibration.get("score_gap"))
+             if value is not None), None
+        )
     
     def get_relevant_documents(self, query: str) -> List[Document]:
         """
         Get relevant documents for a query.
         
+        When the lexical index finds a decisive match, its results are returned
+        without embedding the query. Otherwise dense results are fused with the
+        lexical ones (hybrid mode) or returned alone.
+        
+        With adaptive retrieval, dense results past the distance threshold or a
+        score gap are dropped, and fusion returns as many documents as remain.
+        An empty list means nothing in the database is relevant.
+        
+        Args:
+            query (str): User query
+            
+        Returns:
+            List[Document]: List of relevant documents
+        """
+        start = time.perf_counter()
+        
+        lexical_hits, docs = self._search_lexical(query)
+        if docs is not None:
+            self.latency.record("lexical", time.perf_counter() - start)
+            return docs
+        
+        # Plain similarity searches are timed in two stages, embedding and search
+        if self._plain_similarity():
+            with tracer.span("embed_query"):
+                embedding = self.embedding_model.embed_query(query)
+            with tracer.span("vector_search"):
+                results = search_by_vectors(self.vectorstore, [embedding], self.top_k)
+            dense_docs = self._cut(results[0])
+        else:
+            with tracer.span("dense_search"):
+                dense_docs = self.retriever.invoke(query)
+        return self._finish(start, dense_docs, lexical_hits)
+    
+    async def aget_relevant_documents(self, query: str) -> List[Document]:
+        """
+        Get relevant documents for a query without blocking the event loop.
+        
+        Same results as get_relevant_documents: the query is embedded with the
+        model's async client, and the index searches run in worker threads.
+        
         Args:
             query (str): User query
             
         Returns:
             List[Document]: List of relevant documents
         """
-        return self.retriever.get_relevant_documents(query)
+        start = time.perf_counter()
+        
+        lexical_hits, docs = [], None
+        if self.lexical_index is not None:
+            lexical_hits, docs = await asyncio.to_thread(self._search_lexical, query)
+        if docs is not None:
+            self.latency.record("lexical", time.perf_counter() - start)
+            return docs
+        
+        # Plain similarity searches embed asynchronously; other search types go through LangChain
+        if self._plain_similarity():
+            with tracer.span("embed_query"):
+                embedding = await self.embedding_model.aembed_query(query)
+            with tracer.span("vector_search"):
+                results = await asyncio.to_thread(search_by_vectors, self.vectorstore, [embedding], self.top_k)
+            dense_docs = self._cut(results[0])
+        else:
+            with tracer.span("dense_search"):
+                dense_docs = await self.retriever.ainvoke(query)
+        if self.hybrid and lexical_hits and dense_docs:
+            return await asyncio.to_thread(self._finish, start, dense_docs, lexical_hits)
+        return self._finish(start, dense_docs, lexical_hits)
+    
+    def batch_get_relevant_documents(self, queries: List[str]) -> List[List[Document]]:
+        """
+        Get relevant documents for many queries at once.
+        
+        Queries answered by the lexical fast path are resolved first; the
+        others are embedded in a single embedding request and searched in one
+        vectorized pass, then fused with their lexical results as in
+        get_relevant_documents. The dense search is a plain similarity search,
+        whatever the search type of the single-query retriever, cut by the
+        adaptive thresholds.
+        
+        Args:
+            queries (List[str]): User queries
+            
+        Returns:
+            List[List[Document]]: Relevant documents of each query, in order
+        """
+        start = time.perf_counter()
+        results = [None] * len(queries)
+        lexical = {}
+        for i, query in enumerate(queries):
+            lexical_hits, docs = self._search_lexical(query)
+            if docs is not None:
+                results[i] = docs
+            else:
+                lexical[i] = lexical_hits
+        
+        dense = self.batch_similarity_search_with_score([queries[i] for i in lexical])
+        for (i, lexical_hits), dense_results in zip(lexical.items(), dense):
+            dense_docs = self._cut(dense_results)
+            if not self.hybrid or not lexical_hits or not dense_docs:
+                results[i] = dense_docs
+            else:
+                results[i] = self._fuse(dense_docs, [doc_id for doc_id, _ in lexical_hits])
+        
+        if queries:
+            self.latency.record("batch", (time.perf_counter() - start) / len(queries))
+        return results
+    
+    def batch_similarity_search_with_score(self, queries: List[str], k=None) -> List[List[tuple]]:
+        """
+        Perform similarity search with scores for many queries at once.
+        
+        All queries are embedded in a single request and searched together.
+        
+        Args:
+            queries (List[str]): User queries
+            k (int, optional): Number of results per query
+            
+        Returns:
+            List[List[tuple]]: For each query, tuples (document, score)
+        """
+        if k is None:
+            k = self.top_k
+        if not queries:
+            return []
+        
+        embeddings = self.embedding_model.embed_documents(list(queries))
+        return search_by_vectors(self.vectorstore, embeddings, k)
+    
+    def _search_lexical(self, query):
+        """
+        Run the lexical side of a retrieval.
+        
+        Returns:
+            tuple: (lexical hits, documents if the fast path answers the query else None)
+        """
+        if self.lexical_index is None or not (self.hybrid or self.lexical_fast_path):
+            return [], None
+        with tracer.span("lexical_search"):
+            lexical_hits = self.lexical_index.search(query, k=self.top_k)
+        if self.lexical_fast_path and is_decisive(lexical_hits):
+            docs = get_documents_by_ids(self.vectorstore, [doc_id for doc_id, _ in lexical_hits])
+            return lexical_hits, [doc for doc in docs if doc is not None]
+        return lexical_hits, None
+    
+    def _plain_similarity(self):
+        """Whether the retriever runs a plain similarity search, which can be scored."""
+        return self.retriever.search_type == "similarity" and set(self.retriever.search_kwargs) <= {"k"}
+    
+    def _cut(self, results):
+        """Documents of scored dense results, after the adaptive cutoffs."""
+        if self.adaptive:
+            results = adaptive_cutoff(results, self.max_distance, self.score_gap, settings.RETRIEVAL_MIN_K)
+        return [doc for doc, _ in results]
+    
+    def _finish(self, start, dense_docs, lexical_hits):
+        """Fuse dense and lexical results if needed, and record the path taken."""
+        if not dense_docs and self.adaptive:
+            # Nothing cleared the distance threshold: the question is out of scope
+            self.latency.record("no_match", time.perf_counter() - start)
+            return []
+        if not self.hybrid or not lexical_hits:
+            self.latency.record("dense", time.perf_counter() - start)
+            return dense_docs
+        with tracer.span("fusion"):
+            docs = self._fuse(dense_docs, [doc_id for doc_id, _ in lexical_hits])
+        self.latency.record("hybrid", time.perf_counter() - start)
+        return docs
+    
+    def _fuse(self, dense_docs, lexical_ids):
+        """Merge dense documents and lexical ids with reciprocal-rank fusion."""
+        by_id = {}
+        dense_ids = []
+        for doc in dense_docs:
+            # Chunks carry their vector id; fall back on the text for older databases
+            doc_id = doc.metadata.get("chunk_id") or doc.page_content
+            by_id.setdefault(doc_id, doc)
+            dense_ids.append(doc_id)
+        
+        # Adaptive retrieval decided the depth from the dense distances
+        limit = len(dense_docs) if self.adaptive else self.top_k
+        fused = [doc_id for doc_id, _ in reciprocal_rank_fusion([dense_ids, lexical_ids])[:limit]]
+        missing = [doc_id for doc_id in fused if doc_id not in by_id]
+        by_id.update(zip(missing, get_documents_by_ids(self.vectorstore, missing)))
+        return [by_id[doc_id] for doc_id in fused if by_id.get(doc_id) is not None]
+    
+    def retrieval_stats(self):
+        """
+        Get the latency of each retrieval path.
+        
+        Paths are "lexical" (fast path, no embedding call), "hybrid", "dense" and
+        "no_match" (nothing relevant with adaptive retrieval), plus "batch" for
+        batched calls, recorded as their mean time per query.
+        
+        Returns:
+            dict: Per path, the count, share of queries and latency percentiles
+        """
+        return self.latency.stats()
     
     def similarity_search_with_score(self, query: str, k=None) -> List[tuple]:
         """
@@ -66,6 +321,28 @@ class DocumentRetriever:
             
         return self.vectorstore.similarity_search_with_score(query, k=k)
     
+    def embedding_cache_stats(self):
+        """
+        Get the embedding cache counters of the query embedding model.
+        
+        Returns:
+            dict: Hit, miss and eviction counts, or None if caching is disabled
+        """
+        stats = getattr(self.embedding_model, "stats", None)
+        return stats() if stats else None
+
+    def query_batching_stats(self):
+        """
+        Get the batch sizes and queueing delays of the query embeddings.
+
+        Returns:
+            dict: Counters of the query batcher, or None if batching is disabled
+        """
+        model = self.embedding_model
+        while model is not None and not hasattr(model, "batch_stats"):
+            model = getattr(model, "embedding_model", None)
+        return model.batch_stats() if model is not None else None
+
     def update_retrieval_parameters(self, top_k=None, search_type=None, **kwargs):
         """
         Update retriever parameters.
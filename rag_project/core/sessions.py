@@ -0,0 +1,76 @@
+"""Module for server-side conversation sessions of the RAG chain."""
+
+import threading
+import time
+from langgraph.checkpoint.memory import InMemorySaver
+
+class SessionCheckpointer(InMemorySaver):
+    """
+    In-memory LangGraph checkpointer keeping only the latest state of each session.
+
+    The default in-memory saver keeps every checkpoint of every turn, so its
+    memory grows with the length of conversations. Sessions only ever resume
+    from their latest state: older checkpoints, their pending writes and the
+    channel values they alone referenced are dropped as soon as a new
+    checkpoint is saved. Sessions idle for too long are dropped by prune().
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._blob_keys = {}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        versions = checkpoint["channel_versions"]
+        with self._lock:
+            self._last_used[thread_id] = time.monotonic()
+
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            for checkpoint_id in [key for key in checkpoints if key != checkpoint["id"]]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+            blob_keys = self._blob_keys.setdefault((thread_id, checkpoint_ns), set())
+            blob_keys.update((thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items())
+            for key in [key for key in blob_keys if versions.get(key[2]) != key[3]]:
+                blob_keys.discard(key)
+                self.blobs.pop(key, None)
+        return saved
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+            for key in [key for key in self._blob_keys if key[0] == thread_id]:
+                del self._blob_keys[key]
+
+    def prune(self, max_idle):
+        """
+        Drop the sessions unused for a while.
+
+        Args:
+            max_idle (float): Seconds of inactivity after which a session is dropped
+
+        Returns:
+            int: Number of sessions dropped
+        """
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            expired = [thread_id for thread_id, last_used in self._last_used.items() if last_used < cutoff]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+    def session_count(self):
+        """
+        Get the number of live sessions.
+
+        Returns:
+            int: Sessions holding a saved state
+        """
+        with self._lock:
+            return len(self._last_used)
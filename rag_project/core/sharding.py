@@ -0,0 +1,324 @@
+"""Module for vector databases split into shards searched in parallel."""
+
+import hashlib
+import heapq
+import json
+import os
+import queue
+import shutil
+import threading
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, tee
+from typing import List
+from langchain_core.vectorstores import VectorStore
+from rag_project.utils.file_utils import atomic_write
+from rag_project.config import settings
+
+_DONE = object()
+
+def shard_key(document, doc_id):
+    """
+    Return the key deciding the shard of a chunk.
+
+    Chunks are placed by their source file, so all chunks of a document live
+    in the same shard and an update of the document only touches that shard.
+
+    Args:
+        document (Document): Chunk
+        doc_id (str): Vector id of the chunk, used when it has no source
+
+    Returns:
+        str: Shard key
+    """
+    return str(document.metadata.get("source") or doc_id)
+
+def shard_of(document, doc_id, shards):
+    """
+    Return the shard of a chunk, stable across processes and runs.
+
+    Args:
+        document (Document): Chunk
+        doc_id (str): Vector id of the chunk
+        shards (int): Number of shards
+
+    Returns:
+        int: Shard number, between 0 and shards - 1
+    """
+    digest = hashlib.blake2b(shard_key(document, doc_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+def read_layout(persist_directory):
+    """
+    Read the shard layout of a vector database.
+
+    Args:
+        persist_directory (str): Directory of the vector database
+
+    Returns:
+        dict: "shards" and "directories" (relative to persist_directory), or
+            None if the database is not sharded
+    """
+    path = os.path.join(persist_directory, settings.SHARDS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def shard_directories(persist_directory, layout=None):
+    """
+    List the directories of the shards of a vector database.
+
+    Args:
+        persist_directory (str): Directory of the vector database
+        layout (dict): Layout, if already read
+
+    Returns:
+        list: One directory per shard, empty if the database is not sharded
+    """
+    layout = layout or read_layout(persist_directory)
+    if layout is None:
+        return []
+    return [os.path.join(persist_directory, directory) for directory in layout["directories"]]
+
+def new_layout(persist_directory, shards):
+    """
+    Create the directories of a new generation of shards.
+
+    The generation is only used once publish_layout switches to it, so
+    readers keep the previous shards while it is being built.
+
+    Args:
+        persist_directory (str): Directory of the vector database
+        shards (int): Number of shards
+
+    Returns:
+        dict: Layout to build and then publish
+    """
+    generation = f"shards-{uuid.uuid4().hex[:12]}"
+    layout = {
+        "shards": shards,
+        "generation": generation,
+        "directories": [os.path.join(generation, f"{shard:03d}") for shard in range(shards)],
+    }
+    for directory in shard_directories(persist_directory, layout):
+        os.makedirs(directory, exist_ok=True)
+    return layout
+
+def publish_layout(persist_directory, layout):
+    """
+    Switch a vector database to a layout, or back to a single store if None.
+
+    The layout file is replaced atomically, then the shards of other
+    generations are removed.
+
+    Args:
+        persist_directory (str): Directory of the vector database
+        layout (dict): Layout built by new_layout, or None
+    """
+    path = os.path.join(persist_directory, settings.SHARDS_FILE)
+    if layout is None:
+        if os.path.exists(path):
+            os.remove(path)
+    else:
+        atomic_write(path, json.dumps(layout, indent=2))
+
+    # Processes still searching the old shards keep their open files until they reload
+    for name in os.listdir(persist_directory):
+        if name.startswith("shards-") and (layout is None or name != layout["generation"]):
+            shutil.rmtree(os.path.join(persist_directory, name), ignore_errors=True)
+
+def discard_layout(persist_directory, layout):
+    """
+    Remove the shards of a layout that was never published (e.g. a failed build).
+
+    Args:
+        persist_directory (str): Directory of the vector database
+        layout (dict): Layout built by new_layout
+    """
+    shutil.rmtree(os.path.join(persist_directory, layout["generation"]), ignore_errors=True)
+
+def partition(items, shards, build):
+    """
+    Split chunks over shards and build every shard in its own thread.
+
+    Chunks are handed to the shard builders through bounded queues as they
+    are read, so a generator of chunks is consumed lazily and the shards
+    are built in parallel.
+
+    Args:
+        items (iterable): (chunk, vector id) pairs
+        shards (int): Number of shards
+        build (callable): Called as build(shard, documents, ids) in the thread
+            of each shard, with lazy iterables of its chunks and their ids
+
+    Returns:
+        list: Return value of build for each shard
+
+    Raises:
+        Exception: The first error of a shard builder
+    """
+    queues = [queue.Queue(maxsize=settings.SHARD_BUILD_QUEUE_SIZE) for _ in range(shards)]
+    results = [None] * shards
+    errors = [None] * shards
+
+    def consume(shard):
+        pairs = iter(queues[shard].get, _DONE)
+        try:
+            # The pipeline reads both iterables in lockstep, so tee buffers one pair at most
+            shard_documents, shard_ids = tee(pairs)
+            results[shard] = build(
+                shard, (document for document, _ in shard_documents), (doc_id for _, doc_id in shard_ids)
+            )
+        except Exception as e:
+            errors[shard] = e
+        # Drain the queue, so the reader never blocks on a failed shard
+        for _ in pairs:
+            pass
+
+    threads = [threading.Thread(target=consume, args=(shard,), name=f"shard-{shard}") for shard in range(shards)]
+    for thread in threads:
+        thread.start()
+    try:
+        for document, doc_id in items:
+            queues[shard_of(document, doc_id, shards)].put((document, doc_id))
+    finally:
+        for shard_queue in queues:
+            shard_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
+
+class ShardedVectorStore(VectorStore):
+    """
+    Read-only vector store fanning searches out to its shards.
+
+    Every shard is a complete vector database of the configured backend
+    holding part of the chunks. A search sends the query vectors to all
+    shards at once, in a thread pool, and merges their top-k results by
+    distance; the backends release the GIL while they score vectors, so
+    shards are searched in parallel. Scores are the distances of the
+    backend, so thresholds are the same as for a single store.
+    """
+
+    def __init__(self, persist_directory, shards, embedding_function, max_workers=None):
+        """
+        Open a sharded vector store.
+
+        Args:
+            persist_directory (str): Directory of the vector database
+            shards (list): Vector store of each shard
+            embedding_function (Embeddings): Model embedding the queries
+            max_workers (int): Shards searched at once. If None, uses
+                SHARD_SEARCH_WORKERS from settings, or one thread per shard.
+        """
+        self.persist_directory = persist_directory
+        self.shards = shards
+        self.embedding_function = embedding_function
+        self._executor = ThreadPoolExecutor(
+            max_workers or settings.SHARD_SEARCH_WORKERS or len(shards), thread_name_prefix="shard-search"
+        )
+        # Stores dropped without close() (e.g. a replaced retriever) still release their threads
+        self._finalizer = weakref.finalize(self, self._executor.shutdown, wait=False)
+
+    def close(self):
+        """Stop the search threads of the store, once it has been replaced."""
+        self._finalizer()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def __len__(self):
+        # Imported here, embeddings imports this module
+        from rag_project.core.embeddings import count_vectors
+        return sum(self.map(count_vectors))
+
+    def map(self, function, *args):
+        """
+        Call a function on every shard in parallel.
+
+        Args:
+            function (callable): Called as function(shard, *args)
+            *args: Further arguments of the function
+
+        Returns:
+            list: Result of each shard, in shard order
+        """
+        if len(self.shards) == 1:
+            return [function(self.shards[0], *args)]
+        return list(self._executor.map(lambda shard: function(shard, *args), self.shards))
+
+    def similarity_search_with_score_by_vectors(self, embeddings, k=4) -> List[List[tuple]]:
+        """
+        Search several query vectors in every shard and merge the results.
+
+        Args:
+            embeddings (list): Query vectors
+            k (int): Number of results per query
+
+        Returns:
+            List[List[tuple]]: For each query, the k nearest (document, distance) pairs of all shards
+        """
+        from rag_project.core.embeddings import search_by_vectors
+        if not embeddings:
+            return []
+        per_shard = self.map(search_by_vectors, embeddings, k)
+        # Each shard returns its results nearest first, so a k-way merge is enough
+        return [
+            list(islice(heapq.merge(*results, key=lambda result: result[1]), k))
+            for results in zip(*per_shard)
+        ]
+
+    def get_documents_by_ids(self, ids):
+        """
+        Read documents by id from whichever shard holds them.
+
+        Args:
+            ids (list): Vector ids
+
+        Returns:
+            list: Documents aligned with the ids, None for unknown ids
+        """
+        from rag_project.core.embeddings import get_documents_by_ids
+        found = [None] * len(ids)
+        for documents in self.map(get_documents_by_ids, ids):
+            for position, document in enumerate(documents):
+                if document is not None:
+                    found[position] = document
+        return found
+
+    def get_by_ids(self, ids, /):
+        """Read documents by vector id, skipping unknown ids."""
+        return [document for document in self.get_documents_by_ids(list(ids)) if document is not None]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4) -> List[tuple]:
+        """Search one query vector, returning (document, distance) pairs."""
+        return self.similarity_search_with_score_by_vectors([embedding], k=k)[0]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs) -> List[tuple]:
+        """Search a query text, embedded once for all shards, returning (document, distance) pairs."""
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError(
+            "ShardedVectorStore is read-only; build it with create_vectorstore or update_vectorstore"
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build sharded vector databases with create_vectorstore")
@@ -1,3 +1,15 @@
 """Data processing modules for RAG project."""
 
-from rag_project.data_processing.ingest import load_documents, create_chunks
+# Imported on first access: the loaders pull in langchain_community
+_LAZY_ATTRIBUTES = {
+    "load_documents": "rag_project.data_processing.ingest",
+    "create_chunks": "rag_project.data_processing.ingest",
+    "iter_documents": "rag_project.data_processing.ingest",
+    "iter_chunks": "rag_project.data_processing.ingest",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,175 @@
+"""Module for incremental ingestion of changed files into the vector database."""
+
+import os
+from rag_project.data_processing.ingest import list_files, load_file, create_chunks
+from rag_project.data_processing.manifest import IngestManifest, assign_chunk_ids, hash_file
+from rag_project.core.embeddings import update_vectorstore
+from rag_project.config import settings
+
+class ManifestRecorder:
+    """Collect the ids of chunks streamed into the vector database, for the manifest."""
+
+    def __init__(self):
+        """Initialize an empty recorder."""
+        self.chunks_by_source = {}
+
+    def track(self, chunks):
+        """
+        Record chunks as they pass through.
+
+        Args:
+            chunks (iterable): Chunks with "chunk_id" metadata
+
+        Yields:
+            Document: The same chunks
+        """
+        for chunk in chunks:
+            source = chunk.metadata.get("source", "")
+            self.chunks_by_source.setdefault(source, []).append(chunk.metadata["chunk_id"])
+            yield chunk
+
+    def save(self, chunk_size, chunk_overlap, manifest_path=None):
+        """
+        Write a fresh manifest describing the recorded chunks.
+
+        Args:
+            chunk_size (int): Chunk size used to build the chunks
+            chunk_overlap (int): Chunk overlap used to build the chunks
+            manifest_path (str): Path of the manifest file
+
+        Returns:
+            IngestManifest: Saved manifest
+        """
+        manifest = IngestManifest(
+            path=manifest_path,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        )
+
+        for source, chunk_ids in self.chunks_by_source.items():
+            file_hash = hash_file(source) if os.path.isfile(source) else None
+            manifest.set_file(source, file_hash, chunk_ids)
+
+        manifest.save()
+        return manifest
+
+def record_ingest(chunks, chunk_size, chunk_overlap, manifest_path=None):
+    """
+    Write a fresh manifest describing a full ingest.
+
+    Args:
+        chunks (list): Chunks stored in the vector database, with "chunk_id" metadata
+        chunk_size (int): Chunk size used to build the chunks
+        chunk_overlap (int): Chunk overlap used to build the chunks
+        manifest_path (str): Path of the manifest file
+
+    Returns:
+        IngestManifest: Saved manifest
+    """
+    recorder = ManifestRecorder()
+    for _ in recorder.track(chunks):
+        pass
+    return recorder.save(chunk_size, chunk_overlap, manifest_path=manifest_path)
+
+def incremental_ingest(directory=None, chunk_size=500, chunk_overlap=100, glob_pattern="**/*.md",
+                       persist_directory=None, manifest_path=None, embedding_model=None,
+                       **pipeline_kwargs):
+    """
+    Bring the vector database up to date with a directory, embedding only what changed.
+
+    Files whose content hash matches the manifest are skipped entirely. Changed
+    and new files are re-chunked, and only chunks whose content-addressed id is
+    not already stored are embedded. Chunks of removed files, and chunks that
+    disappeared from changed files, are deleted from the vector database.
+
+    Args:
+        directory (str): Directory containing input files
+        chunk_size (int): Size of each chunk
+        chunk_overlap (int): Overlap between chunks
+        glob_pattern (str): Pattern to match files
+        persist_directory (str): Directory of the vector database
+        manifest_path (str): Path of the manifest file
+        embedding_model: Embedding model to use
+        **pipeline_kwargs: Overrides of the EmbeddingPipeline settings
+
+    Returns:
+        dict: Counts of added, updated, removed and unchanged files and chunks
+    """
+    if directory is None:
+        directory = settings.INPUT_DATA_DIR
+
+    manifest = IngestManifest.load(manifest_path)
+
+    # Different chunking parameters invalidate every recorded chunk
+    rechunk_all = not manifest.matches_parameters(chunk_size, chunk_overlap)
+    if rechunk_all and manifest.files:
+        print("Chunking parameters changed, re-chunking every file...")
+
+    stats = {
+        "files_added": 0, "files_updated": 0, "files_removed": 0, "files_unchanged": 0,
+        "chunks_added": 0, "chunks_removed": 0, "chunks_unchanged": 0,
+    }
+
+    current_sources = list_files(directory, glob_pattern)
+    new_documents = []
+    new_ids = []
+    delete_ids = []
+
+    for source in current_sources:
+        file_hash = hash_file(source)
+        old_hash = manifest.file_hash(source)
+        old_ids = manifest.chunk_ids(source)
+
+        if old_hash == file_hash and not rechunk_all:
+            stats["files_unchanged"] += 1
+            stats["chunks_unchanged"] += len(old_ids)
+            continue
+
+        stats["files_added" if source not in manifest.files else "files_updated"] += 1
+
+        chunks = create_chunks(load_file(source), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        chunk_ids = assign_chunk_ids(chunks)
+
+        old_id_set = set(old_ids)
+        new_id_set = set(chunk_ids)
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            if chunk_id not in old_id_set:
+                new_documents.append(chunk)
+                new_ids.append(chunk_id)
+
+        stale_ids = [chunk_id for chunk_id in old_ids if chunk_id not in new_id_set]
+        delete_ids.extend(stale_ids)
+
+        stats["chunks_added"] += len(new_id_set - old_id_set)
+        stats["chunks_removed"] += len(stale_ids)
+        stats["chunks_unchanged"] += len(new_id_set & old_id_set)
+
+        manifest.set_file(source, file_hash, chunk_ids)
+
+    # Files that are gone from the input directory
+    current_set = set(current_sources)
+    for source in list(manifest.files):
+        if source not in current_set:
+            removed_ids = manifest.chunk_ids(source)
+            delete_ids.extend(removed_ids)
+            stats["files_removed"] += 1
+            stats["chunks_removed"] += len(removed_ids)
+            manifest.remove_file(source)
+
+    if new_documents or delete_ids:
+        print(f"Embedding {len(new_documents)} chunks, deleting {len(delete_ids)} chunks...")
+        update_vectorstore(
+            documents=new_documents,
+            ids=new_ids,
+            delete_ids=delete_ids,
+            persist_directory=persist_directory,
+            embedding_model=embedding_model,
+            **pipeline_kwargs
+        )
+
+    # Only record the new state once the vector database has been updated
+    manifest.chunk_size = chunk_size
+    manifest.chunk_overlap = chunk_overlap
+    manifest.save()
+
+    return stats
@@ -1,7 +1,8 @@
 """Module for loading and processing documents."""
 
 import os
-from langchain_community.document_loaders import DirectoryLoader
+from pathlib import Path
+from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from rag_project.config import settings
 
@@ -32,6 +33,65 @@ def load_documents(directory=None, glob_pattern="**/*.md", show_progress=True):
     print(f"Loading of {len(documents)} documents done")
     return documents
 
+def iter_documents(directory=None, glob_pattern="**/*.md", show_progress=True):
+    """
+    Lazily load documents from a directory, one file at a time.
+    
+    Args:
+        directory (str): Directory to load documents from. If None, uses default from settings.
+        glob_pattern (str): Pattern to match files
+        show_progress (bool): Whether to show progress during loading
+        
+    Yields:
+        Document: Loaded documents
+    """
+    if directory is None:
+        directory = settings.INPUT_DATA_DIR
+    
+    os.makedirs(directory, exist_ok=True)
+    
+    loader = DirectoryLoader(directory, glob=glob_pattern, show_progress=show_progress)
+    yield from loader.lazy_load()
+
+def list_files(directory=None, glob_pattern="**/*.md"):
+    """
+    List the files that load_documents would load from a directory.
+    
+    Args:
+        directory (str): Directory to list files from. If None, uses default from settings.
+        glob_pattern (str): Pattern to match files
+        
+    Returns:
+        list: Sorted list of file paths, as used in the documents' "source" metadata
+    """
+    if directory is None:
+        directory = settings.INPUT_DATA_DIR
+    
+    root = Path(directory)
+    files = []
+    for path in root.glob(glob_pattern):
+        # Skip directories and hidden files, like DirectoryLoader does
+        if not path.is_file():
+            continue
+        if any(part.startswith(".") for part in path.relative_to(root).parts):
+            continue
+        files.append(str(path))
+    
+    return sorted(files)
+
+def load_file(path):
+    """
+    Load the documents of a single file.
+    
+    Args:
+        path (str): Path of the file to load
+        
+    Returns:
+        list: List of loaded documents
+    """
+    loader = UnstructuredFileLoader(path)
+    return loader.load()
+
 def create_chunks(documents, chunk_size=500, chunk_overlap=100):
     """
     Split documents into smaller chunks.
@@ -49,10 +109,35 @@ def create_chunks(documents, chunk_size=500, chunk_overlap=100):
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
+        # Offsets let context packing merge adjacent chunks
+        add_start_index=True,
     )
     
     # Split documents into chunks
     chunks = text_splitter.split_documents(documents)
     
     print(f"Creation of {len(chunks)} chunks done")
-    return chunks
\ No newline at end of file
+    return chunks
+
+def iter_chunks(documents, chunk_size=500, chunk_overlap=100):
+    """
+    Lazily split documents into smaller chunks, one document at a time.
+    
+    Args:
+        documents (iterable): Documents to split
+        chunk_size (int): Size of each chunk
+        chunk_overlap (int): Overlap between chunks
+        
+    Yields:
+        Document: Document chunks
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        # Offsets let context packing merge adjacent chunks
+        add_start_index=True,
+    )
+    
+    for document in documents:
+        yield from text_splitter.split_documents([document])
@@ -0,0 +1,62 @@
+"""Module for journaling processed files so interrupted runs can resume."""
+
+import json
+import os
+
+class ProcessingJournal:
+    """Append-only record of the files a processing run has completed."""
+
+    def __init__(self, path):
+        """
+        Open the journal, loading the entries of previous runs.
+
+        Args:
+            path (str): Path of the JSONL journal file
+        """
+        self.path = path
+        self.entries = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line of an interrupted run may be truncated
+                        continue
+                    self.entries[entry["file"]] = entry
+
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, filename, input_hash, mode):
+        """
+        Check whether a file was already processed from the same input and mode.
+
+        Args:
+            filename (str): Name of the input file
+            input_hash (str): Content hash of the input file
+            mode (str): Processing mode ("clean" or "rewrite")
+
+        Returns:
+            bool: True if the file can be skipped
+        """
+        entry = self.entries.get(filename)
+        return bool(entry) and entry["input_hash"] == input_hash and entry["mode"] == mode
+
+    def mark_done(self, filename, input_hash, mode):
+        """
+        Record that a file has been processed and its output written.
+
+        Args:
+            filename (str): Name of the input file
+            input_hash (str): Content hash of the input file
+            mode (str): Processing mode ("clean" or "rewrite")
+        """
+        entry = {"file": filename, "input_hash": input_hash, "mode": mode}
+        self.entries[filename] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Close the journal file."""
+        self._file.close()
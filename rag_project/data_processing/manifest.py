@@ -0,0 +1,182 @@
+"""Module for tracking ingested files and chunks between ingest runs."""
+
+import hashlib
+import json
+import os
+from rag_project.config import settings
+
+MANIFEST_VERSION = 1
+
+def hash_text(text):
+    """
+    Compute the content hash of a piece of text.
+
+    Args:
+        text (str): Text to hash
+
+    Returns:
+        str: Hex SHA-256 digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_file(path, block_size=1 << 20):
+    """
+    Compute the content hash of a file without reading it all at once.
+
+    Args:
+        path (str): Path of the file to hash
+        block_size (int): Number of bytes read per step
+
+    Returns:
+        str: Hex SHA-256 digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_with_chunk_ids(chunks):
+    """
+    Give every chunk a stable, content-addressed identifier, lazily.
+
+    The identifier is derived from the chunk source and text, so an unchanged
+    chunk keeps the same id across runs. Repeated identical chunks within the
+    same source get an occurrence suffix. The id is stored in the chunk
+    metadata under "chunk_id". Chunks of a source must be contiguous.
+
+    Args:
+        chunks (iterable): Document chunks
+
+    Yields:
+        Document: The same chunks, with "chunk_id" metadata
+    """
+    current_source = None
+    seen = {}
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "")
+        if source != current_source:
+            current_source = source
+            seen = {}
+
+        digest = hash_text(f"{source}\0{chunk.page_content}")
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+
+        chunk.metadata["chunk_id"] = digest if occurrence == 0 else f"{digest}-{occurrence}"
+        yield chunk
+
+def assign_chunk_ids(chunks):
+    """
+    Give every chunk of a list a stable, content-addressed identifier.
+
+    See iter_with_chunk_ids.
+
+    Args:
+        chunks (list): List of document chunks
+
+    Returns:
+        list: List of chunk ids, in the same order as the chunks
+    """
+    return [chunk.metadata["chunk_id"] for chunk in iter_with_chunk_ids(chunks)]
+
+class IngestManifest:
+    """Persistent record of the files and chunks stored in the vector database."""
+
+    def __init__(self, path=None, chunk_size=None, chunk_overlap=None, files=None):
+        """
+        Initialize the manifest.
+
+        Args:
+            path (str): Path of the manifest file
+            chunk_size (int): Chunk size used to build the recorded chunks
+            chunk_overlap (int): Chunk overlap used to build the recorded chunks
+            files (dict): Mapping of source path to {"hash": ..., "chunks": [...]}
+        """
+        if path is None:
+            path = settings.INGEST_MANIFEST_PATH
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.files = files if files is not None else {}
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Load a manifest from disk, or return an empty one if none exists.
+
+        Args:
+            path (str): Path of the manifest file
+
+        Returns:
+            IngestManifest: Loaded manifest
+        """
+        if path is None:
+            path = settings.INGEST_MANIFEST_PATH
+
+        if not os.path.exists(path):
+            return cls(path=path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        return cls(
+            path=path,
+            chunk_size=data.get("chunk_size"),
+            chunk_overlap=data.get("chunk_overlap"),
+            files=data.get("files", {})
+        )
+
+    def save(self):
+        """Write the manifest to disk atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "version": MANIFEST_VERSION,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "files": self.files,
+        }
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def matches_parameters(self, chunk_size, chunk_overlap):
+        """
+        Check whether the recorded chunks were built with the given parameters.
+
+        Args:
+            chunk_size (int): Chunk size of the current run
+            chunk_overlap (int): Chunk overlap of the current run
+
+        Returns:
+            bool: True if the chunking parameters are unchanged
+        """
+        return self.chunk_size == chunk_size and self.chunk_overlap == chunk_overlap
+
+    def file_hash(self, source):
+        """Return the recorded content hash of a source file, or None."""
+        entry = self.files.get(source)
+        return entry["hash"] if entry else None
+
+    def chunk_ids(self, source):
+        """Return the recorded chunk ids of a source file."""
+        entry = self.files.get(source)
+        return list(entry["chunks"]) if entry else []
+
+    def all_chunk_ids(self):
+        """Return the chunk ids of every recorded source file."""
+        return [chunk_id for entry in self.files.values() for chunk_id in entry["chunks"]]
+
+    def set_file(self, source, file_hash, chunk_ids):
+        """Record the content hash and chunk ids of a source file."""
+        self.files[source] = {"hash": file_hash, "chunks": list(chunk_ids)}
+
+    def remove_file(self, source):
+        """Forget a source file."""
+        self.files.pop(source, None)
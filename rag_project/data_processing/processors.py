@@ -1,7 +1,12 @@
 """Module for processing and transforming document data."""
 
+import asyncio
 import os
+from concurrent.futures import ProcessPoolExecutor
 from rag_project.utils.text_utils import clean_text, rewrite_text
+from rag_project.utils.file_utils import atomic_write
+from rag_project.data_processing.journal import ProcessingJournal
+from rag_project.data_processing.manifest import hash_text
 from rag_project.config import settings
 
 def process_files(input_dir=None, output_dir=None, clean_only=False):
@@ -47,10 +52,143 @@ def process_files(input_dir=None, output_dir=None, clean_only=False):
                 processed_text = cleaned_text
             
             # Write the processed text
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(processed_text)
+            atomic_write(output_path, processed_text)
             
             files_processed += 1
             print(f"✅ Processed file: {filename}")
     
-    return files_processed
\ No newline at end of file
+    return files_processed
+
+def _clean_file(input_path, output_path=None):
+    """
+    Read and clean one file, in a worker process.
+    
+    Args:
+        input_path (str): Path of the file to clean
+        output_path (str, optional): If given, the cleaned text is written
+            there directly instead of being sent back to the parent process
+        
+    Returns:
+        tuple: (input hash, cleaned text or None if it was written)
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    
+    cleaned_text = clean_text(content)
+    
+    if output_path is not None:
+        atomic_write(output_path, cleaned_text)
+        return hash_text(content), None
+    return hash_text(content), cleaned_text
+
+def _read_hash(input_path):
+    """Return the content hash of a text file."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        return hash_text(f.read())
+
+def process_files_parallel(input_dir=None, output_dir=None, clean_only=False, workers=None,
+                           rewrite_concurrency=None, resume=True):
+    """
+    Process markdown files in parallel, resuming interrupted runs.
+    
+    Cleaning runs on a process pool sized to the available cores, and
+    rewrites run as concurrent asynchronous API calls, bounded by
+    rewrite_concurrency. Outputs are written atomically, and every completed
+    file is recorded in a journal in the output directory, so a later run
+    skips files whose input has not changed since they were processed.
+    
+    Args:
+        input_dir (str): Directory containing input files
+        output_dir (str): Directory to save processed files
+        clean_only (bool): If True, only clean text without rewriting
+        workers (int): Number of cleaning processes. If None, uses PROCESS_WORKERS
+            from settings, or the number of cores.
+        rewrite_concurrency (int): Maximum number of concurrent rewrite requests
+        resume (bool): Whether to skip files already recorded in the journal
+        
+    Returns:
+        int: Number of files processed
+    """
+    if input_dir is None:
+        input_dir = settings.INPUT_DATA_DIR
+        
+    if output_dir is None:
+        output_dir = settings.PROCESSED_DATA_DIR
+    
+    if workers is None:
+        workers = settings.PROCESS_WORKERS or os.cpu_count() or 1
+    
+    if rewrite_concurrency is None:
+        rewrite_concurrency = settings.REWRITE_CONCURRENCY
+    
+    os.makedirs(input_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    journal_path = os.path.join(output_dir, settings.PROCESS_JOURNAL_FILE)
+    if not resume and os.path.exists(journal_path):
+        os.remove(journal_path)
+    journal = ProcessingJournal(journal_path)
+    
+    filenames = sorted(f for f in os.listdir(input_dir) if f.endswith(".md"))
+    mode = "clean" if clean_only else "rewrite"
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            stats = asyncio.run(_process_all(
+                filenames, input_dir, output_dir, clean_only, mode,
+                pool, workers, rewrite_concurrency, journal
+            ))
+    finally:
+        journal.close()
+    
+    print(f"{stats['processed']} processed, {stats['skipped']} already done, {stats['failed']} failed")
+    return stats["processed"]
+
+async def _process_all(filenames, input_dir, output_dir, clean_only, mode, pool, workers,
+                       rewrite_concurrency, journal):
+    """Clean and rewrite every file, returning processed/skipped/failed counts."""
+    loop = asyncio.get_running_loop()
+    rewriter = None
+    if not clean_only:
+        # The OpenAI clients are only imported when files are rewritten
+        from rag_project.utils.rewriter import RewriteService
+        rewriter = RewriteService(concurrency=rewrite_concurrency)
+    # Bound the number of files held in memory between cleaning and writing
+    file_slots = asyncio.Semaphore(workers + 2 * rewrite_concurrency)
+    stats = {"processed": 0, "skipped": 0, "failed": 0}
+    
+    async def handle(filename):
+        input_path = os.path.join(input_dir, filename)
+        output_path = os.path.join(output_dir, filename)
+        
+        async with file_slots:
+            try:
+                if journal.entries.get(filename) and os.path.exists(output_path):
+                    input_hash = await loop.run_in_executor(None, _read_hash, input_path)
+                    if journal.is_done(filename, input_hash, mode):
+                        stats["skipped"] += 1
+                        return
+                
+                input_hash, cleaned_text = await loop.run_in_executor(
+                    pool, _clean_file, input_path, output_path if clean_only else None
+                )
+                
+                if not clean_only:
+                    processed_text = await rewriter.arewrite(cleaned_text)
+                    await loop.run_in_executor(None, atomic_write, output_path, processed_text)
+            except Exception as e:
+                # The file is not journaled, so the next run retries it
+                stats["failed"] += 1
+                print(f"❌ Failed file: {filename} ({e})")
+                return
+            
+            journal.mark_done(filename, input_hash, mode)
+            stats["processed"] += 1
+            print(f"✅ Processed file: {filename}")
+    
+    await asyncio.gather(*(handle(filename) for filename in filenames))
+    
+    if not clean_only:
+        cache_stats = rewriter.stats()
+        print(f"Rewrite cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    return stats
@@ -0,0 +1,203 @@
+"""Configurable, precompiled text-cleaning engine."""
+
+import itertools
+import re
+from collections import namedtuple
+
+CleaningRule = namedtuple("CleaningRule", ["name", "pattern", "replacement", "flags", "stage", "span"])
+CleaningRule.__new__.__defaults__ = ("", 0, 1, "line")
+CleaningRule.__doc__ = """
+A single cleaning rule.
+
+Fields:
+    name (str): Identifier of the rule
+    pattern (str): Regular expression to match
+    replacement (str): Literal text substituted for every match
+    flags (int): re flags applying to this rule only (IGNORECASE, MULTILINE, ...)
+    stage (int): Scan in which the rule runs. Rules of the same stage are
+        compiled into one alternation and applied in a single scan; when two
+        rules match at the same position, the one listed first wins.
+    span (str): How far a match can reach, which tells clean_stream where it
+        may cut the input of the stage: "line" for matches that do not cross a
+        line break (they may start at one), "tag" for matches that may cross
+        line breaks up to a closing ">", "whitespace" for runs of whitespace.
+        "whitespace" rules cannot share a stage with the other kinds.
+
+Scans are fastest when every alternative of a stage starts with a literal
+character: re then jumps straight to candidate positions instead of trying
+every rule at every character. Flags disable that for their rule, which is
+why the case-insensitive rules below spell out their first letter.
+"""
+
+# Removals run first, in one scan on the original line structure, so the line
+# rules still see their line breaks; whitespace is collapsed afterwards,
+# including the gaps the removals leave behind. Line rules match from the
+# preceding line break, which clean() and clean_stream() add before the first
+# line.
+DEFAULT_RULES = (
+    CleaningRule("markdown_link", r"\[.*?\]\(.*?\)"),
+    CleaningRule("url", r"http\S+"),
+    CleaningRule("html_tag", r"<[^>]+>", span="tag"),
+    CleaningRule("photo_credit", r"© [^\n]*"),
+    CleaningRule("dated_line", r"\n[ \t]*(?i:mis à jour le)[^\n]*"),
+    CleaningRule("credit_line", r"\n[ \t]*(?i:crédit)[^\n]*"),
+    CleaningRule("boilerplate", r"[Ss](?i:uivez nous !)|[Ll](?i:ien affilié amazon)"),
+    # Single spaces are left alone; only runs and other whitespace characters are replaced
+    CleaningRule("whitespace", r"[^\S ]\s*| \s+", " ", stage=2, span="whitespace"),
+)
+
+_FLAG_LETTERS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+def _scoped(rule):
+    """Wrap a rule pattern in a group carrying its own flags."""
+    letters = "".join(letter for flag, letter in _FLAG_LETTERS if rule.flags & flag)
+    return f"(?{letters}:{rule.pattern})" if letters else rule.pattern
+
+def _line_cut(text):
+    """Last line break, which starts the next piece so line rules see it."""
+    return text.rfind("\n")
+
+def _tag_cut(text):
+    """Last line break before which every "<" is closed, so tags spanning lines stay whole."""
+    position = text.rfind("\n")
+    while position > 0:
+        opening = text.find("<", text.rfind(">", 0, position) + 1, position)
+        if opening < 0:
+            break
+        position = text.rfind("\n", 0, opening)
+    return position
+
+def _whitespace_cut(text):
+    """Start of the trailing whitespace run, which may continue in the next block."""
+    return len(text.rstrip())
+
+_CUTS = {"line": _line_cut, "tag": _tag_cut, "whitespace": _whitespace_cut}
+
+class TextCleaner:
+    """Apply an ordered list of cleaning rules with one regex scan per stage."""
+
+    def __init__(self, rules=DEFAULT_RULES):
+        """
+        Compile the rules.
+
+        Args:
+            rules (iterable): CleaningRule objects, in priority order
+        """
+        self.rules = tuple(rules)
+        self.stages = []
+
+        for stage in sorted({rule.stage for rule in self.rules}):
+            stage_rules = [rule for rule in self.rules if rule.stage == stage]
+            pattern = re.compile("|".join(_scoped(rule) for rule in stage_rules))
+            replacements = {rule.name: rule.replacement for rule in stage_rules}
+
+            if len(set(replacements.values())) == 1:
+                # Same literal for every rule: let re substitute it without a Python callback
+                replacement = stage_rules[0].replacement.replace("\\", "\\\\")
+            else:
+                replacement = self._make_callback(stage_rules)
+
+            self.stages.append((pattern, replacement, self._make_cut(stage_rules)))
+
+    @staticmethod
+    def _make_cut(stage_rules):
+        """Find the function telling where clean_stream may cut the input of a stage."""
+        kinds = {rule.span for rule in stage_rules}
+        unknown = kinds - set(_CUTS)
+        if unknown:
+            raise ValueError(f"Unknown span {sorted(unknown)}, use 'line', 'tag' or 'whitespace'")
+        if "whitespace" in kinds and len(kinds) > 1:
+            raise ValueError(f"Whitespace rules of stage {stage_rules[0].stage} cannot share it with other rules")
+        # Cutting where tags are closed is also safe for rules within a line
+        return _CUTS["tag" if "tag" in kinds else kinds.pop()]
+
+    @staticmethod
+    def _make_callback(stage_rules):
+        """Build a substitution callback finding which rule produced a match."""
+        compiled = [(re.compile(rule.pattern, rule.flags), rule.replacement) for rule in stage_rules]
+
+        def replace(match):
+            # Named groups would disable re's literal-prefix optimization, so the
+            # rule is identified by re-matching, which only happens on actual matches
+            for rule_pattern, rule_replacement in compiled:
+                rule_match = rule_pattern.match(match.string, match.start())
+                if rule_match and rule_match.end() == match.end():
+                    return rule_replacement
+            return compiled[-1][1]
+        return replace
+
+    def _apply(self, text):
+        for pattern, replacement, _ in self.stages:
+            text = pattern.sub(replacement, text)
+        return text
+
+    def clean(self, text):
+        """
+        Clean a text.
+
+        Args:
+            text (str): Text to clean
+
+        Returns:
+            str: Cleaned, stripped text
+        """
+        # The leading line break lets line rules match the first line too
+        return self._apply("\n" + text).strip()
+
+    @staticmethod
+    def _stream_stage(pieces, pattern, replacement, cut, max_carry):
+        """Apply one stage to consecutive pieces, holding back what a match may still extend."""
+        carry = ""
+        for piece in pieces:
+            carry += piece
+            position = cut(carry)
+            if position <= 0:
+                if len(carry) < max_carry:
+                    continue
+                position = len(carry)
+
+            out = pattern.sub(replacement, carry[:position])
+            carry = carry[position:]
+            if out:
+                yield out
+
+        out = pattern.sub(replacement, carry)
+        if out:
+            yield out
+
+    def clean_stream(self, blocks, max_carry=1 << 20):
+        """
+        Clean a large text supplied as consecutive blocks, in bounded memory.
+
+        Every stage runs on the output of the previous one as it arrives, and
+        holds back the end of its input that a match may still extend (see
+        CleaningRule.span), so the output is the same as clean() on the
+        concatenated input.
+
+        Args:
+            blocks (iterable): Consecutive pieces of the text (e.g. file reads)
+            max_carry (int): Maximum characters a stage holds back waiting for a cut point
+
+        Yields:
+            str: Pieces of the cleaned text
+        """
+        pieces = itertools.chain(["\n"], blocks)
+        for pattern, replacement, cut in self.stages:
+            pieces = self._stream_stage(pieces, pattern, replacement, cut, max_carry)
+
+        # Strip the whole text: trailing whitespace is held back until more text follows
+        started, pending_space = False, ""
+        for piece in pieces:
+            if not started:
+                piece = piece.lstrip()
+                if not piece:
+                    continue
+                started = True
+            body = piece.rstrip()
+            if body:
+                yield pending_space + body
+                pending_space = piece[len(body):]
+            else:
+                pending_space += piece
+
+DEFAULT_CLEANER = TextCleaner()
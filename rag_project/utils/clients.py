@@ -0,0 +1,414 @@
+"""Process-wide registry of pooled HTTP, OpenAI and LangChain clients.
+
+Every OpenAI call of the process (embeddings, answers, rewrites) goes through
+one synchronous and one asynchronous connection pool, so keep-alive
+connections are reused across features and the pool limits, keep-alive and
+timeouts are configured in one place (HTTP_* settings).
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from rag_project.utils.tracing import tracer
+from rag_project.config import settings
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+class PoolStats:
+    """
+    Thread-safe usage counters of a connection pool.
+
+    A request counts as in flight from the moment it asks the pool for a
+    connection until its response body is closed. Requests started while
+    every connection was busy had to wait for one: they are counted as
+    saturated.
+    """
+
+    def __init__(self, max_connections):
+        """
+        Args:
+            max_connections (int): Size of the pool
+        """
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._saturated = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def acquire(self):
+        """Count a request entering the pool."""
+        with self._lock:
+            self._requests += 1
+            if self._in_flight >= self.max_connections:
+                self._saturated += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def release(self):
+        """Count a request leaving the pool."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        """
+        Get the counters.
+
+        Returns:
+            dict: Requests, saturated requests, current and peak in-flight
+                requests, and peak saturation (peak in flight / pool size)
+        """
+        with self._lock:
+            return {
+                "max_connections": self.max_connections,
+                "requests": self._requests,
+                "saturated": self._saturated,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "peak_saturation": self._peak_in_flight / self.max_connections,
+            }
+
+class _CountedStream(httpx.SyncByteStream):
+    """Response body that releases its pool slot when closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release, release = None, self._release
+                release()
+
+class _AsyncCountedStream(httpx.AsyncByteStream):
+    """Asynchronous response body that releases its pool slot when closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release, release = None, self._release
+                release()
+
+def _request_span(request):
+    """Span of an API request, e.g. "openai.embeddings", ended when its body is closed."""
+    endpoint = request.url.path.rsplit("/v1/", 1)[-1].strip("/").replace("/", ".")
+    return tracer.start_span(f"openai.{endpoint}")
+
+def _releaser(stats, span):
+    def release():
+        stats.release()
+        span.end()
+    return release
+
+class _CountedTransport(httpx.BaseTransport):
+    """Connection pool recording its usage in a PoolStats."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self._transport = httpx.HTTPTransport(limits=_limits())
+
+    def handle_request(self, request):
+        span = _request_span(request)
+        self.stats.acquire()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self.stats.release()
+            span.end()
+            raise
+        span.set(status=response.status_code)
+        response.stream = _CountedStream(response.stream, _releaser(self.stats, span))
+        return response
+
+    def close(self):
+        self._transport.close()
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Asynchronous connection pool, with one pool per event loop.
+
+    Asynchronous connections belong to the loop that opened them, so a single
+    client object can serve the web server's loop as well as the short-lived
+    loops of asyncio.run() in batch jobs.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=_limits())
+            return transport
+
+    async def handle_async_request(self, request):
+        transport = self._transport()
+        span = _request_span(request)
+        self.stats.acquire()
+        try:
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            self.stats.release()
+            span.end()
+            raise
+        span.set(status=response.status_code)
+        response.stream = _AsyncCountedStream(response.stream, _releaser(self.stats, span))
+        return response
+
+    async def aclose(self):
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+
+def _timeout():
+    return httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+_lock = threading.RLock()
+_clients = {}
+_pool_stats = {
+    "sync": PoolStats(settings.HTTP_MAX_CONNECTIONS),
+    "async": PoolStats(settings.HTTP_MAX_CONNECTIONS),
+}
+
+def _get(name, factory):
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+def get_http_client():
+    """
+    Get the process-wide synchronous HTTP client.
+
+    Returns:
+        httpx.Client: Client over the shared synchronous connection pool
+    """
+    return _get("http", lambda: httpx.Client(
+        transport=_CountedTransport(_pool_stats["sync"]), timeout=_timeout()
+    ))
+
+def get_async_http_client():
+    """
+    Get the process-wide asynchronous HTTP client.
+
+    Returns:
+        httpx.AsyncClient: Client over the shared asynchronous connection pools
+    """
+    return _get("async_http", lambda: httpx.AsyncClient(
+        transport=_LoopLocalTransport(_pool_stats["async"]), timeout=_timeout()
+    ))
+
+def get_openai_client():
+    """
+    Get the process-wide synchronous OpenAI client.
+
+    Returns:
+        OpenAI: Shared client, reusing its pooled keep-alive connections
+    """
+    return _get("openai", lambda: OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=get_http_client()
+    ))
+
+def get_async_openai_client():
+    """
+    Get the process-wide asynchronous OpenAI client.
+
+    Returns:
+        AsyncOpenAI: Shared client, usable from any event loop
+    """
+    return _get("async_openai", lambda: AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=get_async_http_client()
+    ))
+
+def get_chat_model(model=None, temperature=None, max_tokens=None):
+    """
+    Get a shared LangChain chat model over the pooled clients.
+
+    Args:
+        model (str): OpenAI model. If None, uses LLM_MODEL from settings.
+        temperature (float): Sampling temperature. If None, uses LLM_TEMPERATURE.
+        max_tokens (int): Maximum generated tokens. If None, uses LLM_MAX_TOKENS.
+
+    Returns:
+        ChatOpenAI: Chat model, one per set of parameters
+    """
+    # LangChain is only imported by the features using it, not by the rewriter
+    from langchain_openai import ChatOpenAI
+    
+    model = model or settings.LLM_MODEL
+    temperature = settings.LLM_TEMPERATURE if temperature is None else temperature
+    max_tokens = max_tokens or settings.LLM_MAX_TOKENS
+    return _get(("chat", model, temperature, max_tokens), lambda: ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        # Streamed answers end with their token usage, counted by the tracer
+        stream_usage=True,
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
+    ))
+
+def get_openai_embeddings(model=None, max_retries=None):
+    """
+    Get a shared LangChain OpenAI embeddings client over the pooled clients.
+
+    Args:
+        model (str): Embedding model. If None, uses EMBEDDING_MODEL from settings.
+        max_retries (int): Retries of failed requests by the OpenAI client itself.
+            If None, uses the client default. Ingestion passes 0, so that
+            EmbeddingPipeline sees every 429 and adapts its concurrency.
+
+    Returns:
+        OpenAIEmbeddings: Embeddings client, one per model and number of retries
+    """
+    from langchain_openai import OpenAIEmbeddings
+    
+    model = model or settings.EMBEDDING_MODEL
+    retries = {} if max_retries is None else {"max_retries": max_retries}
+    return _get(("embeddings", model, max_retries), lambda: OpenAIEmbeddings(
+        model=model,
+        **retries,
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
+    ))
+
+def pool_stats():
+    """
+    Get the usage of the shared connection pools.
+
+    Returns:
+        dict: PoolStats counters of the "sync" and "async" pools
+    """
+    return {name: stats.stats() for name, stats in _pool_stats.items()}
+
+def _pool_metrics():
+    """Pool usage gauges of the Prometheus export."""
+    for name, stats in pool_stats().items():
+        yield "rag_http_pool_requests", {"pool": name}, stats["requests"]
+        yield "rag_http_pool_saturated_requests", {"pool": name}, stats["saturated"]
+        yield "rag_http_pool_in_flight", {"pool": name}, stats["in_flight"]
+        yield "rag_http_pool_peak_in_flight", {"pool": name}, stats["peak_in_flight"]
+
+tracer.add_collector(_pool_metrics)
+
+def warm_up(connections=None):
+    """
+    Create the shared clients and open keep-alive connections to the API.
+
+    The first requests after startup then skip client construction, DNS
+    resolution and the TCP/TLS handshakes. Only the synchronous pool is
+    warmed: asynchronous pools belong to an event loop, see awarm_up.
+
+    Args:
+        connections (int): Connections to open. If None, uses HTTP_WARMUP_CONNECTIONS.
+
+    Returns:
+        dict: Number of connections opened and duration in seconds
+    """
+    connections = connections or settings.HTTP_WARMUP_CONNECTIONS
+    start = time.perf_counter()
+    get_openai_client()
+    get_async_openai_client()
+    get_chat_model()
+    get_openai_embeddings()
+
+    client = get_http_client()
+    url, headers = _warm_up_request()
+
+    def touch(_):
+        # Any response, even an error status, leaves an open connection in the pool
+        try:
+            client.get(url, headers=headers)
+            return True
+        except httpx.HTTPError as e:
+            print(f"Warm-up request failed: {e}")
+            return False
+
+    # Concurrent requests, so each one opens its own connection
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        opened = sum(pool.map(touch, range(connections)))
+    return {"connections": opened, "seconds": time.perf_counter() - start}
+
+async def awarm_up(connections=None, url=None):
+    """
+    Open keep-alive connections in the asynchronous pool of the running event loop.
+
+    Call it on the loop that will send the requests, e.g. the web server's:
+    every event loop has its own pool.
+
+    Args:
+        connections (int): Connections to open. If None, uses HTTP_WARMUP_CONNECTIONS.
+        url (str): URL to request. If None, the model list of the OpenAI API.
+
+    Returns:
+        dict: Number of connections opened and duration in seconds
+    """
+    connections = connections or settings.HTTP_WARMUP_CONNECTIONS
+    start = time.perf_counter()
+    get_async_openai_client()
+    get_chat_model()
+    get_openai_embeddings()
+
+    client = get_async_http_client()
+    headers = {}
+    if url is None:
+        url, headers = _warm_up_request()
+
+    async def touch():
+        # Any response, even an error status, leaves an open connection in the pool
+        try:
+            await client.get(url, headers=headers)
+            return True
+        except httpx.HTTPError as e:
+            print(f"Warm-up request failed: {e}")
+            return False
+
+    # Concurrent requests, so each one opens its own connection
+    opened = sum(await asyncio.gather(*(touch() for _ in range(connections))))
+    return {"connections": opened, "seconds": time.perf_counter() - start}
+
+def _warm_up_request():
+    """URL and headers of the requests opening connections to the OpenAI API."""
+    url = (settings.OPENAI_BASE_URL or DEFAULT_BASE_URL).rstrip("/") + "/models"
+    headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"} if settings.OPENAI_API_KEY else {}
+    return url, headers
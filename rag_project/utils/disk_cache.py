@@ -0,0 +1,106 @@
+"""Persistent key-value cache backed by SQLite."""
+
+import os
+import sqlite3
+import threading
+
+class DiskCache:
+    """Thread-safe, process-safe key to bytes store in a single SQLite file."""
+
+    def __init__(self, path, table="cache"):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path (str): Path of the SQLite database file
+            table (str): Name of the table holding the entries
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets concurrent readers proceed while another process writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        """
+        Get the value stored under a key.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bytes: Stored value, or None if the key is missing
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, keys, batch_size=500):
+        """
+        Get the values stored under several keys.
+
+        Args:
+            keys (list): Cache keys
+            batch_size (int): Maximum number of keys per SQL query
+
+        Returns:
+            dict: Mapping of found keys to their values
+        """
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def set(self, key, value):
+        """
+        Store a value under a key, replacing any previous value.
+
+        Args:
+            key (str): Cache key
+            value (bytes): Value to store
+        """
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """
+        Store several values in one transaction.
+
+        Args:
+            items (dict): Mapping of keys to values
+        """
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",
+                list(items.items())
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
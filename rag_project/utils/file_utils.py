@@ -0,0 +1,30 @@
+"""Utility functions for safe file handling."""
+
+import os
+import tempfile
+
+def atomic_write(path, text, encoding="utf-8"):
+    """
+    Write a text file atomically.
+
+    The text is written to a temporary file in the same directory, which then
+    replaces the target, so readers never see a partially written file, even
+    if the process is interrupted.
+
+    Args:
+        path (str): Path of the file to write
+        text (str): Content to write
+        encoding (str): Text encoding
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
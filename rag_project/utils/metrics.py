@@ -0,0 +1,84 @@
+"""Lightweight in-process latency metrics."""
+
+import threading
+from collections import deque
+
+def percentile(values, q):
+    """
+    Return the q-th percentile of a list of numbers, by nearest rank.
+
+    Args:
+        values (list): Numbers
+        q (float): Percentile, between 0 and 100
+
+    Returns:
+        float: Percentile value, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class LatencyRecorder:
+    """
+    Record latencies per named path (e.g. "dense", "lexical").
+
+    Counts are exact; percentiles are computed over the most recent samples
+    of each path, so memory stays bounded in long-running processes.
+    """
+
+    def __init__(self, window=10000):
+        """
+        Args:
+            window (int): Number of recent samples kept per path
+        """
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, path, seconds):
+        """
+        Record one latency.
+
+        Args:
+            path (str): Name of the code path
+            seconds (float): Duration in seconds
+        """
+        with self._lock:
+            if path not in self._samples:
+                self._samples[path] = deque(maxlen=self.window)
+                self._counts[path] = 0
+            self._samples[path].append(seconds * 1000)
+            self._counts[path] += 1
+
+    def stats(self):
+        """
+        Summarize the recorded latencies.
+
+        Returns:
+            dict: Per path, the count, share of all calls, and mean/p50/p95/p99 in milliseconds
+        """
+        with self._lock:
+            samples = {path: list(values) for path, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        total = sum(counts.values())
+        return {
+            path: {
+                "count": counts[path],
+                "share": counts[path] / total if total else 0.0,
+                "mean_ms": sum(values) / len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+            }
+            for path, values in samples.items()
+        }
+
+    def reset(self):
+        """Forget every recorded latency."""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
@@ -0,0 +1,70 @@
+"""CPU and memory profiling of CLI commands (rag <command> --profile)."""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from rag_project.config import settings
+
+@contextmanager
+def profile(name, directory=None):
+    """
+    Profile a block with cProfile and tracemalloc.
+
+    Three files named after the command and the time are written when the
+    block ends, even if it fails:
+
+    - <name>-<time>.prof: cProfile stats, for pstats or snakeviz
+    - <name>-<time>.tracemalloc: memory snapshot, for tracemalloc.Snapshot.load
+    - <name>-<time>.txt: summary with the slowest functions and largest allocation sites
+
+    cProfile only sees the calling thread: time spent in worker threads and
+    processes shows up as waits on them.
+
+    Args:
+        name (str): Name of the profiled command
+        directory (str): Output directory. If None, uses PROFILE_DIR from settings.
+
+    Yields:
+        str: Path of the files without their extension
+    """
+    directory = directory or settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield base
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{base}.prof")
+        snapshot.dump(f"{base}.tracemalloc")
+
+        cpu = io.StringIO()
+        pstats.Stats(profiler, stream=cpu).sort_stats("cumulative").print_stats(settings.PROFILE_TOP)
+        allocations = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]).statistics("lineno")[:settings.PROFILE_TOP]
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(f"Command: {name}\n")
+            f.write(f"Wall time: {seconds:.2f}s\n")
+            f.write(f"Traced memory: {current / 2**20:.1f}MB at the end, {peak / 2**20:.1f}MB at peak\n\n")
+            f.write("Largest allocation sites still held at the end:\n")
+            f.writelines(f"  {stat}\n" for stat in allocations)
+            f.write("\n")
+            f.write(cpu.getvalue())
+        print(f"Profile saved in {base}.prof, {base}.tracemalloc and {base}.txt "
+              f"({seconds:.2f}s, {peak / 2**20:.1f}MB traced peak)")
@@ -0,0 +1,214 @@
+"""Pooled, concurrent and cached LLM rewriting service."""
+
+import asyncio
+import hashlib
+import threading
+import weakref
+from rag_project.utils.clients import get_openai_client, get_async_openai_client
+from rag_project.utils.disk_cache import DiskCache
+from rag_project.utils.tracing import record_cache_lookups, record_tokens
+from rag_project.config import settings
+
+REWRITE_PROMPT_TEMPLATE = """
+    You are an SEO web writer. Rewrite the text below using different wording while keeping important keywords. Remove any promotional content, links, legal notices, or cookie information. The final text should remain informative, clear, and unique.
+
+    Texte :
+    \"\"\"
+    {text}
+    \"\"\"
+    """
+
+_services_lock = threading.Lock()
+
+def build_rewrite_prompt(text, template=REWRITE_PROMPT_TEMPLATE):
+    """
+    Build the rewriting prompt for a text.
+
+    Args:
+        text (str): Text to rewrite
+        template (str): Prompt template with a {text} placeholder
+
+    Returns:
+        str: Prompt sent to the LLM
+    """
+    return template.format(text=text)
+
+class RewriteService:
+    """
+    Rewrite texts with an LLM, skipping texts that were already rewritten.
+
+    Results are stored in a content-addressed cache keyed by model, prompt
+    template, temperature, max tokens and input hash, so an unchanged input
+    never reaches the API twice. Asynchronous rewrites run concurrently,
+    bounded by `concurrency`, over shared pooled clients.
+    """
+
+    def __init__(self, model=None, temperature=None, max_tokens=None, concurrency=None,
+                 template=REWRITE_PROMPT_TEMPLATE, use_cache=None, cache_path=None):
+        """
+        Initialize the service.
+
+        Args:
+            model (str): OpenAI model to use
+            temperature (float): Temperature setting for text generation
+            max_tokens (int): Maximum tokens for the generated text
+            concurrency (int): Maximum number of concurrent asynchronous rewrites
+            template (str): Prompt template with a {text} placeholder
+            use_cache (bool): Whether to use the rewrite cache. If None, uses settings.
+            cache_path (str): Path of the SQLite rewrite cache
+        """
+        self.model = model or settings.REWRITE_MODEL
+        self.temperature = settings.REWRITE_TEMPERATURE if temperature is None else temperature
+        self.max_tokens = max_tokens or settings.REWRITE_MAX_TOKENS
+        self.concurrency = concurrency or settings.REWRITE_CONCURRENCY
+        self.template = template
+        self.template_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+        if use_cache is None:
+            use_cache = settings.REWRITE_CACHE_ENABLED
+        self.cache = DiskCache(cache_path or settings.REWRITE_CACHE_PATH, table="rewrites") if use_cache else None
+
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def cache_key(self, text):
+        """
+        Build the cache key of a rewrite.
+
+        Args:
+            text (str): Text to rewrite
+
+        Returns:
+            str: Key combining model, prompt template, temperature, max tokens and input hash
+        """
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{self.template_hash}:{self.temperature}:{self.max_tokens}:{text_hash}"
+
+    def stats(self):
+        """Return the rewrite cache hit and miss counts."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _cached(self, key):
+        value = self.cache.get(key) if self.cache is not None else None
+        with self._stats_lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        record_cache_lookups("rewrite", hits=int(value is not None), misses=int(value is None))
+        return value.decode("utf-8") if value is not None else None
+
+    def _remember(self, key, rewritten):
+        if self.cache is not None and rewritten:
+            self.cache.set(key, rewritten.encode("utf-8"))
+
+    def _record_usage(self, response):
+        if response.usage is not None:
+            record_tokens("rewrite", self.model, response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    def _request(self, text):
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": build_rewrite_prompt(text, self.template)}],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+
+    def rewrite(self, text):
+        """
+        Rewrite a text, using the cache when possible.
+
+        Args:
+            text (str): Text to rewrite
+
+        Returns:
+            str: Rewritten text
+        """
+        key = self.cache_key(text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        response = get_openai_client().chat.completions.create(**self._request(text))
+        self._record_usage(response)
+        rewritten = response.choices[0].message.content
+        self._remember(key, rewritten)
+        return rewritten
+
+    async def arewrite(self, text):
+        """
+        Rewrite a text asynchronously, using the cache when possible.
+
+        At most `concurrency` requests of this service are in flight at once.
+
+        Args:
+            text (str): Text to rewrite
+
+        Returns:
+            str: Rewritten text
+        """
+        key = self.cache_key(text)
+        cached = await asyncio.to_thread(self._cached, key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        async with semaphore:
+            response = await get_async_openai_client().chat.completions.create(**self._request(text))
+        self._record_usage(response)
+        rewritten = response.choices[0].message.content
+        await asyncio.to_thread(self._remember, key, rewritten)
+        return rewritten
+
+    async def arewrite_many(self, texts):
+        """
+        Rewrite several texts concurrently.
+
+        Args:
+            texts (list): Texts to rewrite
+
+        Returns:
+            list: Rewritten texts, in the same order
+        """
+        return await asyncio.gather(*(self.arewrite(text) for text in texts))
+
+    def rewrite_many(self, texts):
+        """
+        Rewrite several texts concurrently, blocking until all are done.
+
+        Args:
+            texts (list): Texts to rewrite
+
+        Returns:
+            list: Rewritten texts, in the same order
+        """
+        return asyncio.run(self.arewrite_many(texts))
+
+_services = {}
+
+def get_rewrite_service(model=None, temperature=None, max_tokens=None):
+    """
+    Get a shared rewrite service for the given generation parameters.
+
+    Args:
+        model (str): OpenAI model to use. If None, uses REWRITE_MODEL from settings.
+        temperature (float): Temperature setting for text generation. If None,
+            uses REWRITE_TEMPERATURE from settings.
+        max_tokens (int): Maximum tokens for the generated text. If None, uses
+            REWRITE_MAX_TOKENS from settings.
+
+    Returns:
+        RewriteService: Shared service
+    """
+    # Resolved first, so a change of the settings gets its own service
+    model = model or settings.REWRITE_MODEL
+    temperature = settings.REWRITE_TEMPERATURE if temperature is None else temperature
+    max_tokens = max_tokens or settings.REWRITE_MAX_TOKENS
+    key = (model, temperature, max_tokens)
+    with _services_lock:
+        if key not in _services:
+            _services[key] = RewriteService(model=model, temperature=temperature, max_tokens=max_tokens)
+        return _services[key]
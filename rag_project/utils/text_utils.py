@@ -1,56 +1,61 @@
 """Utility functions for text cleaning and rewriting."""
 
-import re
-from openai import OpenAI
-from rag_project.config import settings
+from rag_project.utils.cleaning import DEFAULT_CLEANER
 
 def clean_text(text):
     """
     Clean text by removing markdown links, URLs, HTML tags, etc.
     
+    The rules are listed, in order, in rag_project.utils.cleaning.DEFAULT_RULES.
+    
     Args:
         text (str): Text to clean
         
     Returns:
         str: Cleaned text
     """
-    text = re.sub(r'\[.*?\]\(.*?\)', '', text)  # Remove markdown links
-    text = re.sub(r'http\S+', '', text)         # Remove URLs
-    text = re.sub(r'<[^>]+>', '', text)         # Remove HTML tags
-    text = re.sub(r'© .*?\n?', '', text)        # Remove photo credits
-    text = re.sub(r'\s+', ' ', text)            # Reduce spaces
-    text = re.sub(r'(Mis à jour le.*?\n|Suivez nous !|Lien affilié Amazon|Crédit.*?\n)', '', text, flags=re.IGNORECASE)
-    return text.strip()
+    return DEFAULT_CLEANER.clean(text)
 
-def rewrite_text(text, model="gpt-4.1-nano", temperature=0.7, max_tokens=3000):
+def rewrite_text(text, model=None, temperature=None, max_tokens=None):
     """
     Rewrite text using OpenAI's API for a cleaner, more informative version.
     
+    Texts already rewritten with the same parameters are served from the
+    rewrite cache without calling the API.
+    
     Args:
         text (str): Text to rewrite
-        model (str): OpenAI model to use
-        temperature (float): Temperature setting for text generation
-        max_tokens (int): Maximum tokens for the generated text
+        model (str): OpenAI model to use. If None, uses REWRITE_MODEL from settings.
+        temperature (float): Temperature setting for text generation. If None,
+            uses REWRITE_TEMPERATURE from settings.
+        max_tokens (int): Maximum tokens for the generated text. If None, uses
+            REWRITE_MAX_TOKENS from settings.
         
     Returns:
         str: Rewritten text
     """
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
-    
-    prompt = f"""
-    You are an SEO web writer. Rewrite the text below using different wording while keeping important keywords. Remove any promotional content, links, legal notices, or cookie information. The final text should remain informative, clear, and unique.
+    # The OpenAI clients are only imported when text is actually rewritten
+    from rag_project.utils.rewriter import get_rewrite_service
     
-    Texte :
-    \"\"\"
-    {text}
-    \"\"\"
+    service = get_rewrite_service(model=model, temperature=temperature, max_tokens=max_tokens)
+    return service.rewrite(text)
+
+async def arewrite_text(text, model=None, temperature=None, max_tokens=None):
     """
+    Asynchronous version of rewrite_text.
     
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=max_tokens
-    )
+    Args:
+        text (str): Text to rewrite
+        model (str): OpenAI model to use. If None, uses REWRITE_MODEL from settings.
+        temperature (float): Temperature setting for text generation. If None,
+            uses REWRITE_TEMPERATURE from settings.
+        max_tokens (int): Maximum tokens for the generated text. If None, uses
+            REWRITE_MAX_TOKENS from settings.
+        
+    Returns:
+        str: Rewritten text
+    """
+    from rag_project.utils.rewriter import get_rewrite_service
     
-    return response.choices[0].message.content
\ No newline at end of file
+    service = get_rewrite_service(model=model, temperature=temperature, max_tokens=max_tokens)
+    return await service.arewrite(text)
@@ -0,0 +1,60 @@
+"""Utility functions for counting tokens."""
+
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name="cl100k_base"):
+    """
+    Get a tiktoken encoding, or None if tiktoken is unavailable.
+
+    Args:
+        encoding_name (str): Name of the tiktoken encoding
+
+    Returns:
+        tiktoken.Encoding: Encoding, or None
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        # tiktoken missing, or its encoding files cannot be downloaded
+        return None
+
+def count_tokens(text, encoding_name="cl100k_base"):
+    """
+    Count the tokens of a text.
+
+    Falls back to an estimate of four characters per token when tiktoken
+    cannot be used.
+
+    Args:
+        text (str): Text to measure
+        encoding_name (str): Name of the tiktoken encoding
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text, max_tokens, encoding_name="cl100k_base"):
+    """
+    Cut a text to at most a number of tokens.
+
+    Falls back to four characters per token when tiktoken cannot be used.
+
+    Args:
+        text (str): Text to cut
+        max_tokens (int): Maximum number of tokens
+        encoding_name (str): Name of the tiktoken encoding
+
+    Returns:
+        str: Start of the text
+    """
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
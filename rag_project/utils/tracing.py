@@ -0,0 +1,430 @@
+"""Per-stage tracing and metrics of the RAG pipeline.
+
+Spans time the graph nodes, the retrieval stages and every OpenAI request.
+Counters and histograms collect token counts, retrieved-chunk counts and
+cache lookups. Everything is kept in process and exported two ways:
+
+- Prometheus text format, from render_prometheus() or the HTTP endpoint of
+  start_metrics_server() (started by rag web on METRICS_PORT)
+- JSONL traces, one line per request or command with all of its spans,
+  appended to TRACE_FILE when it is set
+
+Only the standard library is used, so instrumented modules stay fast to import.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from rag_project.config import settings
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+_current_trace = contextvars.ContextVar("rag_trace", default=None)
+_current_span = contextvars.ContextVar("rag_span", default=None)
+
+class Span:
+    """
+    A timed operation, part of the current trace if there is one.
+
+    Spans are usually opened with Tracer.span(). Operations ending in
+    another context (e.g. when an HTTP response body is closed) keep the
+    Span returned by Tracer.start_span() and call end() themselves.
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace = _current_trace.get()
+        self.parent = _current_span.get()
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        """Add attributes to the span (e.g. the number of chunks retrieved)."""
+        self.attributes.update(attributes)
+
+    def end(self):
+        """End the span, record its duration and add it to its trace."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        self.tracer.observe("rag_span_seconds", self.duration, span=self.name)
+        if self.trace is not None:
+            self.trace.add(self)
+
+class Trace:
+    """Spans of one request or command, written as one JSONL line."""
+
+    def __init__(self, name, attributes):
+        self.id = os.urandom(16).hex()
+        self.name = name
+        self.attributes = attributes
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_seconds(self):
+        """
+        Get the time spent in the top-level spans.
+
+        Returns:
+            dict: Total seconds per span name, in order of first start
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        stages = {}
+        for span in spans:
+            if span.parent is None:
+                stages[span.name] = stages.get(span.name, 0.0) + span.duration
+        return stages
+
+    def to_dict(self, duration):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration_ms": duration * 1000,
+            "attributes": self.attributes,
+            "spans": [
+                {
+                    "name": span.name,
+                    "parent": span.parent.name if span.parent is not None else None,
+                    "start_ms": (span.start - self.start) * 1000,
+                    "duration_ms": span.duration * 1000,
+                    "attributes": span.attributes,
+                }
+                for span in spans
+            ],
+        }
+
+class _NoSpan:
+    """Span of a disabled tracer."""
+
+    def set(self, **attributes):
+        pass
+
+    def end(self):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+class Tracer:
+    """
+    Thread-safe registry of spans, counters and histograms.
+
+    Metrics are identified by name and labels, e.g.
+    tracer.count("rag_cache_lookups_total", cache="answer", result="hit").
+    """
+
+    def __init__(self, trace_file=None):
+        """
+        Args:
+            trace_file (str): JSONL file of the traces. If None, uses TRACE_FILE from settings.
+        """
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        """
+        Declare the type and help text of a metric.
+
+        Args:
+            name (str): Metric name
+            kind (str): "counter", "gauge" or "histogram"
+            help_text (str): Description shown in the Prometheus export
+        """
+        self._help[name] = (kind, help_text)
+
+    def add_collector(self, collector):
+        """
+        Register a function read at every export, for values kept elsewhere.
+
+        Args:
+            collector (callable): Returns (name, labels dict, value) gauge samples
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def count(self, name, value=1, **labels):
+        """Add to a counter."""
+        if not settings.TRACING_ENABLED:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        """Record a value in a histogram."""
+        if not settings.TRACING_ENABLED:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def start_span(self, name, **attributes):
+        """
+        Start a span that the caller ends with end().
+
+        Returns:
+            Span: Running span
+        """
+        if not settings.TRACING_ENABLED:
+            return _NO_SPAN
+        return Span(self, name, attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a block as a span, the parent of the spans started inside it.
+
+        Yields:
+            Span: Running span, to add attributes to
+        """
+        span = self.start_span(name, **attributes)
+        if span is _NO_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def trace(self, name, **attributes):
+        """
+        Group the spans of a block into one trace, written to the trace file when it ends.
+
+        Yields:
+            Trace: Running trace, or None if tracing is disabled
+        """
+        if not settings.TRACING_ENABLED:
+            yield None
+            return
+        trace = Trace(name, attributes)
+        trace_token, span_token = _current_trace.set(trace), _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            try:
+                _current_span.reset(span_token)
+                _current_trace.reset(trace_token)
+            except ValueError:
+                # Async generators may be resumed, and closed, in another context
+                pass
+            duration = time.perf_counter() - trace.start
+            self.observe("rag_trace_seconds", duration, trace=name)
+            self._write(trace.to_dict(duration))
+
+    def _write(self, record):
+        path = self.trace_file or settings.TRACE_FILE
+        if not path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def snapshot(self):
+        """
+        Get the current metric values.
+
+        Returns:
+            dict: "counters" and "histograms", keyed by (name, labels) tuples
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {key: dict(value, counts=list(value["counts"])) for key, value in self._histograms.items()},
+            }
+
+    def reset(self):
+        """Forget every counter and histogram."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """
+        Export the metrics in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        snapshot = self.snapshot()
+        with self._lock:
+            collectors = list(self._collectors)
+        gauges = {}
+        for collector in collectors:
+            for name, labels, value in collector():
+                gauges[(name, tuple(sorted(labels.items())))] = value
+
+        families = {}
+        for (name, labels), value in snapshot["counters"].items():
+            families.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), value in gauges.items():
+            families.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), histogram in snapshot["histograms"].items():
+            samples = families.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                samples.append(_sample(f"{name}_bucket", labels + (("le", _number(bound)),), cumulative))
+            samples.append(_sample(f"{name}_bucket", labels + (("le", "+Inf"),), histogram["count"]))
+            samples.append(_sample(f"{name}_sum", labels, histogram["sum"]))
+            samples.append(_sample(f"{name}_count", labels, histogram["count"]))
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text = self._help.get(name, ("gauge" if any(key[0] == name for key in gauges) else "untyped", ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(families[name])
+        return "\n".join(lines) + "\n"
+
+def _number(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _escape(label):
+    return str(label).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _sample(name, labels, value):
+    if labels:
+        rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+        name = f"{name}{{{rendered}}}"
+    return f"{name} {_number(value)}"
+
+# Process-wide tracer used by the instrumented modules
+tracer = Tracer()
+
+tracer.describe("rag_span_seconds", "histogram", "Duration of graph nodes, retrieval stages and OpenAI requests")
+tracer.describe("rag_trace_seconds", "histogram", "Duration of whole requests and commands")
+tracer.describe("rag_tokens_total", "counter", "Prompt and completion tokens of LLM calls")
+tracer.describe("rag_retrieved_chunks", "histogram", "Chunks returned per retrieval")
+tracer.describe("rag_cache_lookups_total", "counter", "Cache lookups by cache and result (hit or miss)")
+
+def traced(name):
+    """
+    Decorator running a function, sync or async, in a span.
+
+    Args:
+        name (str): Span name
+    """
+    import inspect
+    
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**attributes):
+    """Add attributes to the innermost running span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+def record_tokens(source, model, prompt_tokens, completion_tokens):
+    """
+    Count the tokens of an LLM call.
+
+    Args:
+        source (str): Feature making the call ("answer", "condense", "rewrite", ...)
+        model (str): LLM model
+        prompt_tokens (int): Input tokens
+        completion_tokens (int): Generated tokens
+    """
+    tracer.count("rag_tokens_total", prompt_tokens, source=source, model=model, kind="prompt")
+    tracer.count("rag_tokens_total", completion_tokens, source=source, model=model, kind="completion")
+    annotate(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+def record_cache_lookups(cache, hits=0, misses=0):
+    """
+    Count cache lookups.
+
+    Args:
+        cache (str): Cache name ("retrieval", "answer", "embedding", "rewrite")
+        hits (int): Lookups that found an entry
+        misses (int): Lookups that did not
+    """
+    if hits:
+        tracer.count("rag_cache_lookups_total", hits, cache=cache, result="hit")
+    if misses:
+        tracer.count("rag_cache_lookups_total", misses, cache=cache, result="miss")
+
+def start_metrics_server(port=None, host=None):
+    """
+    Serve the Prometheus metrics over HTTP in a background thread.
+
+    Args:
+        port (int): Port to listen on. If None, uses METRICS_PORT from settings.
+        host (str): Address to listen on. If None, uses METRICS_HOST from settings.
+
+    Returns:
+        ThreadingHTTPServer: Running server (shutdown() stops it)
+    """
+    # Only the web process serves metrics, the CLI does not pay for http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        """Serves render_prometheus() on /metrics."""
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    port = settings.METRICS_PORT if port is None else port
+    server = ThreadingHTTPServer((host or settings.METRICS_HOST, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,37 +1,136 @@
-"""Gradio web interface for the RAG application."""
+"""Gradio web interface for the RAG application.
 
+By default the RAG chain runs in the web process. With WEB_API_URL (rag web
+--api-url), the interface is only a front end: questions are streamed from a
+rag serve query API, which can run on other machines and scale its workers
+independently.
+"""
+
+import asyncio
+import json
+import weakref
 import gradio as gr
-from langchain_core.messages import HumanMessage, AIMessage
-from rag_project.core.rag_graph import rag_chain
+from rag_project.utils.clients import awarm_up, get_async_http_client
+from rag_project.utils.tracing import start_metrics_server
+from rag_project.config import settings
 
-def chat(message, history):
+def _history_messages(history):
     """
-    Chat function for Gradio interface.
+    Convert the Gradio chat history into query API messages.
+    
+    Args:
+        history (list): [user, assistant] pairs, or {"role", "content"} dicts
+        
+    Returns:
+        list: {"role": "user" | "assistant", "content": str} messages
+    """
+    messages = []
+    for item in history:
+        if isinstance(item, dict):
+            messages.append({"role": item["role"], "content": str(item["content"])})
+            continue
+        user, assistant = item
+        if user is not None:
+            messages.append({"role": "user", "content": str(user)})
+        if assistant is not None:
+            messages.append({"role": "assistant", "content": str(assistant)})
+    return messages
+
+async def stream_from_api(message, history, api_url=None):
+    """
+    Stream an answer from a rag serve query API.
     
     Args:
         message (str): User message
         history (list): Chat history
+        api_url (str): Base URL of the API. If None, uses WEB_API_URL from settings.
         
-    Returns:
-        str: AI response
+    Yields:
+        str: Answer generated so far
+        
+    Raises:
+        RuntimeError: If the API reports an error
+    """
+    url = f"{(api_url or settings.WEB_API_URL).rstrip('/')}/query/stream"
+    payload = {"question": message, "history": _history_messages(history)}
+    async with get_async_http_client().stream("POST", url, json=payload) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "token":
+                    yield data["text"]
+                elif event == "error":
+                    raise RuntimeError(data["error"])
+
+async def chat(message, history, request: gr.Request):
     """
-    # Format history for RAG
-    formatted_history = []
-    for human, ai in history:
-        formatted_history.append(HumanMessage(content=human))
-        formatted_history.append(AIMessage(content=ai))
+    Chat function for Gradio interface.
+    
+    Streams the answer as the LLM generates it. The RAG chain runs
+    asynchronously, so waiting on the embedding and LLM APIs does not hold
+    a worker thread per conversation.
     
-    # Add the new message
-    current_message = HumanMessage(content=message)
-    formatted_history.append(current_message)
+    Each browser session has a server-side conversation state, so only the
+    new message is sent through the chain and the cost of a turn does not
+    grow with the length of the conversation. The history is only compared
+    with the session, which is rebuilt from it when they differ. With
+    WEB_API_URL, the answer is streamed from the query API instead, which
+    receives the history.
     
-    # Invoke the RAG chain
-    response = rag_chain.invoke({"messages": formatted_history, "context": []})
+    Args:
+        message (str): User message
+        history (list): Chat history
+        request (gr.Request): Request of the browser session
+        
+    Yields:
+        str: AI response generated so far
+    """
+    if settings.WEB_API_URL:
+        async for partial_answer in stream_from_api(message, history):
+            yield partial_answer
+        return
     
-    # Get the response
-    ai_response = response["messages"][-1].content
+    # The chain is only loaded when the web process answers by itself
+    from langchain_core.messages import HumanMessage, AIMessage
+    from rag_project.core.rag_graph import astream_answer
     
-    return ai_response
+    # A new, cleared, retried, undone or edited chat no longer matches the
+    # session, which is then rebuilt from the history
+    history_messages = [
+        HumanMessage(content=item["content"]) if item["role"] == "user" else AIMessage(content=item["content"])
+        for item in _history_messages(history)
+    ]
+    
+    # Stream the RAG chain's answer
+    async for partial_answer in astream_answer(
+        [HumanMessage(content=message)], session_id=request.session_hash, history=history_messages
+    ):
+        yield partial_answer
+
+# Event loops whose connection pool was warmed up
+_warmed_loops = weakref.WeakSet()
+
+async def warm_up_chat_loop():
+    """
+    Open API connections on the event loop serving the chats, once per loop.
+
+    The chats send every request (query embeddings, answers, or the query
+    API) through the asynchronous pool of the server's event loop, which
+    only exists once the server runs: Gradio calls this on page load, before
+    the first question.
+    """
+    loop = asyncio.get_running_loop()
+    if loop in _warmed_loops:
+        return
+    _warmed_loops.add(loop)
+    # With WEB_API_URL the chats only talk to the query API
+    url = f"{settings.WEB_API_URL.rstrip('/')}/healthz" if settings.WEB_API_URL else None
+    warmed = await awarm_up(url=url)
+    print(f"Opened {warmed['connections']} connections on the chat event loop in {warmed['seconds']:.2f}s")
 
 def create_demo():
     """
@@ -43,12 +142,21 @@ def create_demo():
     demo = gr.ChatInterface(
         chat,
         title="Chatbot RAG based on documents",
-        description="Ask questions based on markdown documents"
+        description="Ask questions based on markdown documents",
+        concurrency_limit=settings.WEB_CONCURRENCY_LIMIT
     )
+    if settings.HTTP_WARMUP:
+        with demo:
+            demo.load(warm_up_chat_loop)
     return demo
 
 def launch_app():
     """Launch the Gradio app."""
+    if settings.METRICS_PORT:
+        start_metrics_server()
+        print(f"Prometheus metrics on http://{settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics")
+    if settings.WEB_API_URL:
+        print(f"Answering from the query API at {settings.WEB_API_URL}")
     demo = create_demo()
     demo.launch(share=True)
 
@@ -0,0 +1,401 @@
+"""JSON and server-sent events query API over the RAG chain (rag serve).
+
+The master process binds the listening socket, then forks SERVE_WORKERS
+worker processes that accept connections from it. Each worker opens the
+vector database and the API clients after the fork: the flat and PQ indexes
+are memory-mapped read-only, so every worker shares the same pages of the OS
+page cache instead of holding its own copy. Workers that crash are restarted.
+
+Endpoints:
+
+- GET /healthz: the worker process is up
+- GET /readyz: the worker has opened the vector database and can answer
+  (503 while loading or shutting down)
+- GET /metrics: Prometheus metrics of the worker that answers
+- POST /query: {"question": "...", "history": [{"role": "user", "content": "..."}, ...]}
+  returns {"answer": "...", "sources": [...], "timings": {...}}
+- POST /query/stream: same request, answered as server-sent events: "token"
+  events with the text generated so far, then "done" with the full answer and
+  its sources (or "error")
+
+The API is stateless: clients send the conversation with each question, so any
+worker can answer any request. On SIGTERM or Ctrl-C, workers stop accepting
+connections, finish their in-flight requests within SERVE_SHUTDOWN_TIMEOUT
+seconds, and exit.
+"""
+
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rag_project.utils.tracing import tracer
+from rag_project.config import settings
+
+# Exit status of a worker that could not open the vector database: not restarted
+_LOAD_FAILED = 3
+
+def parse_messages(payload):
+    """
+    Convert a query request into the messages of the RAG chain.
+
+    Args:
+        payload (dict): Request body with "question" and an optional "history"
+            of {"role": "user" | "assistant", "content": str} messages
+
+    Returns:
+        list: LangChain messages, ending with the question
+
+    Raises:
+        ValueError: If the request is malformed
+    """
+    from langchain_core.messages import HumanMessage, AIMessage
+
+    if not isinstance(payload, dict):
+        raise ValueError("The request body must be a JSON object")
+    question = payload.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError('"question" must be a non-empty string')
+    history = payload.get("history") or []
+    if not isinstance(history, list):
+        raise ValueError('"history" must be a list of messages')
+
+    messages = []
+    for message in history:
+        if not isinstance(message, dict) or message.get("role") not in ("user", "assistant"):
+            raise ValueError('History messages must have a "role" of "user" or "assistant"')
+        content = str(message.get("content") or "")
+        messages.append(HumanMessage(content=content) if message["role"] == "user" else AIMessage(content=content))
+    messages.append(HumanMessage(content=question))
+    return messages
+
+def _sources(docs):
+    """Source file and chunk id of the documents an answer is based on."""
+    return [
+        {"source": doc.metadata.get("source"), "chunk_id": doc.metadata.get("chunk_id")}
+        for doc in docs
+    ]
+
+class QueryService:
+    """
+    RAG chain of a worker process, shared by its request threads.
+
+    At most SERVE_MAX_CONCURRENCY requests run the chain at once; the others
+    wait for a slot.
+    """
+
+    def __init__(self, max_concurrency=None):
+        """
+        Args:
+            max_concurrency (int): Requests answered at once. If None, uses SERVE_MAX_CONCURRENCY from settings.
+        """
+        self.ready = False
+        self.draining = False
+        self.error = None
+        self._slots = threading.BoundedSemaphore(max_concurrency or settings.SERVE_MAX_CONCURRENCY)
+        self._chain = None
+
+    def load(self):
+        """Open the vector database and compile the chain."""
+        from rag_project.core import rag_graph
+        from rag_project.utils.clients import warm_up
+
+        rag_graph.get_doc_retriever()
+        self._chain = rag_graph.get_rag_chain()
+        if settings.HTTP_WARMUP:
+            warm_up()
+        self.ready = True
+
+    def query(self, messages):
+        """
+        Answer a question.
+
+        Args:
+            messages (list): Conversation ending with the question
+
+        Returns:
+            dict: Answer, sources and timings
+        """
+        start = time.perf_counter()
+        with self._slots, tracer.trace("query"):
+            state = self._chain.invoke({"messages": messages, "context": []})
+        answer = state["messages"][-1]
+        return {
+            "answer": answer.content,
+            "sources": _sources(state["context"]),
+            "timings": dict(answer.response_metadata, request_ms=(time.perf_counter() - start) * 1000),
+        }
+
+    def stream(self, messages):
+        """
+        Answer a question as it is generated.
+
+        Args:
+            messages (list): Conversation ending with the question
+
+        Yields:
+            tuple: (event name, data) of the server-sent events
+        """
+        from langchain_core.messages import AIMessageChunk
+
+        start = time.perf_counter()
+        with self._slots, tracer.trace("query", stream=True):
+            answer, state = "", None
+            for mode, payload in self._chain.stream(
+                {"messages": messages, "context": []}, stream_mode=["messages", "values"]
+            ):
+                if mode == "values":
+                    state = payload
+                    continue
+                message, metadata = payload
+                if metadata.get("langgraph_node") == "generate" and isinstance(message, AIMessageChunk) and message.content:
+                    answer += message.content
+                    yield "token", {"text": answer}
+        # Cached and no-information answers are not streamed
+        final = state["messages"][-1].content
+        if not answer:
+            yield "token", {"text": final}
+        yield "done", {
+            "answer": final,
+            "sources": _sources(state["context"]),
+            "timings": {"request_ms": (time.perf_counter() - start) * 1000},
+        }
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP endpoints of a worker."""
+
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed, so they do not hold up a shutdown
+    timeout = settings.SERVE_KEEPALIVE_TIMEOUT
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if self.server.service.draining:
+            # Keep-alive clients reconnect to a worker that is not shutting down
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > settings.SERVE_MAX_BODY_BYTES:
+            # The unread body would be parsed as the next request
+            self.close_connection = True
+            raise ValueError("Request body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split("?")[0]
+        if path == "/healthz":
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+        elif path == "/readyz":
+            if service.ready and not service.draining:
+                self._send_json(200, {"status": "ready", "pid": os.getpid()})
+            else:
+                status = "draining" if service.draining else "error" if service.error else "loading"
+                self._send_json(503, {"status": status, "pid": os.getpid(), "error": service.error})
+        elif path == "/metrics":
+            data = tracer.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        path = self.path.split("?")[0]
+        if path not in ("/query", "/query/stream"):
+            self._send_json(404, {"error": f"Unknown endpoint {path}"})
+            return
+        try:
+            messages = parse_messages(self._read_json())
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if not service.ready or service.draining:
+            self._send_json(503, {"error": "The worker is not ready"})
+            return
+
+        if path == "/query":
+            try:
+                self._send_json(200, service.query(messages))
+            except Exception as e:
+                self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        # Events are written as they come, the connection delimits the body
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        self.end_headers()
+        try:
+            for event, data in service.stream(messages):
+                self._send_event(event, data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            self._send_event("error", {"error": f"{type(e).__name__}: {e}"})
+
+    def _send_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+class _WorkerServer(ThreadingHTTPServer):
+    """HTTP server of a worker, accepting from the socket bound by the master."""
+
+    # Request threads are joined on close, so in-flight requests finish
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, sock, service):
+        super().__init__(sock.getsockname()[:2], _Handler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.service = service
+
+def run_worker(sock):
+    """
+    Serve requests from a listening socket until SIGTERM or SIGINT.
+
+    Args:
+        sock (socket.socket): Listening socket bound by the master
+
+    Returns:
+        int: Exit status
+    """
+    service = QueryService()
+    server = _WorkerServer(sock, service)
+
+    def stop(signum, frame):
+        service.draining = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Health checks are answered while the database opens
+    accept_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    accept_thread.start()
+    try:
+        service.load()
+    except Exception as e:
+        service.error = f"{type(e).__name__}: {e}"
+        print(f"Worker {os.getpid()} could not open the vector database: {service.error}", file=sys.stderr)
+        server.shutdown()
+        return _LOAD_FAILED
+
+    while not service.draining:
+        time.sleep(0.2)
+    server.shutdown()
+    # Joins the request threads, bounded by the master's shutdown timeout
+    server.server_close()
+    return 0
+
+def _listen(host, port):
+    sock = socket.create_server((host, port), backlog=settings.SERVE_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+def serve(host=None, port=None, workers=None):
+    """
+    Run the query API with pre-forked worker processes.
+
+    Args:
+        host (str): Interface to bind. If None, uses SERVE_HOST from settings.
+        port (int): Port to bind. If None, uses SERVE_PORT from settings.
+        workers (int): Worker processes. If None, uses SERVE_WORKERS from
+            settings (every core if it is None too). Platforms without fork()
+            serve from a single process.
+
+    Returns:
+        int: Exit status, 0 after a clean shutdown
+    """
+    host = host or settings.SERVE_HOST
+    port = settings.SERVE_PORT if port is None else port
+    workers = workers or settings.SERVE_WORKERS or os.cpu_count() or 1
+
+    # Imported once here, so workers start with the modules already loaded.
+    # Nothing is opened before the fork: clients and databases are per worker.
+    import rag_project.core.rag_graph  # noqa: F401
+
+    sock = _listen(host, port)
+    print(f"Query API listening on http://{host}:{sock.getsockname()[1]} with {workers} worker(s)")
+    if workers == 1 or not hasattr(os, "fork"):
+        try:
+            return run_worker(sock)
+        finally:
+            sock.close()
+
+    children = {}
+    stopping = []
+    status = 0
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = run_worker(sock)
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while not stopping:
+        pid, wait_status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        children.pop(pid, None)
+        code = os.waitstatus_to_exitcode(wait_status)
+        if code == _LOAD_FAILED:
+            print("A worker could not start, shutting down", file=sys.stderr)
+            status = 1
+            break
+        print(f"Worker {pid} exited with status {code}, restarting it", file=sys.stderr)
+        spawn()
+
+    print("Shutting down, waiting for in-flight requests...")
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + settings.SERVE_SHUTDOWN_TIMEOUT
+    while children and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            time.sleep(0.1)
+        else:
+            children.pop(pid, None)
+    for pid in children:
+        print(f"Worker {pid} did not finish in time, killing it", file=sys.stderr)
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    sock.close()
+    return status
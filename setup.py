@@ -15,10 +15,18 @@ setup(
         "langchain-openai",
         "chromadb",
         "openai",
-        "gradio",
         "langgraph",
         "unstructured[md]",
     ],
+    extras_require={
+        "web": [
+            "gradio",
+        ],
+        "local": [
+            "sentence-transformers",
+            "torch",
+        ],
+    },
     entry_points={
         "console_scripts": [
             "rag=rag_project.cli.main:main",
@@ -0,0 +1,32 @@
+"""Shared fixtures: the local stub OpenAI server and settings isolated per test."""
+
+import pytest
+from langchain_openai import OpenAIEmbeddings
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.utils.clients import get_http_client, get_async_http_client
+from rag_project.config import settings
+
+@pytest.fixture(scope="session")
+def stub_server():
+    """Stub OpenAI API serving deterministic embeddings, for the whole session."""
+    server = StubOpenAIServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def embedding_model(stub_server):
+    """Embedding model answered by the stub server."""
+    # Pooled clients keep working across the event loops of successive pipelines
+    return OpenAIEmbeddings(
+        model="text-embedding-3-small", base_url=stub_server.base_url, api_key="stub",
+        check_embedding_ctx_length=False, http_client=get_http_client(), http_async_client=get_async_http_client()
+    )
+
+@pytest.fixture
+def flat_settings(monkeypatch, tmp_path):
+    """Build vector databases with the flat backend, in a temporary directory."""
+    monkeypatch.setattr(settings, "VECTORSTORE_BACKEND", "flat")
+    monkeypatch.setattr(settings, "VECTORSTORE_DIR", str(tmp_path / "vectorstore"))
+    monkeypatch.setattr(settings, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_ENABLED", False)
+    return tmp_path
@@ -0,0 +1,66 @@
+"""Tests of the text-cleaning engine."""
+
+import random
+import pytest
+from rag_project.bench.clean_text import BOILERPLATE
+from rag_project.bench.corpus import synthetic_corpus
+from rag_project.utils.cleaning import CleaningRule, TextCleaner, DEFAULT_CLEANER
+from rag_project.utils.text_utils import clean_text
+
+# Pieces of scraped text around the edge cases of the rules
+FRAGMENTS = [
+    "Suivez nous !", "SUIVEZ NOUS !", "suivez\nnous !", "Lien Affilié\nAmazon", "lien affilié amazon",
+    "Mis À Jour le 3 mars\n", "\nCrédit : Shutterstock\n", "Photo Crédit : AFP\n", "© ", "©\n", "© \n",
+    "<b>", "<a\nhref='x'>", "<", ">", "[lien](https://example.com)", "[deux mots](x)",
+    "http://example.org/page", "https://a.b", " ", "  ", "\n", "\n\n", "\t", "\xa0", "texte", "é",
+    "[", "]", "(", ")", "!",
+]
+
+# Everything the synthetic corpus adds around its text
+NOISE = BOILERPLATE + ("http", "<b>", "](")
+
+def stream(text, block_size):
+    return "".join(DEFAULT_CLEANER.clean_stream(text[i:i + block_size] for i in range(0, len(text), block_size)))
+
+def test_boilerplate_lines_are_removed():
+    text = "# Titre\nMis à jour le 3 mars 2024\nTexte utile.\nCrédit : Shutterstock\nSuivez nous !\n"
+    assert clean_text(text) == "# Titre Texte utile."
+
+def test_boilerplate_is_case_insensitive():
+    assert clean_text("MIS À JOUR LE 4 avril\nDébut SUIVEZ NOUS ! fin\n  crédit photo : AFP") == "Début fin"
+    assert clean_text("Lien Affilié Amazon") == ""
+
+def test_links_urls_tags_and_credits_are_removed():
+    text = "Voir [la carte](https://example.com) ou https://example.org/page.\n<b>Gras</b> © Photo Jean\nFin"
+    assert clean_text(text) == "Voir ou Gras Fin"
+
+def test_text_is_kept():
+    text = "Le crédit agricole ouvre à 9 h.\nIl a été mis à jour le 3 mars."
+    assert clean_text(text) == "Le crédit agricole ouvre à 9 h. Il a été mis à jour le 3 mars."
+
+def test_corpus_has_no_boilerplate_left():
+    for document in synthetic_corpus(200, seed=3):
+        cleaned = clean_text(document)
+        assert cleaned
+        assert not [marker for marker in NOISE if marker in cleaned], cleaned
+        assert "  " not in cleaned and "\n" not in cleaned
+
+@pytest.mark.parametrize("block_size", [1, 2, 5, 64, 65536])
+def test_clean_stream_matches_clean(block_size):
+    rng = random.Random(block_size)
+    texts = ["\n".join(synthetic_corpus(20, seed=4))]
+    texts += ["".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40))) for _ in range(200)]
+    for text in texts:
+        assert stream(text, block_size) == DEFAULT_CLEANER.clean(text), repr(text)
+
+def test_rules_run_in_order():
+    cleaner = TextCleaner([
+        CleaningRule("first", "ab", "c", stage=1),
+        CleaningRule("second", "cc", "d", stage=2),
+    ])
+    assert cleaner.clean("abc") == "d"
+
+def test_whitespace_rules_have_their_own_stage():
+    with pytest.raises(ValueError):
+        TextCleaner([CleaningRule("line", "a", stage=1), CleaningRule("spaces", r"\s+", " ", stage=1,
+                                                                       span="whitespace")])
@@ -0,0 +1,18 @@
+"""Tests of the shared HTTP clients."""
+
+import asyncio
+from rag_project.utils import clients
+from rag_project.config import settings
+
+def test_awarm_up_opens_connections_on_the_running_loop(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", stub_server.base_url)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "stub")
+
+    async def warm_up():
+        warmed = await clients.awarm_up(connections=3)
+        # The pool of this loop keeps the connections open for the next requests
+        transport = clients.get_async_http_client()._transport._transport()
+        return warmed, len(transport._pool.connections)
+
+    warmed, connections = asyncio.run(warm_up())
+    assert warmed["connections"] == connections == 3
@@ -0,0 +1,89 @@
+"""Tests of context packing and chunk merging."""
+
+import json
+from langchain_core.documents import Document
+from rag_project.core import rag_graph
+from rag_project.core.context import ContextPacker, merge_chunks, _merge_pair, _Segment
+from rag_project.utils.tracing import tracer
+from rag_project.config import settings
+
+TEXT = (
+    "Le marché du village ouvre le samedi matin. On y trouve des fromages, du pain et des légumes "
+    "de saison. En hiver, les producteurs vendent aussi du vin chaud et des châtaignes grillées."
+)
+
+def chunk(start, end, chunk_id=None, source="guide.md", offset=True):
+    metadata = {"source": source, "chunk_id": chunk_id or f"{start}-{end}"}
+    if offset:
+        metadata["start_index"] = start
+    return Document(page_content=TEXT[start:end], metadata=metadata)
+
+def test_merge_pair_overlapping_offsets():
+    merged = _merge_pair(_Segment(chunk(0, 80), 0), _Segment(chunk(50, 140), 1), max_gap=2, max_overlap=200)
+    assert merged == (TEXT[0:140], 0)
+
+def test_merge_pair_contained_chunk():
+    merged = _merge_pair(_Segment(chunk(0, 100), 0), _Segment(chunk(20, 60), 1), max_gap=2, max_overlap=200)
+    assert merged == (TEXT[0:100], 0)
+
+def test_merge_pair_distant_chunks():
+    assert _merge_pair(_Segment(chunk(0, 40), 0), _Segment(chunk(80, 120), 1), max_gap=2, max_overlap=200) is None
+
+def test_merge_pair_stale_offsets_fall_back_to_text():
+    # An unchanged chunk of an edited file keeps the offset of the previous version
+    stale = Document(page_content=TEXT[50:140], metadata={"source": "guide.md", "chunk_id": "b", "start_index": 45})
+    merged = _merge_pair(_Segment(chunk(0, 80), 0), _Segment(stale, 1), max_gap=2, max_overlap=200)
+    assert merged == (TEXT[0:140], None)
+
+def test_merge_pair_stale_offsets_without_text_overlap():
+    stale = Document(page_content=TEXT[100:170], metadata={"source": "guide.md", "chunk_id": "b", "start_index": 60})
+    assert _merge_pair(_Segment(chunk(0, 80), 0), _Segment(stale, 1), max_gap=2, max_overlap=200) is None
+
+def test_merge_chunks_by_text_without_offsets():
+    documents = [chunk(60, 150, offset=False), chunk(0, 90, offset=False)]
+    merged = merge_chunks(documents, max_gap=2, max_overlap=200)
+    assert [doc.page_content for doc in merged] == [TEXT[0:150]]
+    assert merged[0].metadata["merged_chunks"] == 2
+
+def test_merge_chunks_keeps_sources_apart_and_relevance_order():
+    documents = [chunk(90, 170, "c"), chunk(0, 60, "a", source="other.md"), chunk(0, 100, "b")]
+    merged = merge_chunks(documents, max_gap=2, max_overlap=200)
+    assert [doc.page_content for doc in merged] == [TEXT[0:170], TEXT[0:60]]
+    assert merged[0].metadata["chunk_id"] == "b+c"
+
+def test_merge_chunks_drops_repeated_chunks():
+    assert len(merge_chunks([chunk(0, 80), chunk(0, 80)], max_gap=2, max_overlap=200)) == 1
+
+def test_pack_merges_and_reports():
+    documents = [chunk(0, 100), chunk(60, 170), chunk(0, 100)]
+    packed, report = ContextPacker(token_budget=1000).pack(documents)
+    assert [doc.page_content for doc in packed] == [TEXT[0:170]]
+    assert report["chunks_in"] == 3
+    assert report["merged"] == 1
+    assert report["duplicates"] == 1
+    assert report["chunks_out"] == 1
+    assert report["tokens_saved"] == report["tokens_in"] - report["tokens_out"] > 0
+
+def test_pack_truncates_to_budget():
+    other = Document(page_content="La randonnée part de la place de l'église.", metadata={"source": "other.md"})
+    packed, report = ContextPacker(token_budget=5).pack([chunk(0, 170), other])
+    assert len(packed) == 1
+    assert packed[0].metadata["truncated"]
+    assert TEXT.startswith(packed[0].page_content)
+    assert report["over_budget"] == 1
+
+def test_pack_node_reports_tokens_saved(monkeypatch, tmp_path):
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_FILE", str(trace_file))
+    monkeypatch.setattr(rag_graph, "context_packer", ContextPacker(token_budget=1000))
+
+    with tracer.trace("query"):
+        state = rag_graph.pack_context({"context": [chunk(0, 100), chunk(60, 170), chunk(0, 100)]})
+    saved = state["context_stats"]["tokens_saved"]
+    assert saved > 0
+
+    span = next(span for span in json.loads(trace_file.read_text())["spans"] if span["name"] == "pack")
+    assert span["attributes"]["tokens_saved"] == saved
+    assert span["attributes"]["merged"] == 1
+    assert "rag_context_tokens_saved_total" in tracer.render_prometheus()
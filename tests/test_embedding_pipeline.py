@@ -0,0 +1,57 @@
+"""Tests of the batched embedding pipeline against the stub OpenAI server."""
+
+import asyncio
+import pytest
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from rag_project.bench.stub_server import StubOpenAIServer
+from rag_project.core.embedding_pipeline import EmbeddingPipeline
+from rag_project.utils.clients import get_http_client, get_async_http_client, get_openai_embeddings
+from rag_project.config import settings
+
+@pytest.fixture
+def rate_limited_server():
+    server = StubOpenAIServer(rate_limit_rate=0.3, retry_after=0.01).start()
+    yield server
+    server.stop()
+
+def make_documents(count):
+    return [Document(page_content=f"Paragraphe {i} sur le marché du village.", metadata={"chunk_id": f"chunk-{i}"})
+            for i in range(count)]
+
+def test_rate_limited_batches_are_retried_by_the_pipeline(rate_limited_server):
+    embedding_model = OpenAIEmbeddings(
+        model="text-embedding-3-small", base_url=rate_limited_server.base_url, api_key="stub", max_retries=0,
+        check_embedding_ctx_length=False, http_client=get_http_client(), http_async_client=get_async_http_client()
+    )
+    written = {}
+
+    def writer(documents, ids, vectors):
+        written.update(zip(ids, vectors))
+
+    pipeline = EmbeddingPipeline(embedding_model, concurrency=4, max_batch_size=5, max_retries=20)
+    stats = pipeline.run(make_documents(200), writer=writer)
+
+    assert stats["batches"] == 40
+    assert sorted(written) == sorted(f"chunk-{i}" for i in range(200))
+    # Every 429 reached the pipeline, none was retried inside the client
+    assert stats["rate_limited"] == sum(rate_limited_server.requests.values()) - stats["batches"] > 0
+    assert stats["final_concurrency"] <= 4
+
+def test_ingest_embeddings_client_does_not_retry(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "stub")
+    assert get_openai_embeddings("text-embedding-3-small", max_retries=0).max_retries == 0
+    assert get_openai_embeddings("text-embedding-3-small") is not get_openai_embeddings("text-embedding-3-small",
+                                                                                           max_retries=0)
+
+def test_run_inside_a_running_event_loop(embedding_model):
+    written = []
+
+    async def ingest():
+        # As from a Jupyter cell or an async web handler
+        return EmbeddingPipeline(embedding_model, max_batch_size=8).run(
+            make_documents(20), writer=lambda documents, ids, vectors: written.extend(ids)
+        )
+
+    stats = asyncio.run(ingest())
+    assert stats["chunks"] == len(written) == 20
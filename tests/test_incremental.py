@@ -0,0 +1,96 @@
+"""Tests of incremental ingestion driven by the content-hash manifest."""
+
+import pytest
+from langchain_core.documents import Document
+from rag_project.core.embeddings import create_vectorstore, load_vectorstore, count_vectors, get_documents_by_ids
+from rag_project.data_processing import incremental
+from rag_project.data_processing.incremental import incremental_ingest, record_ingest
+from rag_project.data_processing.ingest import create_chunks
+from rag_project.data_processing.manifest import IngestManifest, assign_chunk_ids
+from rag_project.config import settings
+
+PARAGRAPH = "Le marché du village ouvre le samedi matin, avec des fromages et du pain. "
+
+def read_text(path):
+    # The manifest logic is under test, not the parsing of markdown
+    with open(path, "r", encoding="utf-8") as f:
+        return [Document(page_content=f.read(), metadata={"source": path})]
+
+@pytest.fixture
+def corpus(flat_settings, monkeypatch):
+    monkeypatch.setattr(incremental, "load_file", read_text)
+    directory = flat_settings / "input"
+    directory.mkdir()
+    for name, repeat in (("a.md", 12), ("b.md", 8), ("c.md", 5)):
+        (directory / name).write_text(f"# {name}\n\n" + PARAGRAPH * repeat, encoding="utf-8")
+    return directory
+
+def ingest(directory, embedding_model):
+    return incremental_ingest(directory=str(directory), chunk_size=200, chunk_overlap=40,
+                              embedding_model=embedding_model)
+
+def manifest_ids():
+    manifest = IngestManifest.load()
+    return manifest.all_chunk_ids()
+
+def test_first_run_adds_every_file(corpus, embedding_model):
+    stats = ingest(corpus, embedding_model)
+    assert stats["files_added"] == 3
+    assert stats["files_unchanged"] == stats["files_removed"] == stats["chunks_removed"] == 0
+    assert count_vectors(load_vectorstore(embedding_model=embedding_model)) == stats["chunks_added"] > 3
+
+def test_unchanged_files_are_skipped(corpus, embedding_model, stub_server):
+    first = ingest(corpus, embedding_model)
+    requests = dict(stub_server.requests)
+    stats = ingest(corpus, embedding_model)
+    assert stats["files_unchanged"] == 3
+    assert stats["chunks_unchanged"] == first["chunks_added"]
+    assert stats["chunks_added"] == stats["chunks_removed"] == 0
+    assert stub_server.requests == requests
+
+def test_changed_and_removed_files(corpus, embedding_model):
+    first = ingest(corpus, embedding_model)
+    old_b = IngestManifest.load().chunk_ids(str(corpus / "b.md"))
+    old_c = IngestManifest.load().chunk_ids(str(corpus / "c.md"))
+
+    (corpus / "b.md").write_text("# b.md\n\n" + PARAGRAPH * 8 + "Un nouveau paragraphe sur les châtaignes.",
+                                 encoding="utf-8")
+    (corpus / "c.md").unlink()
+    (corpus / "d.md").write_text("# d.md\n\nLa randonnée part de la place de l'église.", encoding="utf-8")
+    stats = ingest(corpus, embedding_model)
+
+    assert (stats["files_added"], stats["files_updated"], stats["files_removed"], stats["files_unchanged"]) == \
+        (1, 1, 1, 1)
+    new_b = IngestManifest.load().chunk_ids(str(corpus / "b.md"))
+    changed_b = len(set(new_b) - set(old_b))
+    assert stats["chunks_added"] == changed_b + 1
+    assert stats["chunks_removed"] == len(set(old_b) - set(new_b)) + len(old_c)
+
+    vectorstore = load_vectorstore(embedding_model=embedding_model)
+    assert count_vectors(vectorstore) == first["chunks_added"] + stats["chunks_added"] - stats["chunks_removed"]
+    assert sorted(manifest_ids()) == sorted(
+        doc.metadata["chunk_id"] for doc in get_documents_by_ids(vectorstore, manifest_ids())
+    )
+    assert all(document is None for document in get_documents_by_ids(vectorstore, old_c))
+
+def test_changed_chunking_parameters_rechunk_everything(corpus, embedding_model):
+    ingest(corpus, embedding_model)
+    stats = incremental_ingest(directory=str(corpus), chunk_size=120, chunk_overlap=20,
+                               embedding_model=embedding_model)
+    assert stats["files_updated"] == 3
+    assert stats["files_unchanged"] == 0
+
+def test_full_ingest_drops_deleted_chunks(flat_settings, embedding_model, monkeypatch):
+    monkeypatch.setattr(settings, "VECTORSTORE_BACKEND", "chroma")
+    documents = [Document(page_content=PARAGRAPH * 6, metadata={"source": "a.md"}),
+                 Document(page_content=PARAGRAPH * 3, metadata={"source": "b.md"})]
+    readers = []
+    for kept in (documents, documents[:1]):
+        chunks = create_chunks(kept, chunk_size=200, chunk_overlap=40)
+        vectorstore = create_vectorstore(chunks, ids=assign_chunk_ids(chunks), embedding_model=embedding_model)
+        record_ingest(chunks, chunk_size=200, chunk_overlap=40)
+        readers.append(load_vectorstore(embedding_model=embedding_model))
+    assert count_vectors(vectorstore) == len(chunks) == len(manifest_ids())
+    # A store opened before the ingest keeps answering from the same collection
+    assert [count_vectors(reader) for reader in readers] == [len(chunks)] * 2
+    assert readers[0].similarity_search("marché du village", k=1)
@@ -0,0 +1,48 @@
+"""Tests of the IVF-PQ index and its generations."""
+
+import glob
+import os
+from langchain_core.documents import Document
+from rag_project.core.embeddings import create_vectorstore, update_vectorstore, clear_vectorstore
+from rag_project.core.flat_index import FlatIndex, FlatIndexWriter
+from rag_project.core.pq_index import PQIndex, build_pq_index
+
+def make_documents(count, start=0):
+    return [Document(page_content=f"Paragraphe {i} sur le marché du village.", metadata={"chunk_id": f"chunk-{i}"})
+            for i in range(start, start + count)]
+
+def pq_files(directory):
+    return glob.glob(os.path.join(directory, "pq_index-*"))
+
+def test_codes_switch_with_their_flat_generation(flat_settings, embedding_model):
+    directory = str(flat_settings / "vectorstore")
+    create_vectorstore(make_documents(300), persist_directory=directory, embedding_model=embedding_model,
+                       backend="pq")
+
+    writer = FlatIndexWriter(directory)
+    documents = make_documents(100, start=1000)
+    writer.add(documents, [document.metadata["chunk_id"] for document in documents],
+               embedding_model.embed_documents([document.page_content for document in documents]))
+    writer.finish()
+    build_pq_index(FlatIndex(directory, embedding_model, info=writer.info))
+    # Until the new generation is published, readers open the previous one, codes included
+    assert len(PQIndex(directory, embedding_model)) == 300
+    writer.publish()
+    assert len(PQIndex(directory, embedding_model)) == 100
+    assert len(pq_files(directory)) == 1
+
+def test_update_and_clear_keep_codes_in_step(flat_settings, embedding_model):
+    directory = str(flat_settings / "vectorstore")
+    create_vectorstore(make_documents(300), persist_directory=directory, embedding_model=embedding_model,
+                       backend="pq")
+    store = update_vectorstore(make_documents(10, start=300), [f"chunk-{i}" for i in range(300, 310)],
+                               delete_ids=["chunk-0"], persist_directory=directory,
+                               embedding_model=embedding_model, backend="pq")
+    assert len(store) == 309
+    assert store.similarity_search("Paragraphe 305 sur le marché du village.", k=1)[0].metadata["chunk_id"] == \
+        "chunk-305"
+    assert pq_files(directory) == [os.path.join(directory, f"pq_index-{store.info['generation']}.npz")]
+
+    clear_vectorstore(directory, embedding_model, backend="pq")
+    assert len(PQIndex(directory, embedding_model)) == 0
+    assert pq_files(directory) == []
@@ -0,0 +1,135 @@
+"""Tests of shard partitioning and the scatter-gather search of sharded vector stores."""
+
+import threading
+import pytest
+from langchain_core.documents import Document
+from rag_project.core.embeddings import (
+    create_vectorstore, load_vectorstore, update_vectorstore, reshard_vectorstore, search_by_vectors,
+    get_documents_by_ids, count_vectors
+)
+from rag_project.core.sharding import ShardedVectorStore, partition, shard_of, read_layout
+
+def make_documents(count, files=13):
+    return [
+        Document(page_content=f"Paragraphe {i} sur la recette {i % files} et le marché du village.",
+                 metadata={"source": f"doc-{i % files}.md", "chunk_id": f"chunk-{i}"})
+        for i in range(count)
+    ]
+
+def test_shard_of_follows_the_source():
+    documents = make_documents(40)
+    for document in documents:
+        same_source = Document(page_content="autre", metadata={"source": document.metadata["source"]})
+        assert shard_of(document, "a", 4) == shard_of(same_source, "b", 4)
+    assert len({shard_of(document, None, 4) for document in documents}) > 1
+
+def test_partition_routes_every_chunk_in_order():
+    documents = make_documents(200)
+    items = [(document, document.metadata["chunk_id"]) for document in documents]
+
+    def build(shard, shard_documents, shard_ids):
+        return [(document.metadata["chunk_id"], doc_id) for document, doc_id in zip(shard_documents, shard_ids)]
+
+    results = partition(iter(items), 3, build)
+    for shard, pairs in enumerate(results):
+        expected = [doc_id for document, doc_id in items if shard_of(document, doc_id, 3) == shard]
+        assert pairs == [(doc_id, doc_id) for doc_id in expected]
+
+def test_partition_raises_the_error_of_a_shard():
+    def build(shard, shard_documents, shard_ids):
+        for _ in shard_documents:
+            if shard == 1:
+                raise RuntimeError("shard 1 failed")
+        return shard
+
+    documents = make_documents(5000)
+    with pytest.raises(RuntimeError, match="shard 1 failed"):
+        partition(((document, document.metadata["chunk_id"]) for document in documents), 2, build)
+
+class FakeCollection:
+    """Chroma collection returning fixed results, nearest first."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def count(self):
+        return len(self.results)
+
+    def query(self, query_embeddings, n_results, include):
+        results = self.results[:n_results]
+        return {
+            "documents": [[text for text, _ in results] for _ in query_embeddings],
+            "metadatas": [[{} for _ in results] for _ in query_embeddings],
+            "distances": [[distance for _, distance in results] for _ in query_embeddings],
+        }
+
+class FakeShard:
+    """Chroma-like shard."""
+
+    def __init__(self, results):
+        self._collection = FakeCollection(results)
+
+def test_sharded_store_merges_results_by_distance():
+    shards = [
+        FakeShard([("a", 0.1), ("c", 0.5), ("f", 0.9)]),
+        FakeShard([("b", 0.2), ("d", 0.6)]),
+        FakeShard([("e", 0.7)]),
+    ]
+    store = ShardedVectorStore("unused", shards, embedding_function=None)
+    try:
+        results = store.similarity_search_with_score_by_vectors([[0.0], [1.0]], k=5)
+    finally:
+        store.close()
+    assert len(results) == 2
+    for merged in results:
+        assert [(document.page_content, distance) for document, distance in merged] == [
+            ("a", 0.1), ("b", 0.2), ("c", 0.5), ("d", 0.6), ("e", 0.7)
+        ]
+
+def test_sharded_search_matches_single_store(flat_settings, embedding_model):
+    documents = make_documents(300)
+    single = create_vectorstore(documents, persist_directory=str(flat_settings / "single"),
+                                embedding_model=embedding_model, shards=1)
+    sharded = create_vectorstore(documents, persist_directory=str(flat_settings / "sharded"),
+                                 embedding_model=embedding_model, shards=4)
+    assert isinstance(sharded, ShardedVectorStore)
+    assert count_vectors(sharded) == count_vectors(single) == 300
+
+    queries = embedding_model.embed_documents(["recette du marché", "paragraphe 42", "village"])
+    expected = search_by_vectors(single, queries, 10)
+    found = search_by_vectors(sharded, queries, 10)
+    for single_results, sharded_results in zip(expected, found):
+        assert [document.metadata["chunk_id"] for document, _ in sharded_results] == \
+            [document.metadata["chunk_id"] for document, _ in single_results]
+        distances = [distance for _, distance in sharded_results]
+        assert distances == sorted(distances)
+        assert distances == pytest.approx([distance for _, distance in single_results])
+    sharded.close()
+
+def test_update_and_reshard_keep_every_chunk(flat_settings, embedding_model):
+    directory = str(flat_settings / "vectorstore")
+    documents = make_documents(120)
+    create_vectorstore(documents, persist_directory=directory, embedding_model=embedding_model, shards=3)
+
+    added = Document(page_content="Nouveau paragraphe.", metadata={"source": "new.md", "chunk_id": "new"})
+    store = update_vectorstore([added], ["new"], delete_ids=["chunk-0", "chunk-1"],
+                               persist_directory=directory, embedding_model=embedding_model)
+    assert count_vectors(store) == 119
+    assert get_documents_by_ids(store, ["new", "chunk-0"])[0].page_content == "Nouveau paragraphe."
+    assert get_documents_by_ids(store, ["new", "chunk-0"])[1] is None
+    store.close()
+
+    for shards in (2, 1, 4):
+        store = reshard_vectorstore(shards, persist_directory=directory, embedding_model=embedding_model)
+        assert count_vectors(store) == 119
+        assert (read_layout(directory) or {"shards": 1})["shards"] == shards
+        if isinstance(store, ShardedVectorStore):
+            store.close()
+    reloaded = load_vectorstore(directory, embedding_model=embedding_model)
+    assert len(reloaded.shards) == 4
+    reloaded.close()
+    # Closed stores do not leave their search threads behind
+    for thread in threading.enumerate():
+        if thread.name.startswith("shard-search"):
+            thread.join(timeout=5)
+            assert not thread.is_alive()